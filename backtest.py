@@ -0,0 +1,428 @@
+"""
+Backtest กลยุทธ์ 1-4 + TTP + DCA ของ BotEngine บนกราฟย้อนหลังจากไฟล์ในเครื่อง
+
+- คำนวณ Indicator และสัญญาณของทุกกลยุทธ์ครั้งเดียวแบบ Vectorized (ทั้งไฟล์)
+- ไล่ตัดสินใจตาม process_symbol เฉพาะแท่งที่ "อาจมีเหตุการณ์" (ซื้อ/ขาย/TTP)
+  แท่งอื่นข้ามด้วย NumPy ทีละก้อน จึงไม่ต้องวนทีละแท่งด้วย df.iloc
+
+ใช้งาน:
+    python backtest.py data/ --strategy 4 --cost-st 100 --money-limit 1000
+    python backtest.py candles/ --strategy 1     (อ่านจากคลัง candle_archive.py)
+"""
+import argparse
+import json
+import math
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import pandas as pd
+
+import candle_archive
+import config
+import indicators as ind
+from candle_store import resample
+
+BUY, HOLD, SELL = 1, 0, -1
+
+
+def default_params():
+    """ค่าพารามิเตอร์เริ่มต้นตาม config.py และค่าคงที่ใน BotEngine"""
+    return {
+        "strategy": 1,
+        "cost_st": 100.0,
+        "money_limit": 1000.0,
+        "initial_balance": None,        # None = เท่ากับ money_limit
+        "rsi_oversold": config.RSI_OVERSOLD,
+        "rsi_overbought": config.RSI_OVERBOUGHT,
+        "scalp_buy_rsi": 35,            # Strategy 2 (ค่าคงที่ใน analyze_market)
+        "scalp_sell_rsi": 65,
+        "min_profit_pct": 1.0,          # Strategy TP ขั้นต่ำ (ก่อนบวก FEE_BUFFER)
+        "dca_drop_pct": config.DCA_DROP_PCT,
+        "ttp_activation_pct": config.TTP_ACTIVATION_PCT,
+        "ttp_drop_pct": config.TTP_DROP_PCT,
+        "fee_buffer": config.FEE_BUFFER,
+        "fee_pct": 0.25,                # ค่าธรรมเนียมจริงต่อฝั่ง (Bitkub)
+        "warmup": 50,                   # แท่งแรกๆ ที่ยังไม่เทรด (รอ EMA 50)
+    }
+
+
+# =====================================================================
+# --- 📂 โหลดข้อมูล ---
+# =====================================================================
+def load_candles(path):
+    """
+    โหลดกราฟจาก .csv (timestamp/t, open, high, low, close, volume), .npz (t, o, h, l, c, v)
+    หรือ .bin ของ candle_archive
+    คืน dict ของ NumPy array: t (วินาที), o, h, l, c, v
+    """
+    if path.endswith(".bin"):
+        # ไฟล์จาก candle_archive.py (memmap ไม่ copy)
+        bars = np.memmap(path, dtype=candle_archive.RECORD, mode="r")
+        return candle_archive.as_columns(bars)
+
+    if path.endswith(".npz"):
+        with np.load(path) as data:
+            return {k: np.ascontiguousarray(data[k]) for k in ("t", "o", "h", "l", "c", "v") if k in data}
+
+    df = pd.read_csv(path)
+    ts_col = "t" if "t" in df.columns else "timestamp"
+    ts = df[ts_col]
+    if not np.issubdtype(ts.dtype, np.number):
+        ts = pd.to_datetime(ts).astype("int64") // 10**9
+    out = {"t": ts.to_numpy(dtype=np.int64)}
+    for short, name in (("o", "open"), ("h", "high"), ("l", "low"), ("c", "close"), ("v", "volume")):
+        col = name if name in df.columns else short
+        if col in df.columns:
+            out[short] = df[col].to_numpy(dtype=np.float64)
+    return out
+
+
+def find_data_files(path):
+    """
+    คืน {symbol: file} จากไฟล์เดียวหรือทั้งโฟลเดอร์ (ชื่อไฟล์ = ชื่อเหรียญ เช่น THB_BTC.csv)
+    ใช้โฟลเดอร์ config.ARCHIVE_DIR ได้โดยตรง (ชื่อจะเป็น THB_BTC_15)
+    """
+    if os.path.isfile(path):
+        return {os.path.splitext(os.path.basename(path))[0]: path}
+    files = {}
+    for name in sorted(os.listdir(path)):
+        if name.endswith((".csv", ".npz", ".bin")):
+            files[os.path.splitext(name)[0]] = os.path.join(path, name)
+    return files
+
+
+# =====================================================================
+# --- 📈 Indicator + สัญญาณ (Vectorized) ---
+# =====================================================================
+def compute_indicators(close, high, low):
+    """Indicator ชุดเดียวกับ analyze_market คำนวณทั้งไฟล์ในครั้งเดียว (ใช้ Kernel ถ้ามี Numba)"""
+    return ind.calculate_all(pd.DataFrame({"close": close, "high": high, "low": low}))
+
+
+def _last3(cond):
+    # จริงเมื่อเงื่อนไขเป็นจริงครบ 3 แท่งล่าสุด (แท่งที่ 0-1 มีกราฟไม่พอ = False)
+    out = cond.copy()
+    out[1:] &= cond[:-1]
+    out[2:] &= cond[:-2]
+    out[:2] = False
+    return out
+
+
+def compute_signals(close, values, params):
+    """
+    สัญญาณของกลยุทธ์ 1-3 ทุกแท่ง (BUY=1, HOLD=0, SELL=-1) และกลยุทธ์ที่โหมด Auto เลือก
+    คืน (signals[3, n], auto_strat[n])
+    """
+    rsi, macd, sig = values["RSI"], values["MACD"], values["Signal"]
+    n = len(close)
+    down = macd < sig
+    up = ~down
+
+    # Strategy 1: Trend & Reversal (เงื่อนไขแรกที่เป็นจริงชนะ เหมือน if/elif)
+    s1 = np.select(
+        [down & (rsi < params["rsi_oversold"]),
+         down & (close < values["BB_Lower"]),
+         up & (rsi > params["rsi_overbought"]),
+         up & (close > values["BB_Upper"])],
+        [BUY, BUY, SELL, SELL], HOLD)
+
+    # Strategy 2: RSI Scalping
+    s2 = np.select([rsi < params["scalp_buy_rsi"], rsi > params["scalp_sell_rsi"]], [BUY, SELL], HOLD)
+
+    # Strategy 3: MACD Cross (เทียบแท่งก่อนหน้า)
+    s3 = np.zeros(n, dtype=np.int8)
+    if n > 1:
+        pm, ps, lm, ls = macd[:-1], sig[:-1], macd[1:], sig[1:]
+        s3[1:] = np.select([(pm <= ps) & (lm > ls), (pm >= ps) & (lm < ls)], [BUY, SELL], HOLD)
+
+    # Auto (Strategy 4): ดูย้อนหลัง 3 แท่ง กรอง Whipsaw
+    strong = values["ADX"] >= 25
+    bullish = _last3((values["EMA_20"] > values["EMA_50"]) & strong)
+    bearish = _last3((values["EMA_20"] < values["EMA_50"]) & strong)
+    auto_strat = np.where(bullish, 3, np.where(bearish, 1, 2)).astype(np.int8)
+
+    return np.vstack([s1, s2, s3]).astype(np.int8), auto_strat
+
+
+# =====================================================================
+# --- 🔁 Replay ตรรกะ process_symbol ---
+# =====================================================================
+class _Account:
+    """สถานะของ 1 เหรียญระหว่าง Replay (เทียบเท่า symbols row + ความจำของ BotEngine)"""
+    def __init__(self, params):
+        self.p = params
+        self.cost = 0.0
+        self.coin = 0.0
+        self.cash = params["initial_balance"] if params["initial_balance"] is not None else params["money_limit"]
+        self.trailing_high = math.nan
+        self.active_auto = None
+        self.trades = []
+        self.fee = params["fee_pct"] / 100
+
+    def buy(self, i, ts, price, reason):
+        cost_st = self.p["cost_st"]
+        if self.cash < cost_st: return False
+        received = cost_st / price * (1 - self.fee)
+        self.cash -= cost_st
+        self.cost += cost_st
+        self.coin += received
+        self.trades.append({"i": i, "ts": int(ts), "side": "BUY", "price": price, "amount": received, "thb": cost_st, "reason": reason})
+        return True
+
+    def sell(self, i, ts, price, reason):
+        if self.coin <= 0: return False
+        if self.coin * price < 10:
+            # เศษเหรียญขายไม่ได้ -> ล้าง position (เหมือน execute_trade)
+            self.cost, self.coin = 0.0, 0.0
+            return False
+        thb = self.coin * price * (1 - self.fee)
+        self.trades.append({"i": i, "ts": int(ts), "side": "SELL", "price": price, "amount": self.coin, "thb": thb, "reason": reason})
+        self.cash += thb
+        self.cost = max(0.0, self.cost - thb)
+        self.coin = 0.0
+        self.active_auto = None
+        return True
+
+
+def _process_bar(acc, i, ts, price, signals, auto_strat, strategy):
+    """
+    ตรรกะเดียวกับ BotEngine.analyze_market (ส่วนเลือกกลยุทธ์) + process_symbol ของแท่งที่ i
+    คืน True ถ้ามีการซื้อขาย
+    """
+    p = acc.p
+    # --- เลือกกลยุทธ์ (ป้องกัน Open Position Clash) ---
+    if strategy == 4:
+        if acc.coin > 0:
+            actual = acc.active_auto or 1
+        else:
+            actual = int(auto_strat[i])
+            acc.active_auto = actual
+    else:
+        actual = strategy
+    signal = int(signals[actual - 1, i])
+
+    # --- TTP ---
+    if acc.coin > 0:
+        avg_cost = acc.cost / acc.coin
+        pnl = ((price - avg_cost) / avg_cost) * 100
+        if pnl >= p["ttp_activation_pct"] + p["fee_buffer"]:
+            if math.isnan(acc.trailing_high) or price > acc.trailing_high:
+                acc.trailing_high = price
+        if not math.isnan(acc.trailing_high):
+            high = acc.trailing_high
+            if price <= high * (1 - (p["ttp_drop_pct"] / 100)):
+                if acc.sell(i, ts, price, f"Trailing TP | Drop from High {high} | Sold at +{pnl:.2f}%"):
+                    acc.trailing_high = math.nan
+                    return True
+    if acc.coin == 0:
+        acc.trailing_high = math.nan
+
+    # --- Strategy หลัก ---
+    within_limit = acc.cost + p["cost_st"] <= p["money_limit"]
+    if signal == BUY:
+        if acc.coin == 0:
+            if within_limit:
+                return acc.buy(i, ts, price, f"S{actual} BUY")
+        elif acc.coin > 0:
+            avg_price = acc.cost / acc.coin
+            if price < avg_price * (1 - (p["dca_drop_pct"] / 100)) and within_limit:
+                return acc.buy(i, ts, price, f"S{actual} BUY (DCA)")
+    elif signal == SELL and acc.coin > 0:
+        avg_cost = acc.cost / acc.coin
+        pnl = ((price - avg_cost) / avg_cost) * 100
+        if pnl >= p["min_profit_pct"] + p["fee_buffer"]:
+            return acc.sell(i, ts, price, f"S{actual} SELL | Strat TP (+{pnl:.2f}%)")
+    return False
+
+
+def _next_event(acc, close, signals, auto_strat, strategy, start, entry_buys):
+    """
+    หาแท่งถัดไป (>= start) ที่ process_symbol อาจทำอะไรบางอย่าง
+    ระหว่างทางอัปเดต trailing_high ให้ด้วย คืน -1 ถ้าไม่มีเหตุการณ์จนจบไฟล์
+    """
+    p = acc.p
+    n = len(close)
+
+    if acc.coin <= 0:
+        # ไม่มีของ: เหตุการณ์เดียวคือสัญญาณ BUY (และยังไม่เกินวงเงิน)
+        if acc.cost + p["cost_st"] > p["money_limit"]:
+            return -1
+        k = np.searchsorted(entry_buys, start)
+        return int(entry_buys[k]) if k < len(entry_buys) else -1
+
+    actual = (acc.active_auto or 1) if strategy == 4 else strategy
+    sig = signals[actual - 1]
+    avg = acc.cost / acc.coin
+    act_target = p["ttp_activation_pct"] + p["fee_buffer"]
+    min_profit = p["min_profit_pct"] + p["fee_buffer"]
+    dca_price = avg * (1 - (p["dca_drop_pct"] / 100))
+    can_dca = acc.cost + p["cost_st"] <= p["money_limit"]
+    drop = 1 - (p["ttp_drop_pct"] / 100)
+
+    i, chunk = start, 256
+    while i < n:
+        end = min(n, i + chunk)
+        c = close[i:end]
+        s = sig[i:end]
+        pnl = ((c - avg) / avg) * 100
+        event = ((s == SELL) & (pnl >= min_profit))
+        if can_dca:
+            event |= (s == BUY) & (c < dca_price)
+        if math.isnan(acc.trailing_high):
+            event |= pnl >= act_target
+            running_high = None
+        else:
+            # จุดสูงสุดสะสม (รวมแท่งปัจจุบัน เพราะอัปเดตก่อนเช็คจุดขาย)
+            running_high = np.maximum.accumulate(np.maximum(c, acc.trailing_high))
+            event |= c <= running_high * drop
+        hits = np.flatnonzero(event)
+        if len(hits):
+            j = int(hits[0])
+            if running_high is not None and j > 0:
+                acc.trailing_high = float(running_high[j - 1])
+            return i + j
+        if running_high is not None:
+            acc.trailing_high = float(running_high[-1])
+        i = end
+        chunk = min(chunk * 2, 1 << 16)
+    return -1
+
+
+def replay(candles, params, signals=None, auto_strat=None):
+    """
+    Replay ตรรกะของบอทบนกราฟ 1 เหรียญ คืน dict ผลลัพธ์ (PnL, Drawdown, รายการเทรด)
+    ส่ง signals/auto_strat ที่คำนวณไว้แล้วมาได้ (ใช้ซ้ำตอน Sweep พารามิเตอร์)
+    """
+    t, close = candles["t"], np.asarray(candles["c"], dtype=np.float64)
+    if signals is None:
+        values = compute_indicators(close, candles["h"], candles["l"])
+        signals, auto_strat = compute_signals(close, values, params)
+
+    strategy = int(params["strategy"])
+    acc = _Account(params)
+    n = len(close)
+
+    # แท่งที่ "ไม่มีของ" แล้วมีสัญญาณ BUY (โหมด Auto ใช้กลยุทธ์ที่ตลาดเลือก ณ แท่งนั้น)
+    if strategy == 4:
+        entry_sig = signals[auto_strat.astype(np.int64) - 1, np.arange(n)]
+    else:
+        entry_sig = signals[strategy - 1]
+    entry_buys = np.flatnonzero(entry_sig == BUY)
+
+    i = int(params["warmup"])
+    while i < n:
+        i = _next_event(acc, close, signals, auto_strat, strategy, i, entry_buys)
+        if i < 0: break
+        _process_bar(acc, i, t[i], float(close[i]), signals, auto_strat, strategy)
+        i += 1
+
+    return summarize(acc, t, close)
+
+
+def replay_scalar(candles, params):
+    """Replay แบบวนทุกแท่ง (ช้า) ใช้ตรวจสอบว่าผลตรงกับ replay() แบบข้ามแท่ง"""
+    t, close = candles["t"], np.asarray(candles["c"], dtype=np.float64)
+    values = compute_indicators(close, candles["h"], candles["l"])
+    signals, auto_strat = compute_signals(close, values, params)
+    acc = _Account(params)
+    for i in range(int(params["warmup"]), len(close)):
+        _process_bar(acc, i, t[i], float(close[i]), signals, auto_strat, int(params["strategy"]))
+    return summarize(acc, t, close)
+
+
+def summarize(acc, t, close):
+    """สรุปผล: กำไร/ขาดทุน, Max Drawdown จาก Equity Curve, Win rate และรายการเทรด"""
+    start_cash = acc.p["initial_balance"] if acc.p["initial_balance"] is not None else acc.p["money_limit"]
+    n = len(close)
+    # เงินสด/เหรียญคงที่ระหว่างเทรด -> ทำเป็น Step function แล้ว map ไปทุกแท่งด้วย searchsorted
+    steps_i, steps_cash, steps_coin = [0], [start_cash], [0.0]
+    running_cash, running_coin = start_cash, 0.0
+    for tr in acc.trades:
+        if tr["side"] == "BUY":
+            running_cash -= tr["thb"]
+            running_coin += tr["amount"]
+        else:
+            running_cash += tr["thb"]
+            running_coin = 0.0
+        steps_i.append(tr["i"])
+        steps_cash.append(running_cash)
+        steps_coin.append(running_coin)
+    k = np.searchsorted(np.asarray(steps_i), np.arange(n), side="right") - 1
+    cash = np.asarray(steps_cash)[k]
+    coin = np.asarray(steps_coin)[k]
+    equity = cash + coin * close
+    peak = np.maximum.accumulate(equity) if n else equity
+    drawdown = float(np.max((peak - equity) / peak)) * 100 if n else 0.0
+
+    sells = [tr for tr in acc.trades if tr["side"] == "SELL"]
+    wins, spent = 0, 0.0
+    for tr in acc.trades:
+        if tr["side"] == "BUY":
+            spent += tr["thb"]
+        else:
+            wins += tr["thb"] > spent
+            spent = 0.0
+
+    final_equity = float(equity[-1]) if n else start_cash
+    return {
+        "bars": n,
+        "start": int(t[0]) if n else None,
+        "end": int(t[-1]) if n else None,
+        "trades": len(acc.trades),
+        "round_trips": len(sells),
+        "win_rate": round(wins / len(sells) * 100, 2) if sells else 0.0,
+        "pnl": round(final_equity - start_cash, 4),
+        "pnl_pct": round((final_equity - start_cash) / start_cash * 100, 4),
+        "max_drawdown_pct": round(drawdown, 4),
+        "open_position": {"cost": acc.cost, "coin": acc.coin},
+        "trade_list": acc.trades,
+    }
+
+
+def _run_file(path, params):
+    return replay(load_candles(path), params)
+
+
+def run(files, params, workers=None):
+    """Backtest หลายเหรียญ (แยกโปรเซสต่อเหรียญ) คืน {symbol: ผลลัพธ์}"""
+    if workers == 1 or len(files) <= 1:
+        return {symbol: _run_file(path, params) for symbol, path in files.items()}
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        futures = {symbol: pool.submit(_run_file, path, params) for symbol, path in files.items()}
+        return {symbol: future.result() for symbol, future in futures.items()}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Backtest Bitkub Pro Bot strategies on local candle files")
+    parser.add_argument("path", help="ไฟล์ .csv/.npz/.bin หรือโฟลเดอร์ที่มีไฟล์ต่อเหรียญ (เช่น candles/)")
+    parser.add_argument("--strategy", type=int, default=1, choices=[1, 2, 3, 4])
+    parser.add_argument("--cost-st", type=float, default=100.0)
+    parser.add_argument("--money-limit", type=float, default=1000.0)
+    parser.add_argument("--balance", type=float, default=None, help="เงินเริ่มต้น (ค่าเริ่มต้น = money-limit)")
+    parser.add_argument("--workers", type=int, default=None, help="จำนวนโปรเซส (ค่าเริ่มต้น = จำนวน CPU)")
+    parser.add_argument("--json", help="บันทึกผลทั้งหมด (รวมรายการเทรด) เป็นไฟล์ JSON")
+    args = parser.parse_args()
+
+    params = default_params()
+    params.update({"strategy": args.strategy, "cost_st": args.cost_st,
+                   "money_limit": args.money_limit, "initial_balance": args.balance})
+
+    started = time.perf_counter()
+    results = run(find_data_files(args.path), params, args.workers)
+    elapsed = time.perf_counter() - started
+
+    total_bars = sum(r["bars"] for r in results.values())
+    for symbol, r in results.items():
+        print(f"{symbol:<12} trades={r['trades']:<5} pnl={r['pnl']:>10.2f} ({r['pnl_pct']:+.2f}%) "
+              f"maxDD={r['max_drawdown_pct']:.2f}% win={r['win_rate']:.1f}%")
+    print(f"⏱️ {len(results)} symbols / {total_bars:,} bars in {elapsed:.2f}s")
+
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump({"params": params, "results": results}, f, ensure_ascii=False, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,246 @@
+"""
+Bitkub จำลองสำหรับ Benchmark: ตอบ /tradingview/history, wallet, order ฯลฯ จาก Fixture ที่บันทึกไว้
+
+- ใช้ในโปรเซสเดียวกันผ่าน httpx.ASGITransport (ไม่เปิด socket) หรือรันเป็น Server จริงด้วย `serve`
+- หน่วงเวลาทุก Request ได้ (latency + jitter) เพื่อจำลองเวลาเดินทางไปกลับ Bitkub
+- กราฟที่บันทึกไว้ถูกเลื่อนเวลาให้แท่งสุดท้ายตรงกับ "ตอนนี้" ตอนสร้าง Server
+
+ใช้งาน:
+    python benchmarks/fake_bitkub.py record THB_BTC THB_ETH --out benchmarks/fixtures/recorded.json
+    python benchmarks/fake_bitkub.py serve --fixtures benchmarks/fixtures/recorded.json --port 8001 --latency 30
+    (แล้วรันบอทด้วย BASE_URL=http://127.0.0.1:8001)
+"""
+import argparse
+import asyncio
+import json
+import os
+import random
+import sys
+import time
+from collections import Counter
+
+import httpx
+import numpy as np
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse, PlainTextResponse
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import utils  # noqa: E402
+from candle_store import resample  # noqa: E402
+
+STATUS_OK = [
+    {"name": "Non-secure endpoints", "status": "ok", "message": ""},
+    {"name": "Secure endpoints", "status": "ok", "message": ""},
+]
+
+
+def synthetic_fixtures(symbols, bars=5000, resolution=5, seed=0):
+    """Fixture สุ่มแบบ Random walk (ใช้เมื่อยังไม่มีไฟล์ที่บันทึกจาก Bitkub จริง)"""
+    rng = np.random.default_rng(seed)
+    end = int(time.time()) // (resolution * 60) * (resolution * 60)
+    t = end - np.arange(bars)[::-1] * resolution * 60
+    history = {}
+    for symbol in symbols:
+        close = 100 * np.exp(np.cumsum(rng.normal(0, 0.004, bars)))
+        spread = np.abs(rng.normal(0, 0.002, bars))
+        history[utils.normalize_symbol(symbol, to_api=True)] = {
+            "resolution": resolution,
+            "t": t.tolist(),
+            "o": np.r_[close[0], close[:-1]].round(6).tolist(),
+            "h": (close * (1 + spread)).round(6).tolist(),
+            "l": (close * (1 - spread)).round(6).tolist(),
+            "c": close.round(6).tolist(),
+            "v": rng.uniform(1, 100, bars).round(4).tolist(),
+        }
+    return default_responses(history)
+
+
+ORDER_INFO_FILLED = {"error": 0, "result": {
+    "amount": 100, "rate": 1_000_000, "fee": 0.25, "credit": 0, "filled": 100, "total": 100,
+    "status": "filled", "partial_filled": False, "remaining": 0,
+    "history": [{"amount": 100, "credit": 0, "fee": 0.25, "id": "1", "rate": 1_000_000, "timestamp": 0}],
+}}
+
+
+def default_responses(history):
+    coins = {sym.split("_")[0].upper(): 1000.0 for sym in history}
+    return {
+        "history": history,
+        "status": STATUS_OK,
+        "wallet": {"error": 0, "result": {"THB": 1_000_000.0, **coins}},
+        "place_bid": {"error": 0, "result": {"id": "1", "typ": "market", "amt": 100, "rat": 0, "fee": 0.25, "rec": 0, "ts": 0}},
+        "place_ask": {"error": 0, "result": {"id": "2", "typ": "market", "amt": 1, "rat": 0, "fee": 0.25, "rec": 0, "ts": 0}},
+        "open_orders": {"error": 0, "result": []},
+        "cancel": {"error": 0},
+        "order_info": ORDER_INFO_FILLED,
+        "bids": {"error": 0, "result": []},
+        "asks": {"error": 0, "result": []},
+    }
+
+
+class FakeBitkub:
+    def __init__(self, fixtures, latency=0.0, jitter=0.0, seed=None):
+        self.fixtures = fixtures
+        self.latency = latency      # วินาที
+        self.jitter = jitter
+        self.calls = Counter()
+        self._rng = random.Random(seed)
+        self._history = {}
+        for sym, data in fixtures["history"].items():
+            bar = data["resolution"] * 60
+            t = np.asarray(data["t"], dtype=np.int64)
+            shift = int(time.time()) // bar * bar - int(t[-1]) if len(t) else 0
+            columns = {col: np.asarray(data[col], dtype=np.float64) for col in ("o", "h", "l", "c", "v")}
+            columns["t"] = t + shift
+            self._history[sym] = (data["resolution"], columns)
+        self.app = self._build_app()
+
+    def transport(self):
+        return httpx.ASGITransport(app=self.app)
+
+    def client(self, **kwargs):
+        """AsyncClient ที่ส่งทุก Request เข้า Server จำลองนี้โดยตรง"""
+        return httpx.AsyncClient(transport=self.transport(), **kwargs)
+
+    async def _delay(self):
+        if self.latency or self.jitter:
+            await asyncio.sleep(max(0.0, self.latency + self._rng.uniform(-self.jitter, self.jitter)))
+
+    def history(self, symbol, resolution, from_time, to_time):
+        entry = self._history.get(symbol)
+        if entry is None:
+            return {"s": "no_data"}
+        base_resolution, columns = entry
+        if resolution != base_resolution:
+            if resolution % base_resolution:
+                return {"s": "error"}
+            columns = resample(columns, resolution)
+        t = columns["t"]
+        lo = int(np.searchsorted(t, from_time, side="left"))
+        hi = int(np.searchsorted(t, to_time, side="right"))
+        if lo >= hi:
+            return {"s": "no_data"}
+        out = {col: columns[col][lo:hi].tolist() for col in ("t", "o", "h", "l", "c", "v")}
+        out["s"] = "ok"
+        return out
+
+    def _build_app(self):
+        app = FastAPI()
+        fx = self.fixtures
+
+        @app.middleware("http")
+        async def count_and_delay(request: Request, call_next):
+            self.calls[request.url.path] += 1
+            await self._delay()
+            return await call_next(request)
+
+        @app.get("/api/status")
+        async def status():
+            return fx.get("status", STATUS_OK)
+
+        @app.get("/api/v3/servertime")
+        async def servertime():
+            return PlainTextResponse(str(int(time.time() * 1000)))
+
+        @app.get("/tradingview/history")
+        async def history(symbol: str, resolution: int, to: int, request: Request):
+            from_time = int(request.query_params.get("from"))
+            return self.history(symbol, resolution, from_time, to)
+
+        @app.post("/api/v3/market/wallet")
+        async def wallet():
+            return fx["wallet"]
+
+        @app.post("/api/v3/market/place-bid")
+        async def place_bid():
+            return fx["place_bid"]
+
+        @app.post("/api/v3/market/place-ask")
+        async def place_ask():
+            return fx["place_ask"]
+
+        @app.get("/api/v3/market/my-open-orders")
+        async def open_orders():
+            return fx["open_orders"]
+
+        @app.get("/api/v3/market/order-info")
+        async def order_info():
+            return fx.get("order_info", ORDER_INFO_FILLED)
+
+        @app.post("/api/v3/market/cancel-order")
+        async def cancel():
+            return fx["cancel"]
+
+        @app.get("/api/v3/market/bids")
+        async def bids():
+            return fx.get("bids", {"error": 0, "result": []})
+
+        @app.get("/api/v3/market/asks")
+        async def asks():
+            return fx.get("asks", {"error": 0, "result": []})
+
+        @app.post("/bot{token}/sendMessage")
+        async def telegram(token: str):
+            return JSONResponse({"ok": True})
+
+        return app
+
+
+async def record_fixtures(symbols, resolution=5, bars=5000, base_url="https://api.bitkub.com"):
+    """บันทึกกราฟจริงจาก Bitkub (Public endpoint) ส่วน wallet/order ใช้คำตอบมาตรฐาน"""
+    now = int(time.time())
+    history = {}
+    async with httpx.AsyncClient(timeout=30) as client:
+        status = (await client.get(f"{base_url}/api/status")).json()
+        for symbol in symbols:
+            query_symbol = utils.normalize_symbol(symbol, to_api=True)
+            url = (f"{base_url}/tradingview/history?symbol={query_symbol}&resolution={resolution}"
+                   f"&from={now - bars * resolution * 60}&to={now}")
+            data = (await client.get(url)).json()
+            if data.get("s") != "ok":
+                print(f"⚠️ {symbol}: {data.get('s')}")
+                continue
+            history[query_symbol] = {"resolution": resolution, **{k: data[k] for k in ("t", "o", "h", "l", "c", "v")}}
+            print(f"📥 {symbol}: {len(data['t'])} bars")
+    fixtures = default_responses(history)
+    fixtures["status"] = status
+    return fixtures
+
+
+def load_fixtures(path):
+    with open(path, encoding="utf-8") as f:
+        return json.load(f)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Fake Bitkub server for benchmarks")
+    sub = parser.add_subparsers(dest="command", required=True)
+    rec = sub.add_parser("record", help="บันทึกกราฟจริงเป็นไฟล์ Fixture")
+    rec.add_argument("symbols", nargs="+")
+    rec.add_argument("--resolution", type=int, default=5)
+    rec.add_argument("--bars", type=int, default=5000)
+    rec.add_argument("--out", default="benchmarks/fixtures/recorded.json")
+    srv = sub.add_parser("serve", help="รันเป็น HTTP Server")
+    srv.add_argument("--fixtures", help="ไฟล์ Fixture (ไม่ระบุ = สุ่ม)")
+    srv.add_argument("--symbols", nargs="+", default=["THB_BTC", "THB_ETH"])
+    srv.add_argument("--latency", type=float, default=0.0, help="ms")
+    srv.add_argument("--jitter", type=float, default=0.0, help="ms")
+    srv.add_argument("--port", type=int, default=8001)
+    args = parser.parse_args()
+
+    if args.command == "record":
+        fixtures = asyncio.run(record_fixtures(args.symbols, args.resolution, args.bars))
+        os.makedirs(os.path.dirname(args.out) or ".", exist_ok=True)
+        with open(args.out, "w", encoding="utf-8") as f:
+            json.dump(fixtures, f)
+        print(f"💾 {args.out}")
+    else:
+        import uvicorn
+        fixtures = load_fixtures(args.fixtures) if args.fixtures else synthetic_fixtures(args.symbols)
+        fake = FakeBitkub(fixtures, args.latency / 1000, args.jitter / 1000)
+        uvicorn.run(fake.app, host="127.0.0.1", port=args.port)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,127 @@
+"""
+WebSocket ของ Bitkub จำลอง (market.trade / market.ticker) สำหรับทดสอบ market_feed.py
+
+- URL รูปแบบเดียวกับของจริง: ws://host:port/websocket-api/market.trade.thb_btc,market.ticker.thb_btc
+- ส่งข้อความเฉพาะ stream ที่ Client แต่ละตัว subscribe ไว้
+- drop() ตัดทุก Connection (ทดสอบการต่อใหม่อัตโนมัติ)
+
+ใช้ในโค้ด:
+    fake = FakeBitkubWS()
+    await fake.start()
+    feed = MarketFeed(on_price, url=fake.url)
+    await fake.trade("THB_BTC", 1_000_000, 0.01)
+
+หรือรันเป็น Server ที่สุ่มราคา (Random walk):
+    python benchmarks/fake_bitkub_ws.py --symbols THB_BTC THB_ETH --port 8765 --interval 0.2
+    (แล้วรันบอทด้วย WS_URL=ws://127.0.0.1:8765/websocket-api/)
+"""
+import argparse
+import asyncio
+import json
+import os
+import random
+import sys
+import time
+
+import websockets
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import utils  # noqa: E402
+
+
+def _stream_symbol(symbol):
+    return utils.normalize_symbol(symbol).lower()
+
+
+class FakeBitkubWS:
+    def __init__(self):
+        self.clients = {}   # Connection -> set ของ stream ที่ subscribe
+        self.server = None
+        self.url = None
+        self.sent = 0
+
+    async def start(self, host="127.0.0.1", port=0):
+        self.server = await websockets.serve(self._handler, host, port)
+        port = next(iter(self.server.sockets)).getsockname()[1]
+        self.url = f"ws://{host}:{port}/websocket-api/"
+        return self
+
+    async def stop(self):
+        if self.server is not None:
+            self.server.close()
+            await self.server.wait_closed()
+            self.server = None
+
+    async def _handler(self, ws, path=None):
+        # websockets รุ่นใหม่เก็บ path ไว้ที่ ws.request รุ่นเก่าส่งมาเป็น argument
+        request = getattr(ws, "request", None)
+        path = request.path if request is not None else (path or getattr(ws, "path", ""))
+        self.clients[ws] = set(path.rstrip("/").rsplit("/", 1)[-1].split(","))
+        try:
+            await ws.wait_closed()
+        finally:
+            self.clients.pop(ws, None)
+
+    async def _send(self, stream, message):
+        data = json.dumps(message)
+        for ws, streams in list(self.clients.items()):
+            if stream in streams:
+                try:
+                    await ws.send(data)
+                    self.sent += 1
+                except websockets.ConnectionClosed:
+                    pass
+
+    async def trade(self, symbol, price, amount=1.0, ts=None):
+        sym = _stream_symbol(symbol)
+        stream = f"market.trade.{sym}"
+        await self._send(stream, {
+            "stream": stream, "sym": sym.upper(), "txn": f"{sym.upper()}_{self.sent}",
+            "rat": price, "amt": amount, "bid": 0, "sid": 0, "ts": int(ts or time.time()),
+        })
+
+    async def ticker(self, symbol, last):
+        sym = _stream_symbol(symbol)
+        stream = f"market.ticker.{sym}"
+        await self._send(stream, {
+            "stream": stream, "id": 1, "last": last, "lowestAsk": last, "highestBid": last,
+            "percentChange": 0, "baseVolume": 0, "quoteVolume": 0, "isFrozen": 0,
+        })
+
+    async def drop(self):
+        """ตัดทุก Connection ที่เปิดอยู่"""
+        for ws in list(self.clients):
+            await ws.close()
+
+    async def wait_clients(self, count=1, timeout=5.0):
+        deadline = time.monotonic() + timeout
+        while len(self.clients) < count:
+            if time.monotonic() > deadline:
+                raise TimeoutError(f"{len(self.clients)}/{count} clients connected")
+            await asyncio.sleep(0.01)
+
+
+async def _serve(args):
+    fake = await FakeBitkubWS().start(port=args.port)
+    print(f"📡 {fake.url}")
+    prices = {symbol: 100.0 for symbol in args.symbols}
+    while True:
+        await asyncio.sleep(args.interval)
+        for symbol in args.symbols:
+            prices[symbol] *= 1 + random.gauss(0, args.volatility)
+            await fake.trade(symbol, round(prices[symbol], 6), round(random.uniform(0.01, 5), 4))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Fake Bitkub market-data WebSocket")
+    parser.add_argument("--symbols", nargs="+", default=["THB_BTC", "THB_ETH"])
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--interval", type=float, default=0.5, help="วินาทีระหว่าง Trade")
+    parser.add_argument("--volatility", type=float, default=0.002)
+    args = parser.parse_args()
+    asyncio.run(_serve(args))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,90 @@
+"""
+เทียบความเร็ว indicators.py: pandas path กับ Kernel (Numba) แบบทีละฟังก์ชันและแบบ fused (compute_all)
+
+    python benchmarks/indicators_bench.py
+    python benchmarks/indicators_bench.py --sizes 100 10000 1000000 --repeat 5
+"""
+import argparse
+import os
+import sys
+import time
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import indicators as ind  # noqa: E402
+import indicators_kernel as kernel  # noqa: E402
+
+
+def synthetic(n, seed=0):
+    rng = np.random.default_rng(seed)
+    close = 100 * np.exp(np.cumsum(rng.normal(0, 0.005, n)))
+    spread = np.abs(rng.normal(0, 0.002, n))
+    return pd.DataFrame({"close": close, "high": close * (1 + spread), "low": close * (1 - spread)})
+
+
+def best_of(fn, repeat):
+    best = float("inf")
+    for _ in range(repeat):
+        started = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - started)
+    return best
+
+
+def all_separately(df):
+    close = df["close"]
+    ind.calculate_rsi(close)
+    ind.calculate_macd(close)
+    ind.calculate_bollinger_bands(close)
+    ind.calculate_stochastic(close, df["high"], df["low"])
+    ind.calculate_ema(close, 20)
+    ind.calculate_ema(close, 50)
+    ind.calculate_adx(df, 14)
+
+
+def run(sizes, repeat):
+    rows = []
+    for n in sizes:
+        df = synthetic(n)
+        ind.USE_KERNEL = False
+        pandas_adx = best_of(lambda: ind.calculate_adx(df, 14), repeat)
+        pandas_all = best_of(lambda: all_separately(df), repeat)
+        row = {"n": n, "pandas_adx": pandas_adx, "pandas_all": pandas_all}
+        if kernel.HAVE_NUMBA:
+            ind.USE_KERNEL = True
+            all_separately(df.iloc[:100])   # JIT compile ก่อนจับเวลา
+            ind.calculate_all(df.iloc[:100])
+            row["kernel_adx"] = best_of(lambda: ind.calculate_adx(df, 14), repeat)
+            row["kernel_all"] = best_of(lambda: all_separately(df), repeat)
+            row["kernel_fused"] = best_of(lambda: ind.calculate_all(df), repeat)
+        rows.append(row)
+    ind.USE_KERNEL = kernel.ENABLED
+    return rows
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark indicator backends")
+    parser.add_argument("--sizes", type=int, nargs="+", default=[100, 1000, 100_000, 500_000])
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    if not kernel.HAVE_NUMBA:
+        print("⚠️ ไม่พบ numba (pip install numba) -> วัดเฉพาะ pandas path")
+
+    def ms(v):
+        return f"{v * 1000:10.3f}" if v is not None else f"{'-':>10}"
+
+    print(f"{'bars':>9} | {'pandas ADX':>10} {'kernel ADX':>10} {'x':>6} | {'pandas all':>10} {'kernel all':>10} {'fused':>10} {'x':>6}   (ms)")
+    for row in run(args.sizes, args.repeat):
+        k_adx, k_fused = row.get("kernel_adx"), row.get("kernel_fused")
+        adx_x = f"{row['pandas_adx'] / k_adx:6.1f}" if k_adx else f"{'-':>6}"
+        all_x = f"{row['pandas_all'] / k_fused:6.1f}" if k_fused else f"{'-':>6}"
+        print(f"{row['n']:>9,} | {ms(row['pandas_adx'])} {ms(k_adx)} {adx_x} | "
+              f"{ms(row['pandas_all'])} {ms(row.get('kernel_all'))} {ms(k_fused)} {all_x}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,287 @@
+"""
+Benchmark จุดที่ทำงานบ่อยของบอท บันทึกผลเป็น JSON เพื่อเทียบก่อน/หลังแก้โค้ด
+
+- micro : normalize_symbol, _sign_v3, ทุกฟังก์ชันใน indicators.py, analyze_market
+- db    : เขียน (save_order + update_cost_coin + flush) และอ่าน (get_orders, get_active_symbols)
+- cycle : run_loop 1 รอบ (check_server_health + run_cycle) กับ Bitkub จำลอง N เหรียญ
+
+ใช้งาน:
+    python benchmarks/run_bench.py --out bench_before.json
+    python benchmarks/run_bench.py --symbols 40 --latency 30 --compare bench_before.json
+    python benchmarks/run_bench.py --only cycle --fixtures benchmarks/fixtures/recorded.json
+"""
+import argparse
+import asyncio
+import json
+import logging
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+# ค่าหลอกสำหรับ Sign (Server จำลองไม่ตรวจ)
+os.environ.setdefault("API_KEY", "bench")
+os.environ.setdefault("API_SECRET", "bench")
+os.environ.pop("TELEGRAM_TOKEN", None)
+
+import numpy as np  # noqa: E402
+import pandas as pd  # noqa: E402
+
+import config  # noqa: E402
+import database as db  # noqa: E402
+import indicators as ind  # noqa: E402
+import indicators_kernel  # noqa: E402
+import utils  # noqa: E402
+from candle_archive import candle_archive  # noqa: E402
+from fake_bitkub import FakeBitkub, load_fixtures, synthetic_fixtures  # noqa: E402
+
+
+class _SilentWS:
+    async def broadcast(self, message):
+        pass
+
+    async def broadcast_json(self, payload):
+        pass
+
+
+def summarize(samples, per_call=1):
+    ms = sorted(s * 1000 / per_call for s in samples)
+    return {
+        "n": len(ms),
+        "mean_ms": round(statistics.fmean(ms), 6),
+        "p50_ms": round(ms[len(ms) // 2], 6),
+        "p95_ms": round(ms[min(len(ms) - 1, int(len(ms) * 0.95))], 6),
+        "min_ms": round(ms[0], 6),
+    }
+
+
+def timeit(fn, repeat=20, number=None):
+    """จับเวลา fn() -> สถิติต่อ 1 ครั้ง (ปรับ number อัตโนมัติให้แต่ละรอบนาน ~5ms)"""
+    if number is None:
+        number, started = 1, time.perf_counter()
+        fn()
+        once = time.perf_counter() - started
+        number = max(1, int(0.005 / max(once, 1e-9)))
+    samples = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        for _ in range(number):
+            fn()
+        samples.append(time.perf_counter() - started)
+    return summarize(samples, number)
+
+
+async def atimeit(fn, repeat=20):
+    samples = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        await fn()
+        samples.append(time.perf_counter() - started)
+    return summarize(samples)
+
+
+def candles_frame(n, seed=0):
+    rng = np.random.default_rng(seed)
+    close = 100 * np.exp(np.cumsum(rng.normal(0, 0.004, n)))
+    spread = np.abs(rng.normal(0, 0.002, n))
+    return pd.DataFrame({
+        "timestamp": pd.to_datetime(1_700_000_000 + np.arange(n) * 900, unit="s"),
+        "open": close, "close": close, "high": close * (1 + spread), "low": close * (1 - spread),
+        "volume": np.ones(n),
+    })
+
+
+# =====================================================================
+# --- Micro ---
+# =====================================================================
+def bench_micro(args):
+    from bitkub import BitkubClient
+    from bot_engine import BotEngine
+
+    results = {}
+    results["normalize_symbol.to_api"] = timeit(lambda: utils.normalize_symbol("THB_BTC", to_api=True))
+    results["normalize_symbol.to_db"] = timeit(lambda: utils.normalize_symbol("btc_thb", to_api=False))
+
+    api = BitkubClient()
+    payload = '{"amt":100,"rat":0,"sym":"btc_thb","typ":"market"}'
+    results["_sign_v3"] = timeit(lambda: api._sign_v3(1_700_000_000_000, "POST", "/api/v3/market/place-bid", payload))
+
+    df = candles_frame(config.CANDLE_BARS)
+    close = df["close"]
+    for name, fn in (
+        ("calculate_rsi", lambda: ind.calculate_rsi(close)),
+        ("calculate_macd", lambda: ind.calculate_macd(close)),
+        ("calculate_bollinger_bands", lambda: ind.calculate_bollinger_bands(close)),
+        ("calculate_stochastic", lambda: ind.calculate_stochastic(close, df["high"], df["low"])),
+        ("calculate_ema", lambda: ind.calculate_ema(close, 20)),
+        ("calculate_adx", lambda: ind.calculate_adx(df, 14)),
+        ("calculate_all", lambda: ind.calculate_all(df)),
+    ):
+        results[f"indicators.{name}"] = timeit(fn)
+
+    bot = BotEngine(_SilentWS())
+
+    def analyze_cold():
+        bot.indicators.clear()
+        bot.analyze_market(df, "THB_BTC", 4, 0)
+
+    # รอบปกติ: แท่งล่าสุดเปลี่ยนราคา (Streaming update เฉพาะแท่งสุดท้าย)
+    warm = df.copy()
+    bot.analyze_market(warm, "THB_WARM", 4, 0)
+    last = warm.columns.get_loc("close")
+
+    def analyze_warm():
+        warm.iat[-1, last] = warm.iat[-1, last] * 1.0001
+        bot.analyze_market(warm, "THB_WARM", 4, 0)
+
+    results["analyze_market.cold"] = timeit(analyze_cold)
+    results["analyze_market.warm"] = timeit(analyze_warm)
+    return results
+
+
+# =====================================================================
+# --- Database ---
+# =====================================================================
+async def _prepare_db(tmp, symbols):
+    db.DB_NAME = os.path.join(tmp, "bench.db")
+    db.init_db()
+    await db.open_pool()
+    for k in range(symbols):
+        await db.add_symbol(f"C{k:03d}_THB", 1000, 100, 1 + k % 4)
+
+
+async def bench_db(args, tmp):
+    await _prepare_db(tmp, args.symbols)
+    results = {}
+    symbol_ids = [row["id"] for row in await db.get_all_symbols()]
+
+    async def write():
+        for s_id in symbol_ids[:10]:
+            await db.update_cost_coin(s_id, 100.0, 0.001)
+            await db.save_order("C000_THB", {"id": "x", "amt": 100, "rat": 1.0, "typ": "market"}, "bench")
+        await db.journal.flush()
+
+    for _ in range(50):
+        await write()   # ให้มีประวัติพอสำหรับ get_orders
+
+    results["db.write_10_positions_10_orders"] = await atimeit(write, args.repeat)
+    results["db.get_active_symbols"] = await atimeit(db.get_active_symbols, args.repeat)
+    results["db.get_orders"] = await atimeit(lambda: db.get_orders(limit=50), args.repeat)
+    results["db.get_orders.symbol"] = await atimeit(lambda: db.get_orders(limit=50, symbol="C000_THB"), args.repeat)
+    await db.close_pool()
+    return results
+
+
+# =====================================================================
+# --- Full cycle ---
+# =====================================================================
+async def bench_cycle(args, tmp):
+    from bot_engine import BotEngine
+
+    await _prepare_db(tmp, args.symbols)
+    candle_archive.root = os.path.join(tmp, "candles")
+    names = [row["symbol"] for row in await db.get_all_symbols()]
+    fixtures = load_fixtures(args.fixtures) if args.fixtures else synthetic_fixtures(names, seed=args.seed)
+    if args.fixtures:
+        # ใช้กราฟที่บันทึกไว้วนให้ครบ N เหรียญ
+        recorded = list(fixtures["history"].values())
+        fixtures["history"] = {utils.normalize_symbol(n, to_api=True): recorded[k % len(recorded)] for k, n in enumerate(names)}
+
+    fake = FakeBitkub(fixtures, args.latency / 1000, args.jitter / 1000, seed=args.seed)
+    results = {}
+    async with fake.client() as client:
+        bot = BotEngine(_SilentWS(), http_client=client)
+        bot.api.clock.synced_at = time.monotonic()   # ไม่ต้อง sync นาฬิกาก่อนเริ่ม
+        bot.feed = None     # ไม่ต่อ WebSocket ของ Bitkub จริงระหว่าง Benchmark
+
+        async def cycle():
+            if await bot.check_server_health(client):
+                await bot.run_cycle(client)
+
+        started = time.perf_counter()
+        await cycle()
+        results["cycle.cold"] = summarize([time.perf_counter() - started])
+        fake.calls.clear()
+        results["cycle.warm"] = await atimeit(cycle, args.repeat)
+        results["cycle.warm"]["requests_per_cycle"] = {path: round(n / args.repeat, 2) for path, n in fake.calls.items()}
+    await db.close_pool()
+    return results
+
+
+def git_revision():
+    try:
+        return subprocess.check_output(["git", "rev-parse", "--short", "HEAD"], cwd=ROOT, text=True).strip()
+    except Exception:
+        return None
+
+
+def compare(results, baseline_path):
+    with open(baseline_path, encoding="utf-8") as f:
+        baseline = json.load(f)["results"]
+    print(f"\n{'benchmark':<36} {'before':>11} {'after':>11} {'change':>8}   (p50 ms)")
+    for name, stats in results.items():
+        old = baseline.get(name)
+        if old is None: continue
+        before, after = old["p50_ms"], stats["p50_ms"]
+        change = (after - before) / before * 100 if before else 0.0
+        flag = " ⚠️" if change > 10 else ""
+        print(f"{name:<36} {before:>11.4f} {after:>11.4f} {change:>+7.1f}%{flag}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the bot's hot paths")
+    parser.add_argument("--only", default="micro,db,cycle", help="กลุ่มที่จะรัน คั่นด้วย , (micro,db,cycle)")
+    parser.add_argument("--symbols", type=int, default=20, help="จำนวนเหรียญใน DB / cycle")
+    parser.add_argument("--latency", type=float, default=20.0, help="ms ต่อ Request ของ Bitkub จำลอง")
+    parser.add_argument("--jitter", type=float, default=5.0, help="ms")
+    parser.add_argument("--repeat", type=int, default=10)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--fixtures", help="ไฟล์ Fixture จาก fake_bitkub.py record (ไม่ระบุ = สุ่ม)")
+    parser.add_argument("--out", default="bench_results.json")
+    parser.add_argument("--compare", help="ไฟล์ผลเดิมสำหรับเทียบ")
+    args = parser.parse_args()
+    groups = set(args.only.split(","))
+
+    logging.getLogger("httpx").setLevel(logging.WARNING)
+    results = {}
+    with tempfile.TemporaryDirectory() as tmp:
+        if "micro" in groups:
+            results.update(bench_micro(args))
+        if "db" in groups:
+            results.update(asyncio.run(bench_db(args, tmp)))
+        if "cycle" in groups:
+            cycle_dir = os.path.join(tmp, "cycle")
+            os.makedirs(cycle_dir)
+            results.update(asyncio.run(bench_cycle(args, cycle_dir)))
+
+    for name, stats in results.items():
+        print(f"{name:<36} p50 {stats['p50_ms']:>10.4f} ms   p95 {stats['p95_ms']:>10.4f} ms")
+
+    report = {
+        "meta": {
+            "timestamp": int(time.time()),
+            "git": git_revision(),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "numba": indicators_kernel.HAVE_NUMBA,
+            "args": vars(args),
+        },
+        "results": results,
+    }
+    with open(args.out, "w", encoding="utf-8") as f:
+        json.dump(report, f, ensure_ascii=False, indent=2)
+    print(f"💾 {args.out}")
+
+    if args.compare:
+        compare(results, args.compare)
+
+
+if __name__ == "__main__":
+    main()
@@ -4,13 +4,99 @@ import json
 import hashlib
 import hmac
 import os
-import pandas as pd
+import asyncio
 from dotenv import load_dotenv
 import utils 
 import config
+import metrics
+from candle_store import candle_store, base_resolution
+from candle_archive import candle_archive, as_columns
+from http_pool import timeout_for
+from wallet_cache import WalletCache
+from rate_limiter import (get_bucket, get_class_bucket, backoff_delay, retry_after_seconds,
+                          CircuitBreaker, CircuitOpenError)
 
 load_dotenv()
 
+class ServerClock:
+    """
+    เก็บค่าต่างเวลา (offset) ระหว่างเครื่องเรากับ Server Bitkub
+    - วัดจาก /api/v3/servertime หลายครั้ง เลือกครั้งที่ RTT ต่ำสุด แล้วชดเชยครึ่งหนึ่งของ RTT
+    - รีเฟรชเป็นระยะใน background ทำให้การ Sign ไม่ต้องยิงขอเวลาทุกครั้ง
+    """
+    def __init__(self, base_url, refresh_interval=None, samples=None):
+        self.base_url = base_url
+        self.refresh_interval = refresh_interval or config.CLOCK_SYNC_INTERVAL
+        self.samples = samples or config.CLOCK_SYNC_SAMPLES
+        self.offset_ms = 0.0
+        self.rtt_ms = None
+        self.synced_at = None     # time.monotonic() ตอน sync สำเร็จล่าสุด
+        self._last_attempt = None
+        self._lock = asyncio.Lock()
+        self._task = None
+
+    def now_ms(self):
+        return int(time.time() * 1000 + self.offset_ms)
+
+    def needs_sync(self):
+        now = time.monotonic()
+        # ถ้า sync ล้มเหลว รอ 5 วินาทีก่อนลองใหม่ (ระหว่างนั้นใช้ offset เดิม)
+        if self._last_attempt is not None and now - self._last_attempt < 5:
+            return False
+        # Background task ปกติจะรีเฟรชก่อนถึง 2 เท่าของ interval เสมอ
+        return self.synced_at is None or now - self.synced_at > self.refresh_interval * 2
+
+    async def _sample(self, client: httpx.AsyncClient):
+        t0 = time.time() * 1000
+        response = await client.get(f"{self.base_url}/api/v3/servertime", timeout=timeout_for("servertime"))
+        t1 = time.time() * 1000
+        if response.status_code != 200:
+            raise ValueError(f"HTTP {response.status_code}: {response.text}")
+        server_ms = int(response.text)
+        rtt = t1 - t0
+        # สมมติว่าเวลาขาไปเท่ากับขากลับ -> Server ตอบตอนกึ่งกลาง RTT
+        return server_ms - (t0 + rtt / 2), rtt
+
+    async def sync(self, client: httpx.AsyncClient):
+        async with self._lock:
+            self._last_attempt = time.monotonic()
+            best = None
+            for _ in range(self.samples):
+                try:
+                    sample = await self._sample(client)
+                except Exception as e:
+                    print(f"⚠️ Clock Sync Error: {e}")
+                    continue
+                if best is None or sample[1] < best[1]:
+                    best = sample
+            if best is None:
+                return False
+            self.offset_ms, self.rtt_ms = best
+            self.synced_at = time.monotonic()
+            self._last_attempt = None
+            return True
+
+    async def run(self, client: httpx.AsyncClient):
+        while True:
+            await self.sync(client)
+            await asyncio.sleep(self.refresh_interval)
+
+    def start(self, client: httpx.AsyncClient):
+        if self._task is None or self._task.done():
+            self._task = asyncio.create_task(self.run(client))
+        return self._task
+
+    def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            self._task = None
+
+
+def _order_endpoint(self, client, sym, amt, rat, side, type='limit'):
+    # label ของ metrics สำหรับ place_order (ซื้อ/ขาย คนละ endpoint)
+    return "/api/v3/market/place-bid" if str(side).upper() == 'BUY' else "/api/v3/market/place-ask"
+
+
 class BitkubClient:
     def __init__(self):
         self.api_key = os.getenv("API_KEY")
@@ -24,15 +110,117 @@ class BitkubClient:
             "X-BTK-APIKEY": self.api_key,
         }
 
+        # 🟢 นาฬิกาที่ sync กับ Server ไว้แล้ว (ไม่ต้องขอ servertime ก่อน Sign ทุกครั้ง)
+        self.clock = ServerClock(self.base_url)
+
+        # 🟢 แท่งเทียนใช้ Store กลางร่วมกันทั้งโปรเซส (ดึงเฉพาะแท่งใหม่)
+        self.candles = candle_store
+        self.archive = candle_archive
+
+        # 🟢 หยุดยิง Bitkub ชั่วคราวเมื่อ Error ติดกัน หรือ /api/status แจ้งว่าไม่ ok
+        self.breaker = CircuitBreaker()
+
+        # 🟢 ยอด Wallet ล่าสุด (หมดอายุทันทีที่ส่ง/ยกเลิกคำสั่ง)
+        self.wallet = WalletCache(self)
+
+    # 🟢 เวลา/การพักของบอทผ่าน Exchange (Paper Replay ใช้นาฬิกาจำลองแทน)
+    exhausted = False
+    # 🟢 มีราคา Streaming จาก WebSocket ของ Bitkub (market_feed.py)
+    market_feed = True
+
+    def time(self):
+        return time.time()
+
+    async def sleep(self, seconds):
+        await asyncio.sleep(seconds)
+
+    # =====================================================================
+    # --- 🟢 ทุก Request ไป Bitkub ผ่านที่นี่ (Rate limit + Retry + Circuit breaker) ---
+    # =====================================================================
+    async def _request(self, client: httpx.AsyncClient, method, endpoint, query="", payload_str=None,
+                       signed=False, kind="market"):
+        """
+        - รอ token จาก bucket ราย endpoint และ bucket รวมของกลุ่ม (public / secure) ก่อนยิง
+        - GET (idempotent): Retry เมื่อ Network error / HTTP 5xx / 429 แบบ exponential backoff + jitter
+        - POST (สร้าง/ยกเลิกออเดอร์): Retry เฉพาะ HTTP 429 (Server ปฏิเสธไปแล้ว ไม่ได้ทำรายการ)
+        - HTTP 429: เคารพ Retry-After และลดอัตราของ bucket ลง (ค่อยๆ เพิ่มกลับเมื่อสำเร็จ)
+        - Request ที่ต้อง Sign จะ Sign ใหม่ทุกครั้งที่ Retry (timestamp ต้องสดเสมอ)
+        คืน httpx.Response (ผู้เรียกอ่าน .json() เอง) หรือ raise ถ้า Network error ครบจำนวนครั้ง
+        """
+        # /api/status และ servertime ไม่ผ่าน breaker (ใช้เช็คว่า Server กลับมาแล้ว และไม่นับเป็นผลของ endpoint อื่น)
+        breaker = None if endpoint in config.CIRCUIT_EXEMPT_ENDPOINTS else self.breaker
+        if breaker is not None and not breaker.allow():
+            raise CircuitOpenError(f"Circuit open, skipped {endpoint}")
+        # Request ทดลองของ half-open (None = ปกติ) ต้องคืนสิทธิ์เสมอแม้ถูก Cancel / Error ที่ไม่ได้นับผล
+        probe = breaker.probe_started if breaker is not None else None
+        try:
+            return await self._send(client, breaker, method, endpoint, query, payload_str, signed, kind)
+        finally:
+            if probe is not None:
+                breaker.end_probe(probe)
+
+    async def _send(self, client, breaker, method, endpoint, query, payload_str, signed, kind):
+        # ส่งจริง + Retry (ตามที่อธิบายไว้ใน _request)
+        url = f"{self.base_url}{endpoint}{query}"
+        buckets = (get_class_bucket(endpoint), get_bucket(endpoint))
+        idempotent = method == "GET"
+        attempt = 0
+        while True:
+            for bucket in buckets:
+                await bucket.acquire()
+
+            headers = None      # Public endpoint ไม่ต้องส่ง API Key
+            if signed:
+                ts = await self.get_signing_timestamp(client)
+                # GET: Payload คือ Query String (เริ่มด้วย ?), POST: JSON String ที่ส่งจริง
+                sig = self._sign_v3(ts, method, endpoint, query if method == "GET" else payload_str)
+                headers = {**self.headers, "X-BTK-TIMESTAMP": str(ts), "X-BTK-SIGN": sig}
+
+            try:
+                if method == "GET":
+                    response = await client.get(url, headers=headers, timeout=timeout_for(kind))
+                else:
+                    response = await client.post(url, headers=headers, content=payload_str, timeout=timeout_for(kind))
+            except httpx.TransportError:
+                if breaker is not None: breaker.record_failure()
+                if not idempotent or attempt >= config.RETRY_MAX_ATTEMPTS:
+                    raise
+                reason, delay = "network", backoff_delay(attempt)
+            else:
+                status = response.status_code
+                if status == 429:
+                    for bucket in buckets:
+                        bucket.penalize()
+                    if attempt >= config.RETRY_MAX_ATTEMPTS:
+                        if breaker is not None: breaker.record_failure()
+                        return response
+                    reason, delay = "429", retry_after_seconds(response)
+                    if delay is None:
+                        delay = backoff_delay(attempt)
+                elif status >= 500:
+                    if breaker is not None: breaker.record_failure()
+                    if not idempotent or attempt >= config.RETRY_MAX_ATTEMPTS:
+                        return response
+                    reason, delay = "5xx", backoff_delay(attempt)
+                else:
+                    for bucket in buckets:
+                        bucket.reward()
+                    if breaker is not None: breaker.record_success()
+                    return response
+
+            metrics.BITKUB_RETRIES.inc(endpoint, reason)
+            attempt += 1
+            await asyncio.sleep(delay)
+
     # --- 🟢 เพิ่มใน Class BitkubClient ---
+    @metrics.observe_api("/api/status")
     async def get_server_status(self, client: httpx.AsyncClient):
         """
         ดึงสถานะ Server (Non-secure และ Secure endpoints)
         """
         try:
-            url = f"{self.base_url}/api/status"
             # ไม่ต้อง Sign signature เพราะเป็น Public endpoint
-            response = await client.get(url, timeout=5.0)
+            response = await self._request(client, "GET", "/api/status", kind="status")
             
             if response.status_code == 200:
                 return response.json()
@@ -43,9 +231,10 @@ class BitkubClient:
             return [{"name": "Connection", "status": "error", "message": str(e)}]
 
     # --- 🟢 (1) ขอเวลา Server เป็น Milliseconds (ตาม Doc V3) ---
+    @metrics.observe_api("/api/v3/servertime")
     async def get_server_timestamp(self, client: httpx.AsyncClient):
         try:
-            response = await client.get(f"{self.base_url}/api/v3/servertime")
+            response = await self._request(client, "GET", "/api/v3/servertime", kind="servertime")
             if response.status_code == 200:
                 # Doc V3: Response คือตัวเลข timestamp (ms) เพียวๆ
                 return int(response.text)
@@ -57,6 +246,12 @@ class BitkubClient:
             print(f"⚠️ Get Server Time Error: {e}")
             return int(time.time() * 1000)
 
+    async def get_signing_timestamp(self, client: httpx.AsyncClient):
+        """เวลา Server (ms) สำหรับ Sign คำนวณจากเวลาเครื่อง + offset ที่ sync ไว้"""
+        if self.clock.needs_sync():
+            await self.clock.sync(client)
+        return self.clock.now_ms()
+
     # --- 🟢 (2) สร้าง Signature แบบ V3 ---
     # สูตร: HMAC_SHA256( Timestamp + Method + Endpoint + Payload )
     def _sign_v3(self, timestamp_ms, method, endpoint, payload_str):
@@ -69,66 +264,87 @@ class BitkubClient:
             hashlib.sha256
         ).hexdigest()
 
-    # 🟢 [แก้ไข] ไม่ต้องรับค่า resolution แล้ว ให้ดึงจาก config โดยตรง
-    async def get_candles(self, client: httpx.AsyncClient, symbol):
+    @metrics.observe_api("/tradingview/history")
+    async def fetch_history(self, client: httpx.AsyncClient, symbol, resolution, from_time, to_time):
+        """ดึงข้อมูลดิบจาก /tradingview/history (dict ที่มี s, t, o, h, l, c, v)"""
+        query_symbol = utils.normalize_symbol(symbol, to_api=True)
+        query = f"?symbol={query_symbol}&resolution={resolution}&from={from_time}&to={to_time}"
+        response = await self._request(client, "GET", "/tradingview/history", query)
+        return response.json()
+
+    @metrics.timed(metrics.STAGE_SECONDS, "get_candles")
+    async def get_candles(self, client: httpx.AsyncClient, symbol, timeframe=None):
+        """
+        กราฟของเหรียญตาม timeframe (นาที, ค่าเริ่มต้น config.TIMEFRAME)
+        Timeframe ใน RESAMPLE_TIMEFRAMES ใช้ stream BASE_TIMEFRAME เดียวกัน (ไม่ยิง API เพิ่มต่อ Timeframe)
+        """
         try:
             query_symbol = utils.normalize_symbol(symbol, to_api=True)
-            current_time = int(time.time())
-            
-            # 🟢 [แก้ไข] ดึงค่า TIMEFRAME จาก config.py
-            resolution = config.TIMEFRAME 
-            
-            # คำนวณเวลาย้อนหลัง: สมมติเอากราฟ 100 แท่งย้อนหลัง
-            # (resolution เป็นนาที * 60 วินาที * 100 แท่ง)
-            from_time = current_time - (resolution * 60 * 100) 
             
-            url = f"{self.base_url}/tradingview/history?symbol={query_symbol}&resolution={resolution}&from={from_time}&to={current_time}"
-            response = await client.get(url, timeout=10.0)
-            data = response.json()
-            
-            if data.get("s") == "ok":
-                df = pd.DataFrame({
-                    "timestamp": pd.to_datetime(data["t"], unit="s"),
-                    "close": data["c"],
-                    "high": data["h"],
-                    "low": data["l"]
-                })
-                return df
-            return None
+            timeframe = timeframe or config.TIMEFRAME
+            resolution = base_resolution(timeframe)
+            key = (query_symbol, resolution)
+            bar_seconds = resolution * 60
+
+            async with self.candles.lock(key):
+                current_time = int(time.time())
+                # ย้อนหลังพอสำหรับ Timeframe ที่ใช้จริงจาก stream นี้ (Timeframe เหรียญ + TREND_TIMEFRAME)
+                grown = self.candles.reserve(key, timeframe)
+                window_start = current_time - (bar_seconds * self.candles.bars(key))
+                # 🟢 ใช้แท่งล่าสุดที่ Server ยืนยัน (Trade จาก WS อาจเปิดแท่งใหม่ไปก่อนแล้ว)
+                last_ts = self.candles.confirmed_timestamp(key)
+
+                if last_ts is None or last_ts < window_start or grown:
+                    # ยังไม่มีข้อมูล หรือข้อมูลเก่าเกินหน้าต่าง -> seed จากคลังบนดิสก์ก่อน แล้วดึงเฉพาะส่วนที่ขาด
+                    self.candles.reset(key)
+                    # 🟢 เติมคลังให้ครบหน้าต่าง (รวมช่องว่างกลางไฟล์จากช่วงที่บอทไม่ได้รัน) ก่อน seed
+                    window_start -= window_start % bar_seconds
+                    await self.archive.backfill(self, client, symbol, resolution, window_start)
+                    archived = self.archive.read(symbol, resolution, start=window_start)
+                    if len(archived):
+                        self.candles.merge(key, as_columns(archived))
+                        last_ts = self.candles.confirmed_timestamp(key)
+                        from_time = last_ts
+                    else:
+                        from_time = window_start
+                else:
+                    # ดึงเฉพาะแท่งล่าสุด (แท่งที่ยังไม่ปิด) เป็นต้นไป
+                    from_time = last_ts
+
+                data = await self.fetch_history(client, symbol, resolution, from_time, current_time)
+                status = data.get("s")
+                if status == "ok":
+                    self.candles.merge(key, data)
+                    # เก็บแท่งที่ปิดแล้วลงคลัง (แท่งที่ยังไม่ปิดไม่ถูกเขียน)
+                    self.archive.append(symbol, resolution, data, current_time)
+                elif status != "no_data" or last_ts is None:
+                    return None
+                return self.candles.frame(key, timeframe)
         except Exception as e:
             print(f"Error fetching candles for {symbol}: {e}")
             return None      
         
+    def cached_candles(self, symbol, timeframe):
+        """กราฟ timeframe อื่นจาก stream ที่ get_candles ดึงไว้แล้ว (ไม่ยิง API) หรือ None ถ้ายังไม่มี"""
+        key = (utils.normalize_symbol(symbol, to_api=True), base_resolution(timeframe))
+        return self.candles.frame(key, timeframe)
+
+    @metrics.observe_api("/api/v3/market/wallet")
     async def get_wallet(self, client: httpx.AsyncClient):
-        endpoint = "/api/v3/market/wallet"
-        method = "POST"
-        
-        # 🟢 ขอเวลา (ms)
-        ts = await self.get_server_timestamp(client)
-        
         # Wallet V3 ไม่มี Parameter แต่เป็น POST จึงส่ง Empty JSON
         payload = {}
         payload_str = json.dumps(payload, separators=(',', ':'), sort_keys=True)
         
-        # สร้าง Signature
-        sig = self._sign_v3(ts, method, endpoint, payload_str)
-        
-        headers = {
-            "Accept": "application/json",
-            "Content-Type": "application/json",
-            "X-BTK-APIKEY": self.api_key,
-            "X-BTK-TIMESTAMP": str(ts),
-            "X-BTK-SIGN": sig
-        }
-        
         try:
-            # ส่ง payload_str (ซึ่งคือ "{}")
-            response = await client.post(f"{self.base_url}{endpoint}", headers=headers, data=payload_str)
+            # ส่ง payload_str (ซึ่งคือ "{}") Sign ด้วยเวลา Server จากนาฬิกาที่ sync ไว้
+            response = await self._request(client, "POST", "/api/v3/market/wallet", payload_str=payload_str,
+                                           signed=True, kind="trade")
             return response.json()
         except Exception as e:
             print(f"Wallet API Error: {e}")
             return {"error": 1}
 
+    @metrics.observe_api(_order_endpoint)
     async def place_order(self, client: httpx.AsyncClient, sym, amt, rat, side, type='limit'):
         query_symbol = utils.normalize_symbol(sym, to_api=True).lower()
 
@@ -138,8 +354,6 @@ class BitkubClient:
             endpoint = "/api/v3/market/place-ask"
         else:
             return {'error': 999, 'result': 'Invalid side'}
-        
-        method = "POST"
 
         # 🟢 1. ป้องกันเลข Scientific Notation (เช่น 4.7e-05) เปลี่ยนเป็นสติงเรียบๆ
         def num_to_str(n):
@@ -149,25 +363,14 @@ class BitkubClient:
         amt_str = num_to_str(amt)
         rat_str = num_to_str(rat)
 
-        ts = await self.get_server_timestamp(client)
-
         # 🟢 2. สร้าง JSON String ด้วยตัวเองเพื่อบังคับฟอร์แมตตัวเลข และเรียงคีย์ให้ตรงเป๊ะ
         # คีย์ต้องเรียงตามลำดับตัวอักษร: amt, rat, sym, typ เพื่อให้ทำ Signature ผ่าน
         payload_str = f'{{"amt":{amt_str},"rat":{rat_str},"sym":"{query_symbol}","typ":"{type}"}}'
-        
-        sig = self._sign_v3(ts, method, endpoint, payload_str)
-
-        headers = {
-            "Accept": "application/json",
-            "Content-Type": "application/json",
-            "X-BTK-APIKEY": self.api_key,
-            "X-BTK-TIMESTAMP": str(ts),
-            "X-BTK-SIGN": sig
-        }
 
-        url = f"{self.base_url}{endpoint}"
+        # ยอดเงินเปลี่ยน (แม้ Request จะ Error ก็อาจส่งถึง Bitkub แล้ว)
+        self.wallet.invalidate()
         try:
-            response = await client.post(url, headers=headers, data=payload_str)
+            response = await self._request(client, "POST", endpoint, payload_str=payload_str, signed=True, kind="trade")
             
             if response.status_code != 200:
                 print(f"❌ Bitkub API Error ({response.status_code}): {response.text}")
@@ -184,43 +387,39 @@ class BitkubClient:
         except Exception as e:
             return {"error": -1, "result": str(e)}
 
+    @metrics.observe_api("/api/v3/market/bids")
     async def get_bids(self, client: httpx.AsyncClient, sym, limit=5):
         query_symbol = utils.normalize_symbol(sym, to_api=True)
         try:
-            url = f"{self.base_url}/api/v3/market/bids?sym={query_symbol}&lmt={limit}"
-            response = await client.get(url, headers=self.headers)
+            response = await self._request(client, "GET", "/api/v3/market/bids", f"?sym={query_symbol}&lmt={limit}")
             return response.json()
         except Exception as e:
             print(f"Error fetching bids for {sym}: {e}")
             return {"error": 1, "result": []}
         
+    @metrics.observe_api("/api/v3/market/asks")
+    async def get_asks(self, client: httpx.AsyncClient, sym, limit=5):
+        query_symbol = utils.normalize_symbol(sym, to_api=True)
+        try:
+            response = await self._request(client, "GET", "/api/v3/market/asks", f"?sym={query_symbol}&lmt={limit}")
+            return response.json()
+        except Exception as e:
+            print(f"Error fetching asks for {sym}: {e}")
+            return {"error": 1, "result": []}
+
     # --- 🟢 (ใหม่) ดึงออเดอร์ที่ค้างอยู่ ---
+    @metrics.observe_api("/api/v3/market/my-open-orders")
     async def get_open_orders(self, client: httpx.AsyncClient, sym):
-        endpoint = "/api/v3/market/my-open-orders"
-        method = "GET" # 🟢 1. เปลี่ยนเป็น GET ตาม Document
         query_symbol = utils.normalize_symbol(sym, to_api=True).lower()
         
-        ts = await self.get_server_timestamp(client)
-        
-        # 🟢 2. สำหรับ GET V3: Payload คือ Query String (เริ่มด้วย ?)
+        # 🟢 สำหรับ GET V3: Payload คือ Query String (เริ่มด้วย ?)
         # ไม่ต้องใช้ json.dumps แต่ใช้ string format ตรงๆ
         payload_str = f"?sym={query_symbol}" 
         
-        # สร้าง Signature (Timestamp + Method + Endpoint + QueryString)
-        sig = self._sign_v3(ts, method, endpoint, payload_str)
-        
-        headers = {
-            "Accept": "application/json",
-            "Content-Type": "application/json",
-            "X-BTK-APIKEY": self.api_key,
-            "X-BTK-TIMESTAMP": str(ts),
-            "X-BTK-SIGN": sig
-        }
-        
         try:
-            # 🟢 3. ส่ง Request โดยต่อ URL + Query String
-            full_url = f"{self.base_url}{endpoint}{payload_str}"
-            response = await client.get(full_url, headers=headers)
+            # 🟢 GET ตาม Document (Sign ด้วย Timestamp + Method + Endpoint + QueryString)
+            response = await self._request(client, "GET", "/api/v3/market/my-open-orders", payload_str,
+                                           signed=True, kind="trade")
             
             # Debug: เช็คว่าตอบอะไรกลับมา ถ้าไม่ใช่ 200
             if response.status_code != 200:
@@ -232,14 +431,24 @@ class BitkubClient:
             print(f"Get Open Orders Error: {e}")
             return {"error": 999, "result": [], "message": str(e)}
 
+    # --- 🟢 สถานะของออเดอร์ (จำนวนที่ match แล้ว + ประวัติการ match) ---
+    @metrics.observe_api("/api/v3/market/order-info")
+    async def get_order_info(self, client: httpx.AsyncClient, sym, order_id, side):
+        query_symbol = utils.normalize_symbol(sym, to_api=True).lower()
+        payload_str = f"?sym={query_symbol}&id={order_id}&sd={side.lower()}"
+        try:
+            response = await self._request(client, "GET", "/api/v3/market/order-info", payload_str,
+                                           signed=True, kind="trade")
+            return response.json()
+        except Exception as e:
+            print(f"Order Info Error: {e}")
+            return {"error": 999, "result": {}, "message": str(e)}
+
     # --- 🟢 (ใหม่) ยกเลิกออเดอร์ ---
+    @metrics.observe_api("/api/v3/market/cancel-order")
     async def cancel_order(self, client: httpx.AsyncClient, sym, order_id, side):
-        endpoint = "/api/v3/market/cancel-order"
-        method = "POST"
         query_symbol = utils.normalize_symbol(sym, to_api=True).lower()
         
-        ts = await self.get_server_timestamp(client)
-        
         # Bitkub V3 Cancel ต้องส่ง sym, id, sd (side)
         payload = {
             "sym": query_symbol,
@@ -248,20 +457,21 @@ class BitkubClient:
         }
         
         payload_str = json.dumps(payload, separators=(',', ':'), sort_keys=True)
-        sig = self._sign_v3(ts, method, endpoint, payload_str)
-        
-        headers = {
-            "Accept": "application/json",
-            "Content-Type": "application/json",
-            "X-BTK-APIKEY": self.api_key,
-            "X-BTK-TIMESTAMP": str(ts),
-            "X-BTK-SIGN": sig
-        }
         
         try:
             print(f"🚫 Cancelling order {order_id} ({side})...")
-            response = await client.post(f"{self.base_url}{endpoint}", headers=headers, data=payload_str)
+            self.wallet.invalidate()
+            response = await self._request(client, "POST", "/api/v3/market/cancel-order", payload_str=payload_str,
+                                           signed=True, kind="trade")
             return response.json()
         except Exception as e:
             print(f"Cancel Order Error: {e}")
-            return {"error": 999}
\ No newline at end of file
+            return {"error": 999}
+
+
+def create_exchange():
+    """Exchange ตาม config.EXCHANGE_BACKEND: "bitkub" = ของจริง, "paper" = จำลอง (paper_exchange.py)"""
+    if config.EXCHANGE_BACKEND == "paper":
+        from paper_exchange import PaperExchange
+        return PaperExchange(replay_start=config.PAPER_REPLAY_START, replay_end=config.PAPER_REPLAY_END)
+    return BitkubClient()
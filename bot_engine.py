@@ -3,38 +3,81 @@ import httpx
 import logging
 import os
 import database as db
-import indicators as ind
 import config  
 import utils   
 import time
-from bitkub import BitkubClient
+import metrics
+from bitkub import create_exchange
+from execution import Executor
+from engine_state import EngineCheckpoint, TrackedDict
+from market_feed import MarketFeed, HAVE_WEBSOCKETS
+from ttp_monitor import TrailingMonitor
+from reconcile import OrderReconciler
+from indicators_stream import IndicatorSet
+from http_pool import timeout_for
 
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(message)s')
 
 class BotEngine:
-    def __init__(self, ws_manager):
+    def __init__(self, ws_manager, http_client=None, exchange=None):
         self.running = False
         self.ws_manager = ws_manager
-        self.api = BitkubClient()
+        # 🟢 Bitkub จริง หรือ Paper Exchange ตาม config.EXCHANGE_BACKEND
+        self.api = exchange or create_exchange()
+        # 🟢 ส่งคำสั่งแบบดู Order book (Market / Marketable limit / แบ่งก้อน)
+        self.executor = Executor(self.api)
+        # 🟢 httpx.AsyncClient กลางของแอป (ถ้าไม่ส่งมา run_loop จะสร้างใช้เอง)
+        self.http = http_client
         self.tg_token = os.getenv("TELEGRAM_TOKEN")
         self.chat_id = os.getenv("CHAT_ID")
-        self.last_status = {}
+        self.last_status = TrackedDict()
         self.server_status_ok = True 
         self.last_server_msg = "All endpoints ok"
         self.processing_coins = set()
         
-        self.trailing_highs = {} 
-        self.market_regimes = {} 
+        self.trailing_highs = TrackedDict() 
+        self.market_regimes = TrackedDict() 
         # 🟢 [ใหม่] หน่วยความจำสำหรับล็อคกลยุทธ์ (ป้องกัน Open Position Clash)
-        self.active_auto_strategies = {} 
+        self.active_auto_strategies = TrackedDict() 
+        # 🟢 Checkpoint 4 ตัวบนลง DB (โหลดกลับตอน run_loop ครั้งแรก) ให้ Restart แล้วทำงานต่อได้ทันที
+        self.checkpoint = EngineCheckpoint(self)
+        self._state_restored = False
+        # 🟢 ราคาแบบ Streaming (WebSocket) -> เช็ค TTP ทันทีที่ราคาขยับ ไม่ต้องรอรอบ Polling
+        self.feed = None
+        if config.WS_FEED_ENABLED and self.api.market_feed:
+            if HAVE_WEBSOCKETS:
+                self.feed = MarketFeed(self.on_price, self.api.candles)
+            else:
+                print("⚠️ websockets not installed: market feed disabled (polling only)")
+        self._client = None
+        self._task = None       # Task ของ run_loop (สร้างผ่าน start() เพื่อให้ stop() รอจนจบได้)
+        # 🟢 TTP แยกเป็น Task ของตัวเอง (เช็คราคาทุก Tick แบบ O(1) ไม่ต้องรอรอบ Strategy)
+        self.ttp = TrailingMonitor(self)
+        # 🟢 กระทบยอดออเดอร์ค้างของทุกเหรียญพร้อมกัน (ตามรอบ + ตอนสัญญาณเปลี่ยน)
+        self.reconciler = OrderReconciler(self)
+        # 🟢 Indicator แบบ Streaming แยกตามเหรียญ (คำนวณเฉพาะแท่งที่เปลี่ยน)
+        self.indicators = {}
+        # 🟢 สถิติรอบล่าสุดของ run_loop (ใช้โชว์ใน /bot-status)
+        self.last_cycle = {}
+        # 🟢 สถานะล่าสุดที่ส่งให้ Dashboard ผ่าน /ws (ราคา, ยอดเงิน)
+        self.prices = {}
+        self.wallet_thb = None
+        self._published = {}
+        # 🟢 ยอด Wallet ใช้ cache กลางของ Exchange (ดึงใหม่แล้วส่งยอด THB ไป Dashboard อัตโนมัติ)
+        self.wallet = self.api.wallet
+        self.wallet.subscribe(self.update_wallet)
+        db.journal.subscribe(self._on_journal_flush)
     
     async def send_telegram(self, message):
         if not self.tg_token or not self.chat_id: return 
         url = f"https://api.telegram.org/bot{self.tg_token}/sendMessage"
         payload = {"chat_id": self.chat_id, "text": message, "parse_mode": "HTML"}
         try:
-            async with httpx.AsyncClient() as client:
-                await client.post(url, data=payload, timeout=10.0)
+            if self.http is not None:
+                await self.http.post(url, data=payload, timeout=timeout_for("telegram"))
+            else:
+                async with httpx.AsyncClient() as client:
+                    await client.post(url, data=payload, timeout=timeout_for("telegram"))
         except Exception as e: print(f"Telegram Error: {e}")
 
     async def check_server_health(self, client):
@@ -53,6 +96,14 @@ class BotEngine:
             is_all_ok = False
             error_messages.append("Invalid Status Response")
 
+        # 🟢 Circuit breaker: Server แจ้งว่าไม่ ok -> หยุดยิง endpoint อื่นทันที
+        # ถ้า breaker เปิดอยู่จาก Error ติดกัน (Network/5xx/429) ให้พักรอบนี้ไปก่อนเช่นกัน
+        if not is_all_ok:
+            self.api.breaker.trip()
+        elif self.api.breaker.state == "open":
+            is_all_ok = False
+            error_messages.append("Circuit breaker open (too many failed requests)")
+
         current_msg = "All Systems Operational" if is_all_ok else " | ".join(error_messages)
 
         if is_all_ok != self.server_status_ok:
@@ -69,23 +120,84 @@ class BotEngine:
         if "BUY" in message or "SELL" in message or "Error" in message or "Active" in message or "Changed" in message:
             await self.send_telegram(message)
 
+    # ==============================================================
+    # 🟢 Event สำหรับ Dashboard (JSON ผ่าน /ws แทนการ Polling)
+    # ==============================================================
+    async def publish(self, event_type, **data):
+        await self.ws_manager.broadcast_json({"type": event_type, **data})
+
+    async def snapshot(self):
+        """สถานะทั้งหมดที่หน้าเว็บต้องใช้ ส่งครั้งแรกตอนเชื่อมต่อ /ws"""
+        return {
+            "type": "snapshot",
+            "running": self.running,
+            "last_cycle": self.last_cycle,
+            "symbols": await db.get_all_symbols(),
+            "prices": {sym: p["last"] for sym, p in self.prices.items()},
+            "regimes": self.market_regimes,
+            "wallet": self.wallet_thb,
+        }
+
+    async def _on_journal_flush(self, orders, positions):
+        # ออเดอร์ใหม่ / cost-coin ที่เปลี่ยน หลังบันทึกลง DB แล้ว
+        for s_id, (cost, coin) in positions.items():
+            self.ttp.update_position(s_id, cost, coin)
+        if positions:
+            await self.publish("positions", positions=[
+                {"id": s_id, "cost": cost, "coin": coin} for s_id, (cost, coin) in positions.items()
+            ])
+        if orders:
+            await self.publish("orders", orders=orders)
+
+    async def update_wallet(self, wallet):
+        if not isinstance(wallet, dict) or wallet.get('error') != 0: return
+        thb = wallet.get('result', {}).get('THB', 0.0)
+        if thb != self.wallet_thb:
+            self.wallet_thb = thb
+            await self.publish("wallet", THB=thb)
+
+    def set_price(self, sym, last_price, ts=None):
+        self.prices[sym] = {"last": float(last_price), "ts": ts if ts is not None else time.time()}
+
+    def get_price(self, sym, max_age=None):
+        """
+        ราคาล่าสุดที่บอทเห็นของเหรียญนั้น {"last", "ts", "age", "stale"} (O(1) ไม่ยิง API)
+        stale = True ถ้าเก่ากว่า max_age วินาที (ค่าเริ่มต้น config.PRICE_MAX_AGE)
+        """
+        entry = self.prices.get(sym)
+        if entry is None: return None
+        max_age = config.PRICE_MAX_AGE if max_age is None else max_age
+        age = time.time() - entry["ts"]
+        return {"last": entry["last"], "ts": entry["ts"], "age": round(age, 3), "stale": age > max_age}
+
+    async def _publish_price(self, sym, last_close, regime, actual_strat, signal):
+        self.set_price(sym, last_close)
+        state = (float(last_close), regime, actual_strat, signal)
+        # ส่งเฉพาะเมื่อมีอะไรเปลี่ยน
+        if self._published.get(sym) == state: return
+        self._published[sym] = state
+        await self.publish("price", symbol=sym, last=float(last_close), regime=regime, active_strat=actual_strat, signal=signal)
+
+    def _indicator_rows(self, symbol, timeframe, df):
+        # 🟢 อัปเดต Indicator แบบ Streaming เฉพาะแท่งที่เปลี่ยน (ไม่คำนวณใหม่ทั้ง DataFrame) แยกตาม Timeframe
+        key = (symbol, timeframe)
+        state = self.indicators.get(key)
+        if state is None:
+            state = self.indicators[key] = IndicatorSet()
+        return state.sync(df).rows
+
     # 🟢 เพิ่มการรับค่า coin_balance เข้ามาเพื่อใช้เช็ค Open Position
-    def analyze_market(self, df, symbol, strategy_type, coin_balance):
-        df["RSI"] = ind.calculate_rsi(df["close"])
-        df["MACD"], df["Signal"] = ind.calculate_macd(df["close"])
-        df["BB_Mid"], df["BB_Upper"], df["BB_Lower"] = ind.calculate_bollinger_bands(df["close"])
-        
-        df["EMA_20"] = ind.calculate_ema(df["close"], 20)
-        df["EMA_50"] = ind.calculate_ema(df["close"], 50)
-        df["ADX"] = ind.calculate_adx(df, 14)
+    # trend_df = กราฟ Timeframe ใหญ่ (config.TREND_TIMEFRAME) ใช้กรองสัญญาณ BUY ตอนกราฟใหญ่เป็นขาลง
+    def analyze_market(self, df, symbol, strategy_type, coin_balance, timeframe=None, trend_df=None):
+        rows = self._indicator_rows(symbol, timeframe, df)
         
-        last = df.iloc[-1]
+        last = rows[-1]
         trend = "Downtrend" if last["MACD"] < last["Signal"] else "Uptrend"
         
         # 🟢 [1. ระบบดักจับ Whipsaw] เช็คย้อนหลัง 3 แท่งเทียนเพื่อความชัวร์ 100%
         try:
-            is_bullish = all(df["EMA_20"].iloc[-i] > df["EMA_50"].iloc[-i] for i in range(1, 4)) and all(df["ADX"].iloc[-i] >= 25 for i in range(1, 4))
-            is_bearish = all(df["EMA_20"].iloc[-i] < df["EMA_50"].iloc[-i] for i in range(1, 4)) and all(df["ADX"].iloc[-i] >= 25 for i in range(1, 4))
+            is_bullish = all(rows[-i]["EMA_20"] > rows[-i]["EMA_50"] for i in range(1, 4)) and all(rows[-i]["ADX"] >= 25 for i in range(1, 4))
+            is_bearish = all(rows[-i]["EMA_20"] < rows[-i]["EMA_50"] for i in range(1, 4)) and all(rows[-i]["ADX"] >= 25 for i in range(1, 4))
         except IndexError:
             is_bullish, is_bearish = False, False # กราฟไม่พอ
 
@@ -132,40 +244,59 @@ class BotEngine:
                 signal, decisions = "SELL", [f"Scalp SELL (RSI {last['RSI']:.2f})"]
 
         elif actual_strat == 3:
-            prev = df.iloc[-2] 
+            prev = rows[-2] 
             if prev["MACD"] <= prev["Signal"] and last["MACD"] > last["Signal"]:
                 signal, decisions = "BUY", ["MACD Golden Cross"]
             elif prev["MACD"] >= prev["Signal"] and last["MACD"] < last["Signal"]:
                 signal, decisions = "SELL", ["MACD Death Cross"]
+
+        # 🟢 [3. Trend Filter] ไม่เปิด/ถัวไม้ใหม่ถ้ากราฟ Timeframe ใหญ่เป็นขาลง (ขายได้ตามปกติ)
+        if signal == "BUY" and trend_df is not None and len(trend_df):
+            htf = self._indicator_rows(symbol, config.TREND_TIMEFRAME, trend_df)[-1]
+            if htf["EMA_20"] < htf["EMA_50"]:
+                signal, decisions = "HOLD", [f"BUY blocked: {config.TREND_TIMEFRAME}m Downtrend"]
                 
         # 🟢 คืนค่า regime และ actual_strat กลับไปให้หน้าเว็บด้วย
         return signal, ", ".join(decisions), last["close"], regime, actual_strat
 
+    @metrics.timed(metrics.STAGE_SECONDS, "execute_trade")
     async def execute_trade(self, client, symbol_data, action, price, reason):
         s_id = symbol_data['id']
         sym = symbol_data['symbol']
         cost = symbol_data['cost']
         coin = symbol_data['coin']
         cost_st = symbol_data['cost_st']
+
+        # 🟢 ยังมี Limit order ฝั่งเดียวกันค้างอยู่ -> รอ reconciler ยืนยันผล/ยกเลิกก่อน (ไม่ส่งซ้ำ)
+        if any(row['side'] == action.lower() for row in (await db.get_pending_orders(sym)).values()):
+            return
         
-        wallet = await self.api.get_wallet(client)
+        # 🟢 ใช้ยอดจาก cache (หมดอายุทุกครั้งที่ส่ง/ยกเลิกคำสั่ง) ดึงใหม่เฉพาะตอนยอดดูเหมือนไม่พอ
+        wallet = await self.wallet.get(client)
         
         if action == "BUY":
             thb_balance = wallet.get('result', {}).get('THB', 0)
+            if thb_balance < cost_st:
+                wallet = await self.wallet.get(client, max_age=0)
+                thb_balance = wallet.get('result', {}).get('THB', 0)
             if thb_balance < cost_st: return
-            res = await self.api.place_order(client, sym, cost_st, 0, 'buy', type='market')
+            res = await self.executor.execute(client, sym, 'buy', cost_st, price)
+            metrics.TRADES.inc("buy", "ok" if res.get('error') == 0 else str(res.get('error')))
             
             if res.get('error') == 0:
-                result = res['result']
-                received_coin = result.get('rec', 0)
-                if received_coin == 0: received_coin = cost_st / price
-                new_cost = cost + cost_st
+                # นับเฉพาะส่วนที่ match แล้ว (ส่วน Limit ที่ค้างอยู่ reconciler จะนับเพิ่มตอน match)
+                received_coin = res['received']
+                new_cost = cost + res['spent']
                 new_coin = coin + received_coin
-                result['rat'] = price 
                 
                 await db.update_cost_coin(s_id, new_cost, new_coin)
-                await db.save_order(sym, result, f"BUY: {reason}")
-                await self.log_and_broadcast(f"✅ {sym} BUY Market Success (Got: {received_coin:.8f} Coin)")
+                for result in res['orders']:
+                    await db.save_order(sym, result, f"BUY: {reason}")
+                for order in res['pending']:
+                    await db.track_pending_order(sym, 'buy', order['result'], self.api.time(),
+                                                 order['filled'], order['received'])
+                await db.journal.flush() # บันทึก position + order ใน Transaction เดียว
+                await self.log_and_broadcast(f"✅ {sym} BUY {res['mode'].title()} Success (Got: {received_coin:.8f} Coin)")
             else:
                 await self.log_and_broadcast(f"❌ {sym} BUY Error: {res.get('error')}")
 
@@ -173,24 +304,32 @@ class BotEngine:
             if coin <= 0: return
             coin_name = sym.split('_')[1] 
             real_balance = float(wallet.get('result', {}).get(coin_name, 0))
+            if real_balance < coin:
+                wallet = await self.wallet.get(client, max_age=0)
+                real_balance = float(wallet.get('result', {}).get(coin_name, 0))
             sell_amount = min(coin, real_balance)
 
             if (sell_amount * price) < 10:
                 await db.update_cost_coin(s_id, 0, 0) 
                 return
 
-            res = await self.api.place_order(client, sym, sell_amount, 0, 'sell', type='market')
+            res = await self.executor.execute(client, sym, 'sell', sell_amount, price)
+            metrics.TRADES.inc("sell", "ok" if res.get('error') == 0 else str(res.get('error')))
             
             if res.get('error') == 0:
-                result = res['result']
-                thb_rec = result.get('rec', 0)
-                if thb_rec == 0: thb_rec = sell_amount * price
+                thb_rec = res['received']
                 new_cost = max(0, cost - thb_rec)
+                # ขายครบ -> เซ็ต Coin เป็น 0 (ยังค้าง/ส่งไม่ครบ -> เหลือส่วนที่ยังไม่ match)
+                new_coin = 0 if res['spent'] >= sell_amount - 1e-12 else max(0, coin - res['spent'])
                 
-                result['rat'] = price 
-                await db.update_cost_coin(s_id, new_cost, 0) # เซ็ต Coin เป็น 0
-                await db.save_order(sym, result, f"SELL: {reason}")
-                await self.log_and_broadcast(f"✅ {sym} SELL Market Success (Got: {thb_rec:.2f} THB)")
+                await db.update_cost_coin(s_id, new_cost, new_coin)
+                for result in res['orders']:
+                    await db.save_order(sym, result, f"SELL: {reason}")
+                for order in res['pending']:
+                    await db.track_pending_order(sym, 'sell', order['result'], self.api.time(),
+                                                 order['filled'], order['received'])
+                await db.journal.flush()
+                await self.log_and_broadcast(f"✅ {sym} SELL {res['mode'].title()} Success (Got: {thb_rec:.2f} THB)")
                 
                 # 🟢 [เคลียร์ความจำ] เมื่อขายเสร็จ ให้ล้างข้อมูลกลยุทธ์ของโหมด Auto ทิ้ง เพื่อให้รอบหน้าประเมินใหม่
                 if sym in self.active_auto_strategies:
@@ -201,28 +340,26 @@ class BotEngine:
                     await db.update_cost_coin(s_id, 0, 0)
                     if sym in self.active_auto_strategies: del self.active_auto_strategies[sym]
     
-    async def clear_pending_orders(self, bitkub_client, http_client, symbol):
-        orders_res = await bitkub_client.get_open_orders(http_client, symbol)
-        if orders_res.get('error') != 0: return
-        open_orders = orders_res.get('result', [])
-        if not open_orders: return
-
-        current_db_data = await db.get_symbol_by_name(symbol)
-        if not current_db_data: return
-        current_cost, current_coin, s_id = current_db_data['cost'], current_db_data['coin'], current_db_data['id']
-
-        for order in open_orders:
-            o_id, o_side, o_amt, o_rate, o_rec = order.get('id'), order.get('side').lower(), float(order.get('amount', 0)), float(order.get('rate', 0)), float(order.get('receive', 0))
-            cancel_res = await bitkub_client.cancel_order(http_client, symbol, o_id, o_side)
-            if cancel_res.get('error') == 0:
-                if o_side == 'buy':
-                    current_cost = max(0, current_cost - o_amt)
-                    current_coin = max(0, current_coin - o_rec)
-                elif o_side == 'sell':
-                    current_cost = current_cost + o_rec
-                    current_coin = current_coin + o_amt
-                await db.update_cost_coin(s_id, current_cost, current_coin)
-                await db.save_order(symbol, {"id": o_id, "amt": o_amt, "rat": o_rate, "ts": int(time.time()), "typ": "limit"}, f"Cancelled {o_side.upper()}")
+    async def guarded_trade(self, client, symbol_data, action, price, reason):
+        """
+        ส่งคำสั่งเทรดภายใต้ล็อค processing_coins (1 เหรียญ เทรดได้ทีละคำสั่ง)
+        คืนค่า False ถ้าเหรียญนี้กำลังมีคำสั่งอื่นทำงานอยู่
+        """
+        sym = symbol_data['symbol']
+        # เช็คและล็อคต่อกันโดยไม่มี await คั่น จึงไม่มี Task อื่นแทรกได้
+        if sym in self.processing_coins: return False
+        self.processing_coins.add(sym)
+        try:
+            await self.execute_trade(client, symbol_data, action, price, reason)
+            return True
+        finally:
+            self.processing_coins.discard(sym)
+
+    async def on_price(self, sym, price, ts=None):
+        """ราคาใหม่จาก MarketFeed: อัปเดตราคาล่าสุด แล้วให้ TTP Monitor เช็ค (ถึงจุดขาย Monitor ขายเอง)"""
+        self.set_price(sym, price, ts)
+        if self.running:
+            self.ttp.update(sym, price)
 
     async def process_symbol(self, client, symbol_data):
         sym = symbol_data['symbol']
@@ -232,14 +369,22 @@ class BotEngine:
         
         if status != 'true': return
 
-        df = await self.api.get_candles(client, sym)
+        timeframe = symbol_data.get('timeframe') or config.TIMEFRAME
+        df = await self.api.get_candles(client, sym, timeframe)
         if df is None: return
 
+        # 🟢 กราฟ Timeframe ใหญ่รวมจาก stream เดียวกัน (ไม่ยิง API เพิ่ม)
+        trend_df = None
+        if config.TREND_TIMEFRAME and config.TREND_TIMEFRAME != timeframe:
+            trend_df = self.api.cached_candles(sym, config.TREND_TIMEFRAME)
+
         # 🟢 รับค่าที่คำนวณแล้วกลับมา
-        signal, reason, last_close, regime, actual_strat = self.analyze_market(df, sym, strategy_type, coin_balance)
+        with metrics.timer(metrics.STAGE_SECONDS, "analyze_market"):
+            signal, reason, last_close, regime, actual_strat = self.analyze_market(df, sym, strategy_type, coin_balance, timeframe, trend_df)
         
         # 🟢 บันทึกสถานะส่งไปให้เว็บ (เช่น 🐂 Bullish (S3) )
         self.market_regimes[sym] = {"regime": regime, "active_strat": actual_strat}
+        await self._publish_price(sym, last_close, regime, actual_strat, signal)
 
         previous_signal = self.last_status.get(sym, "HOLD")
         
@@ -247,40 +392,22 @@ class BotEngine:
         await self.ws_manager.broadcast(log_message)
 
         if signal != previous_signal:
-            await self.clear_pending_orders(self.api, client, sym)
+            summary = await self.reconciler.reconcile(client, [sym], cancel_all=True)
             self.last_status[sym] = signal
+            if summary["cancelled"] or summary["filled"]:
+                # cost/coin ถูกปรับตามผลของออเดอร์ค้าง -> ใช้ยอดล่าสุดตัดสินต่อ
+                symbol_data = await db.get_symbol_by_name(sym) or symbol_data
+                coin_balance = symbol_data['coin']
             
         # ==============================================================
         # 🟢 1. ระบบ Trailing Take Profit (TTP)
         # ==============================================================
-        if coin_balance > 0:
-            avg_cost = symbol_data['cost'] / coin_balance
-            current_pnl_pct = ((last_close - avg_cost) / avg_cost) * 100
-            activation_target = getattr(config, 'TTP_ACTIVATION_PCT', 1.5) + config.FEE_BUFFER
-            drop_limit = getattr(config, 'TTP_DROP_PCT', 0.5)
-
-            if current_pnl_pct >= activation_target:
-                if sym not in self.trailing_highs or last_close > self.trailing_highs[sym]:
-                    self.trailing_highs[sym] = last_close
-                    await self.ws_manager.broadcast(f"🚀 {sym}: TTP Activated! New High: {last_close}")
-
-            if sym in self.trailing_highs:
-                highest_price = self.trailing_highs[sym]
-                drawdown_price = highest_price * (1 - (drop_limit / 100)) 
-
-                if last_close <= drawdown_price:
-                    reason_tp = f"🎯 Trailing TP | Drop from High {highest_price} | Sold at +{current_pnl_pct:.2f}%"
-                    if sym not in self.processing_coins:
-                        self.processing_coins.add(sym)
-                        try:
-                            await self.execute_trade(client, symbol_data, "SELL", last_close, reason_tp)
-                            del self.trailing_highs[sym] 
-                            return 
-                        finally:
-                            if sym in self.processing_coins: self.processing_coins.remove(sym)
-
-        if coin_balance == 0 and sym in self.trailing_highs:
-            del self.trailing_highs[sym]
+        # ราคาจากรอบนี้ผ่าน Monitor ด้วย (กรณีไม่มี WebSocket) ถึงจุดขาย -> Monitor เป็นคนขาย รอบนี้ไม่ทำต่อ
+        if self.ttp.update(sym, last_close):
+            return
+
+        if coin_balance == 0:
+            self.trailing_highs.pop(sym, None)
 
         # ==============================================================
         # 🟢 2. ระบบ Strategy หลัก
@@ -290,11 +417,7 @@ class BotEngine:
             
             if coin_balance == 0:
                 if symbol_data['cost'] + symbol_data['cost_st'] <= symbol_data['money_limit']:
-                    self.processing_coins.add(sym)
-                    try:
-                        await self.execute_trade(client, symbol_data, "BUY", last_close, reason)
-                    finally:
-                        self.processing_coins.remove(sym)
+                    await self.guarded_trade(client, symbol_data, "BUY", last_close, reason)
             else:
                 if coin_balance > 0:
                     avg_price = symbol_data['cost'] / coin_balance
@@ -302,7 +425,7 @@ class BotEngine:
                     
                     if last_close < target_dca_price:
                         if symbol_data['cost'] + symbol_data['cost_st'] <= symbol_data['money_limit']:
-                            await self.execute_trade(client, symbol_data, "BUY", last_close, f"{reason} (DCA)")
+                            await self.guarded_trade(client, symbol_data, "BUY", last_close, f"{reason} (DCA)")
 
         elif signal == "SELL":
             if sym in self.processing_coins: return 
@@ -313,27 +436,161 @@ class BotEngine:
                 min_profit_pct = 1.0 + config.FEE_BUFFER 
 
                 if current_pnl_pct >= min_profit_pct:
-                    self.processing_coins.add(sym)
-                    try:
-                        await self.execute_trade(client, symbol_data, "SELL", last_close, f"{reason} | Strat TP (+{current_pnl_pct:.2f}%)")
-                    finally:
-                        self.processing_coins.remove(sym)
+                    await self.guarded_trade(client, symbol_data, "SELL", last_close, f"{reason} | Strat TP (+{current_pnl_pct:.2f}%)")
+
+    async def _process_symbol_bounded(self, client, symbol_data, semaphore):
+        async with semaphore:
+            # Rate limit ของทุก Request อยู่ใน BitkubClient._request แล้ว
+            loop = asyncio.get_running_loop()
+            started = loop.time()
+            try:
+                await self.process_symbol(client, symbol_data)
+            except Exception as e:
+                print(f"⚠️ {symbol_data.get('symbol')} Process Error: {e}")
+            duration = loop.time() - started
+            metrics.STAGE_SECONDS.observe("process_symbol", value=duration)
+            return duration
+
+    async def run_cycle(self, client):
+        """
+        ประมวลผลทุกเหรียญที่เปิดใช้งานแบบขนาน (จำกัดจำนวนด้วย MAX_CONCURRENT_SYMBOLS)
+        เวลาต่อรอบจึงขึ้นกับเหรียญที่ช้าที่สุด ไม่ใช่ผลรวมของทุกเหรียญ
+        """
+        loop = asyncio.get_running_loop()
+        start_time = loop.time()
+        symbols = await db.get_active_symbols()
+        self.ttp.sync(symbols)
+        if self.feed is not None:
+            self.feed.sync([s['symbol'] for s in symbols])
+        semaphore = asyncio.Semaphore(config.MAX_CONCURRENT_SYMBOLS)
+
+        durations = await asyncio.gather(*(
+            self._process_symbol_bounded(client, sym, semaphore) for sym in symbols
+        ))
+        if self.reconciler.due():
+            try:
+                await self.reconciler.reconcile(client)
+            except Exception as e:
+                print(f"⚠️ Reconcile Error: {e}")
+
+        elapsed = loop.time() - start_time
+        slowest = max(durations, default=0.0)
+        metrics.CYCLE_SECONDS.observe(value=elapsed)
+        metrics.CYCLE_SYMBOLS.set(value=len(symbols))
+        metrics.CYCLES.inc()
+        self.last_cycle = {
+            "symbols": len(symbols),
+            "duration": round(elapsed, 3),
+            "slowest": round(slowest, 3),
+            "ts": int(time.time()),
+        }
+        msg = f"⏱️ Cycle: {len(symbols)} symbols in {elapsed:.2f}s (slowest {slowest:.2f}s)"
+        logging.info(msg)
+        await self.ws_manager.broadcast(msg)
+        await self.publish("cycle", last_cycle=self.last_cycle)
+        return self.last_cycle
+
+    async def restore_state(self):
+        if self._state_restored: return
+        self._state_restored = True
+        try:
+            count = await self.checkpoint.restore()
+            if count:
+                await self.log_and_broadcast(f"♻️ Restored {count} engine state entries (TTP: {len(self.trailing_highs)})")
+        except Exception as e:
+            print(f"⚠️ Engine State Restore Error: {e}")
+
+    async def save_state(self):
+        try:
+            await self.checkpoint.save()
+        except Exception as e:
+            print(f"⚠️ Engine State Save Error: {e}")
+
+    async def _loop(self, client):
+        self._client = client
+        # ดึงยอด Wallet ตามรอบ + ทันทีหลังส่ง/ยกเลิกคำสั่ง (ถ้า main.py เริ่มไว้แล้วจะใช้ตัวเดิม)
+        owns_wallet = self.wallet.start(client)
+        try:
+            await self._run_until_stopped(client)
+        finally:
+            if owns_wallet:
+                await self.wallet.stop()
+
+    async def _run_until_stopped(self, client):
+        while self.running:
+            if self.api.exhausted:
+                # Paper Replay เล่นกราฟครบแล้ว
+                await self.log_and_broadcast("🏁 Paper replay finished")
+                self.running = False
+                break
+            try:
+                if not await self.check_server_health(client):
+                    await self.api.sleep(30); continue 
+
+                await self.run_cycle(client)
+                await self.save_state()
+                await self.api.sleep(config.LOOP_INTERVAL)
+            except Exception as e:
+                print(f"⚠️ Bot Loop Error: {e}"); await self.api.sleep(5)
+
+    def start(self):
+        """
+        เริ่ม run_loop เป็น Task เบื้องหลัง (main.py ใช้ตอน startup และ /start-bot)
+        Loop เดิมยังไม่จบ (เช่น กำลังหยุด) -> คืน Task เดิม ไม่สร้างซ้อน (ผู้เรียก await stop() ก่อน)
+        """
+        if self._task is not None and not self._task.done():
+            return self._task
+        self._task = asyncio.create_task(self.run_loop())
+        return self._task
+
+    async def stop(self, grace=None):
+        """
+        หยุด run_loop แล้วรอจนจบจริง (ใช้ตอนปิดแอป ก่อนปิด HTTP Client และ DB)
+        รอคำสั่งซื้อขายที่ถือล็อค processing_coins อยู่ไม่เกิน grace วินาที แล้วยกเลิก Task
+        finally ของ run_loop หยุด Feed/TTP, flush journal และบันทึก Checkpoint ให้
+        """
+        self.running = False
+        task = self._task
+        if task is None or task.done():
+            return
+        deadline = time.monotonic() + (config.SHUTDOWN_GRACE if grace is None else grace)
+        while self.processing_coins and time.monotonic() < deadline:
+            await asyncio.sleep(0.05)
+        task.cancel()
+        try:
+            await task
+        except asyncio.CancelledError:
+            pass
 
     async def run_loop(self):
         self.running = True
+        await self.restore_state()
+        self.ttp.start()
         await self.log_and_broadcast("🚀 Bot Started (Auto-AI + TTP Ready)")
+        await self.publish("status", running=True)
         
-        async with httpx.AsyncClient() as client:
-            while self.running:
+        try:
+            if self.http is not None:
+                # 🟢 ใช้ Client กลางของแอป (นาฬิกา Server ถูก start ไว้ตอน startup แล้ว)
+                await self._loop(self.http)
+                return
+
+            async with httpx.AsyncClient() as client:
+                # 🟢 sync เวลา Server ใน background (คำสั่งที่ต้อง Sign จะไม่ต้องรอ servertime)
+                self.api.clock.start(client)
                 try:
-                    start_time = asyncio.get_running_loop().time()
-                    if not await self.check_server_health(client):
-                        await asyncio.sleep(30); continue 
-
-                    symbols = await db.get_active_symbols() 
-                    for sym in symbols:
-                        await self.process_symbol(client, sym)
-                        await asyncio.sleep(0.2) 
-                    await asyncio.sleep(10)
-                except Exception as e:
-                    print(f"⚠️ Bot Loop Error: {e}"); await asyncio.sleep(5)
\ No newline at end of file
+                    await self._loop(client)
+                finally:
+                    self.api.clock.stop()
+        finally:
+            if self.feed is not None:
+                await self.feed.stop()
+            await self.ttp.stop()
+            self._client = None
+            # 🟢 ออเดอร์/Position ที่ค้างในคิวลง DB ก่อน แล้ว Checkpoint ครั้งเดียว
+            try:
+                await db.journal.flush()
+            except Exception as e:
+                print(f"⚠️ Journal Flush Error: {e}")
+            await self.save_state()
+            await self.publish("status", running=False)
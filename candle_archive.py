@@ -0,0 +1,199 @@
+"""
+คลังแท่งเทียนย้อนหลังบนดิสก์ (1 ไฟล์ต่อ symbol + resolution)
+
+- เก็บเป็นไฟล์ไบนารีเรียงต่อกัน (record ละ 48 bytes: t int64, o, h, l, c, v float64)
+- เขียนแบบต่อท้ายเท่านั้น และเก็บเฉพาะแท่งที่ปิดแล้ว (แท่งที่ยังไม่ปิดอยู่ใน CandleStore)
+- อ่านแบบ np.memmap (ไม่ copy) ใช้ร่วมกันได้ทั้ง Bot, backtest.py และ /api/candles
+- ตรวจหาช่องว่าง (gap) แล้วดึงเติมจาก /tradingview/history
+
+ใช้งาน:
+    python candle_archive.py backfill THB_BTC THB_ETH --days 90     (ค่าเริ่มต้น BASE_TIMEFRAME ที่บอทใช้)
+    python candle_archive.py gaps THB_BTC --resolution 5
+"""
+import argparse
+import asyncio
+import os
+import time
+
+import numpy as np
+
+import config
+import utils
+
+RECORD = np.dtype([("t", "<i8"), ("o", "<f8"), ("h", "<f8"), ("l", "<f8"), ("c", "<f8"), ("v", "<f8")])
+COLUMNS = RECORD.names
+
+
+class CandleArchive:
+    def __init__(self, root=None):
+        self.root = root or config.ARCHIVE_DIR
+        self._maps = {}  # path -> (ขนาดไฟล์, memmap) เปิดใหม่เมื่อไฟล์โตขึ้น
+
+    def path(self, symbol, resolution):
+        query_symbol = utils.normalize_symbol(symbol, to_api=True)
+        return os.path.join(self.root, f"{query_symbol}_{resolution}.bin")
+
+    def read(self, symbol, resolution, start=None, end=None):
+        """คืน structured array (memmap, ไม่ copy) ของแท่งในช่วง [start, end) เรียงตามเวลา"""
+        path = self.path(symbol, resolution)
+        try:
+            size = os.path.getsize(path)
+        except OSError:
+            return np.empty(0, dtype=RECORD)
+        count = size // RECORD.itemsize
+        if count == 0:
+            return np.empty(0, dtype=RECORD)
+
+        cached = self._maps.get(path)
+        if cached is None or cached[0] != count:
+            cached = self._maps[path] = (count, np.memmap(path, dtype=RECORD, mode="r", shape=(count,)))
+        bars = cached[1]
+
+        lo = 0 if start is None else int(np.searchsorted(bars["t"], start, side="left"))
+        hi = count if end is None else int(np.searchsorted(bars["t"], end, side="left"))
+        return bars[lo:hi]
+
+    def tail(self, symbol, resolution, bars):
+        data = self.read(symbol, resolution)
+        return data[-bars:] if bars else data
+
+    def last_timestamp(self, symbol, resolution):
+        data = self.read(symbol, resolution)
+        return int(data["t"][-1]) if len(data) else None
+
+    def _closed(self, data, resolution, now=None):
+        """แปลง dict จาก /tradingview/history เป็น record เฉพาะแท่งที่ปิดแล้ว"""
+        now = int(time.time()) if now is None else now
+        t = np.asarray(data.get("t") or [], dtype=np.int64)
+        records = np.zeros(len(t), dtype=RECORD)
+        records["t"] = t
+        for col in COLUMNS[1:]:
+            values = data.get(col)
+            if values: records[col] = values
+        return records[t + resolution * 60 <= now]
+
+    def append(self, symbol, resolution, data, now=None):
+        """ต่อท้ายแท่งที่ปิดแล้วและใหม่กว่าแท่งสุดท้ายในไฟล์ คืนจำนวนแท่งที่เขียน"""
+        records = self._closed(data, resolution, now)
+        last_ts = self.last_timestamp(symbol, resolution)
+        if last_ts is not None:
+            records = records[records["t"] > last_ts]
+        if len(records) == 0:
+            return 0
+        path = self.path(symbol, resolution)
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        with open(path, "ab") as f:
+            records.tofile(f)
+        return len(records)
+
+    def insert(self, symbol, resolution, data, now=None):
+        """
+        เติมแท่งที่อยู่ "กลางไฟล์" (จากการ backfill ช่องว่าง) -> เขียนไฟล์ใหม่ทั้งไฟล์แล้วสลับแทน
+        แท่งที่ timestamp ซ้ำของเดิมจะถูกเก็บไว้ คืนจำนวนแท่งที่เพิ่ม
+        """
+        records = self._closed(data, resolution, now)
+        if len(records) == 0:
+            return 0
+        old = np.array(self.read(symbol, resolution))
+        merged = np.concatenate((old, records))
+        _, first = np.unique(merged["t"], return_index=True)  # unique เรียงตามเวลา, เลือกตัวแรก (ของเดิม)
+        merged = merged[first]
+        added = len(merged) - len(old)
+        if added == 0:
+            return 0
+
+        path = self.path(symbol, resolution)
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        tmp = f"{path}.tmp"
+        merged.tofile(tmp)
+        self._maps.pop(path, None)
+        os.replace(tmp, path)
+        return added
+
+    def gaps(self, symbol, resolution, start=None, end=None):
+        """ช่วงเวลา [(from, to)] ที่แท่งหายไป (ห่างกันเกิน 1 แท่ง) รวมช่วงก่อนแท่งแรกถ้าระบุ start"""
+        bar_seconds = resolution * 60
+        t = self.read(symbol, resolution, start, end)["t"]
+        found = []
+        if len(t) == 0:
+            if start is not None and end is not None and end - start >= bar_seconds:
+                found.append((int(start), int(end)))
+            return found
+        if start is not None and t[0] - start >= bar_seconds:
+            found.append((int(start), int(t[0])))
+        for k in np.flatnonzero(np.diff(t) > bar_seconds):
+            found.append((int(t[k]) + bar_seconds, int(t[k + 1])))
+        return found
+
+    async def backfill(self, api, client, symbol, resolution, since, chunk_bars=1000):
+        """
+        ดึงแท่งที่ยังไม่มีตั้งแต่ `since` จนถึงปัจจุบัน: เติมช่องว่างกลางไฟล์ แล้วต่อท้ายส่วนที่ใหม่กว่า
+        (ช่วงที่ตลาดไม่มีการซื้อขาย Bitkub จะตอบ no_data ช่องว่างนั้นจะยังคงอยู่)
+        คืนจำนวนแท่งที่เพิ่ม
+        """
+        bar_seconds = resolution * 60
+        now = int(time.time())
+        last_ts = self.last_timestamp(symbol, resolution)
+        added = 0
+
+        windows = self.gaps(symbol, resolution, since, last_ts)
+        windows.append((since if last_ts is None else max(since, last_ts + bar_seconds), now))
+        for gap_start, gap_end in windows:
+            for from_time in range(gap_start, gap_end, bar_seconds * chunk_bars):
+                to_time = min(gap_end, from_time + bar_seconds * chunk_bars)
+                data = await api.fetch_history(client, symbol, resolution, from_time, to_time)
+                if data.get("s") != "ok": continue
+                if gap_end == now:
+                    added += self.append(symbol, resolution, data, now)
+                else:
+                    added += self.insert(symbol, resolution, data, now)
+        return added
+
+
+def as_columns(bars):
+    """structured array -> dict ของคอลัมน์ (view ไม่ copy) รูปแบบเดียวกับ /tradingview/history"""
+    return {col: bars[col] for col in COLUMNS}
+
+
+# 🟢 คลังกลางของทั้งโปรเซส
+candle_archive = CandleArchive()
+
+
+async def _cli_backfill(symbols, resolution, days):
+    from bitkub import BitkubClient
+    from http_pool import create_http_client
+
+    api = BitkubClient()
+    since = int(time.time()) - days * 86400
+    since -= since % (resolution * 60)
+    async with create_http_client() as client:
+        for symbol in symbols:
+            added = await candle_archive.backfill(api, client, symbol, resolution, since)
+            print(f"📥 {symbol} {resolution}m: +{added} bars ({len(candle_archive.read(symbol, resolution))} total)")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Local candle archive")
+    sub = parser.add_subparsers(dest="command", required=True)
+    fill = sub.add_parser("backfill", help="ดึงแท่งย้อนหลังที่ยังไม่มีจาก Bitkub")
+    fill.add_argument("symbols", nargs="+")
+    fill.add_argument("--resolution", type=int, default=config.BASE_TIMEFRAME)
+    fill.add_argument("--days", type=int, default=30)
+    gaps = sub.add_parser("gaps", help="แสดงช่องว่างในไฟล์")
+    gaps.add_argument("symbols", nargs="+")
+    gaps.add_argument("--resolution", type=int, default=config.BASE_TIMEFRAME)
+    args = parser.parse_args()
+
+    if args.command == "backfill":
+        asyncio.run(_cli_backfill(args.symbols, args.resolution, args.days))
+    else:
+        for symbol in args.symbols:
+            found = candle_archive.gaps(symbol, args.resolution)
+            print(f"{symbol} {args.resolution}m: {len(candle_archive.read(symbol, args.resolution))} bars, {len(found)} gaps")
+            for gap_start, gap_end in found:
+                print(f"   {time.strftime('%Y-%m-%d %H:%M', time.gmtime(gap_start))} -> "
+                      f"{time.strftime('%Y-%m-%d %H:%M', time.gmtime(gap_end))}")
+
+
+if __name__ == "__main__":
+    main()
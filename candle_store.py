@@ -0,0 +1,177 @@
+import asyncio
+import numpy as np
+import pandas as pd
+import config
+
+# ลำดับคอลัมน์ที่เก็บใน Store (ตรงกับ key ที่ /tradingview/history ส่งกลับมา)
+COLUMNS = ("t", "o", "h", "l", "c", "v")
+
+
+def base_resolution(timeframe):
+    """Resolution ที่ต้องดึงจริงสำหรับ timeframe นี้ (ถ้ารวมจาก BASE_TIMEFRAME ได้ใช้ stream เดียวกัน)"""
+    if timeframe in config.RESAMPLE_TIMEFRAMES and timeframe % config.BASE_TIMEFRAME == 0:
+        return config.BASE_TIMEFRAME
+    return timeframe
+
+
+def resample(candles, minutes):
+    """
+    รวมแท่งเทียนเป็นกรอบเวลาที่ใหญ่ขึ้น (เช่น 5m -> 15m/60m/240m) ตามขอบเวลาเดียวกับ Bitkub (t // วินาที)
+    แท่งสุดท้ายอาจยังไม่ครบกรอบเวลา (เหมือนแท่งที่ยังไม่ปิดตอนรันจริง)
+    """
+    t = np.asarray(candles["t"], dtype=np.int64)
+    if len(t) == 0:
+        return {k: np.asarray(v) for k, v in candles.items()}
+    bucket = t // (minutes * 60) * (minutes * 60)
+    starts = np.flatnonzero(np.r_[True, bucket[1:] != bucket[:-1]])
+    ends = np.r_[starts[1:], len(t)] - 1
+    out = {"t": bucket[starts], "o": np.asarray(candles.get("o", candles["c"]))[starts], "c": np.asarray(candles["c"])[ends]}
+    out["h"] = np.maximum.reduceat(np.asarray(candles["h"], dtype=np.float64), starts)
+    out["l"] = np.minimum.reduceat(np.asarray(candles["l"], dtype=np.float64), starts)
+    if "v" in candles:
+        out["v"] = np.add.reduceat(np.asarray(candles["v"], dtype=np.float64), starts)
+    return out
+
+
+class CandleStore:
+    """
+    เก็บแท่งเทียนล่าสุดแยกตาม (symbol, resolution) ไว้ในหน่วยความจำ
+    - ครั้งแรกดึงย้อนหลัง `bars(key)` แท่ง (seed)
+    - รอบถัดไปดึงเฉพาะแท่งตั้งแต่ timestamp ล่าสุดที่มี แล้ว merge ทับแท่งที่ยังไม่ปิด
+    - Timeframe ที่ใหญ่กว่า (15/60/240) สร้างจาก stream ฐานเดียวกันตอนเรียก frame()
+    """
+    def __init__(self, max_bars=None):
+        # จำนวนแท่งขั้นต่ำต่อ key (stream ที่รวมแท่งเก็บเพิ่มตาม Timeframe ที่ใช้จริง ดู reserve())
+        self.max_bars = max_bars or config.CANDLE_BARS
+        self._bars = {}         # key -> จำนวนแท่งฐานที่ต้องเก็บ
+        self._series = {}
+        self._confirmed = {}    # key -> timestamp แท่งล่าสุดที่มาจาก Server/คลัง (Trade จาก WS ไม่เลื่อนค่านี้)
+        self._locks = {}
+
+    def lock(self, key):
+        # 1 key ต่อ 1 Lock กันไม่ให้ Bot กับ Dashboard ดึงข้อมูลเหรียญเดียวกันซ้อนกัน
+        lock = self._locks.get(key)
+        if lock is None:
+            lock = self._locks[key] = asyncio.Lock()
+        return lock
+
+    def bars(self, key):
+        return self._bars.get(key, self.max_bars)
+
+    def reserve(self, key, timeframe=None):
+        """
+        เก็บแท่งฐานพอให้ timeframe นี้ (และ TREND_TIMEFRAME ถ้ารวมจาก stream เดียวกัน) มีครบ CANDLE_BARS แท่ง
+        จำค่ามากสุดต่อ key คืน True ถ้าต้องเก็บมากกว่าเดิม (ต้อง seed ใหม่ให้ย้อนหลังพอ)
+        """
+        resolution = key[1]
+        frames = [timeframe or resolution]
+        trend = config.TREND_TIMEFRAME
+        if trend and base_resolution(trend) == resolution:
+            frames.append(trend)
+        need = max(self.max_bars, config.CANDLE_BARS * max(frames) // resolution)
+        if need <= self._bars.get(key, 0):
+            return False
+        self._bars[key] = need
+        return True
+
+    def last_timestamp(self, key):
+        series = self._series.get(key)
+        if series is None or len(series["t"]) == 0:
+            return None
+        return int(series["t"][-1])
+
+    def confirmed_timestamp(self, key):
+        """
+        timestamp แท่งล่าสุดที่ Server ยืนยันแล้ว ใช้เป็นจุดเริ่ม Polling รอบถัดไป
+        (ถ้า Trade จาก WS เปิดแท่งใหม่ไปแล้ว แท่งก่อนหน้ายังต้องดึงค่าปิดจริงจาก Server และลงคลัง)
+        """
+        return self._confirmed.get(key)
+
+    def merge(self, key, data, confirmed=True):
+        """
+        รวมข้อมูลใหม่ (dict รูปแบบเดียวกับ /tradingview/history) เข้ากับของเดิม
+        แท่งที่ timestamp ซ้ำ (แท่งที่ยังไม่ปิด) จะถูกแทนที่ด้วยค่าใหม่
+        confirmed=False = ค่าประมาณจาก Trade (ไม่เลื่อน confirmed_timestamp)
+        คืนค่าจำนวนแท่งที่เพิ่มเข้ามาใหม่
+        """
+        new = {col: np.asarray(data[col] if data.get(col) is not None else np.zeros(len(data["t"])), dtype=np.float64) for col in COLUMNS}
+        new["t"] = np.asarray(data["t"], dtype=np.int64)
+        if len(new["t"]) == 0:
+            return 0
+
+        old = self._series.get(key)
+        if old is None:
+            merged, appended = new, len(new["t"])
+        else:
+            # ตัดของเดิมตั้งแต่แท่งแรกของข้อมูลใหม่ทิ้ง แล้วต่อท้ายด้วยข้อมูลใหม่
+            cut = int(np.searchsorted(old["t"], new["t"][0], side="left"))
+            appended = len(new["t"]) - (len(old["t"]) - cut)
+            merged = {col: np.concatenate((old[col][:cut], new[col])) for col in COLUMNS}
+
+        limit = self.bars(key)
+        if len(merged["t"]) > limit:
+            merged = {col: arr[-limit:] for col, arr in merged.items()}
+        self._series[key] = merged
+        if confirmed:
+            self._confirmed[key] = max(self._confirmed.get(key, 0), int(new["t"][-1]))
+        return max(appended, 0)
+
+    def apply_trade(self, symbol, price, amount, ts):
+        """
+        อัปเดตแท่งที่ยังไม่ปิดของทุก resolution ของเหรียญนี้จาก Trade เดียว (จาก market_feed)
+        symbol เป็นรูปแบบ API (btc_thb), เหรียญที่ยังไม่เคย seed จาก get_candles จะถูกข้าม
+        รอบ Polling ถัดไปแท่งจาก Server จะทับค่านี้อีกที (ดึงตั้งแต่ confirmed_timestamp จึงได้ค่าปิดจริงของแท่งที่ Trade ข้ามไปแล้วด้วย)
+        คืนค่าจำนวน resolution ที่ถูกอัปเดต
+        """
+        updated = 0
+        for key in [k for k in self._series if k[0] == symbol]:
+            series = self._series[key]
+            if len(series["t"]) == 0:
+                continue
+            bar_seconds = key[1] * 60
+            bar_t = int(ts) // bar_seconds * bar_seconds
+            last_t = int(series["t"][-1])
+            if bar_t < last_t:
+                continue
+            if bar_t == last_t:
+                bar = {"t": [bar_t], "o": [series["o"][-1]], "h": [max(series["h"][-1], price)],
+                       "l": [min(series["l"][-1], price)], "c": [price], "v": [series["v"][-1] + amount]}
+            else:
+                bar = {"t": [bar_t], "o": [price], "h": [price], "l": [price], "c": [price], "v": [amount]}
+            self.merge(key, bar, confirmed=False)
+            updated += 1
+        return updated
+
+    def columns(self, key):
+        """คืน dict ของคอลัมน์ (NumPy array ตัวจริงใน Store ห้ามแก้ไข) หรือ None"""
+        return self._series.get(key)
+
+    def reset(self, key):
+        self._series.pop(key, None)
+        self._confirmed.pop(key, None)
+
+    def frame(self, key, timeframe=None, bars=None):
+        """
+        คืน DataFrame ชุดใหม่ทุกครั้ง (ผู้เรียกเพิ่มคอลัมน์ indicator ได้โดยไม่กระทบ Store)
+        timeframe ใหญ่กว่า resolution ของ key -> รวมแท่งให้ก่อน, คืนไม่เกิน `bars` แท่งล่าสุด
+        """
+        series = self._series.get(key)
+        if series is None or len(series["t"]) == 0:
+            return None
+        if timeframe and timeframe != key[1]:
+            series = resample(series, timeframe)
+        bars = bars or config.CANDLE_BARS
+        if len(series["t"]) > bars:
+            series = {col: arr[-bars:] for col, arr in series.items()}
+        return pd.DataFrame({
+            "timestamp": pd.to_datetime(series["t"], unit="s"),
+            "open": series["o"],
+            "close": series["c"],
+            "high": series["h"],
+            "low": series["l"],
+            "volume": series["v"],
+        })
+
+
+# 🟢 Store กลางของทั้งโปรเซส (Bot, /api/ticker และ /test/price ใช้ข้อมูลชุดเดียวกัน)
+candle_store = CandleStore()
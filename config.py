@@ -1,7 +1,7 @@
 # config.py
 
 # --- Trading Logic ---
-TIMEFRAME = 15          # นาทีกราฟ (1, 5, 15, 60, 240, 1440)
+TIMEFRAME = 15          # นาทีกราฟเริ่มต้น (1, 5, 15, 60, 240, 1440) ตั้งแยกรายเหรียญได้ที่ Dashboard
 RSI_PERIOD = 14
 RSI_OVERBOUGHT = 70
 RSI_OVERSOLD = 30
@@ -14,6 +14,129 @@ FEE_BUFFER = 0.52       # % เผื่อค่าธรรมเนียม
 # --- Trailing Take Profit (TTP) ---
 TTP_ACTIVATION_PCT = 1.5  # กำไรกี่เปอร์เซ็นต์ถึงจะ "เปิดโหมด" วิ่งตามดอย (เช่น 1.5%)
 TTP_DROP_PCT = 0.5        # ถ้าราคาตกลงมาจาก "จุดสูงสุด" กี่เปอร์เซ็นต์ ถึงจะกดขาย (เช่น 0.5%)
+TTP_HIGH_STEP_PCT = 0.5   # แจ้ง "New High" ทางหน้าเว็บเมื่อสูงกว่าครั้งที่แจ้งล่าสุดกี่เปอร์เซ็นต์ (กันแจ้งทุก Tick)
 
 # --- System ---
 DB_NAME = "bitkub_bot.db"
+
+# --- Scheduler (run_loop) ---
+LOOP_INTERVAL = 10          # วินาทีที่พักระหว่างรอบ (หลังจากทุกเหรียญประมวลผลเสร็จ)
+MAX_CONCURRENT_SYMBOLS = 8  # จำนวนเหรียญที่ประมวลผลพร้อมกันสูงสุดต่อรอบ
+SHUTDOWN_GRACE = 15         # วินาทีที่รอคำสั่งซื้อขายที่กำลังส่งอยู่ให้เสร็จก่อนหยุด run_loop ตอนปิดแอป
+
+# --- Rate Limit (req/sec) ตามเอกสาร Bitkub API ---
+# ใช้ 80% ของลิมิตจริงเพื่อเผื่อ Request จากหน้า Dashboard
+RATE_LIMIT_SAFETY = 0.8
+RATE_LIMITS = {
+    "/tradingview/history": 100,
+    "/api/v3/market/bids": 100,
+    "/api/v3/market/asks": 100,
+    "/api/v3/market/wallet": 150,
+    "/api/v3/market/place-bid": 150,
+    "/api/v3/market/place-ask": 150,
+    "/api/v3/market/my-open-orders": 150,
+    "/api/v3/market/cancel-order": 200,
+}
+# Bucket รวมต่อกลุ่ม endpoint (ทุก Request ต้องได้ token ทั้งของ endpoint และของกลุ่ม)
+RATE_LIMIT_CLASSES = {"public": 100, "secure": 150}
+SECURE_ENDPOINTS = {
+    "/api/v3/market/wallet",
+    "/api/v3/market/place-bid",
+    "/api/v3/market/place-ask",
+    "/api/v3/market/my-open-orders",
+    "/api/v3/market/cancel-order",
+}
+RATE_MIN_FRACTION = 0.1     # โดน 429 ซ้ำๆ อัตราจะไม่ต่ำกว่า 10% ของลิมิต
+RATE_RECOVERY_STEP = 0.02   # Request สำเร็จ 1 ครั้งเพิ่มอัตรากลับ 2% ของลิมิต
+
+# --- Retry / Circuit Breaker (BitkubClient._request) ---
+RETRY_MAX_ATTEMPTS = 3      # จำนวนครั้งที่ Retry เพิ่ม (GET ทุกกรณี, POST เฉพาะ 429)
+RETRY_BASE_DELAY = 0.5      # วินาที: backoff = สุ่ม 0..base * 2^attempt
+RETRY_MAX_DELAY = 8.0
+RETRY_AFTER_MAX = 60.0      # วินาที: Retry-After ที่นานกว่านี้ถูกตัดเหลือเท่านี้
+CIRCUIT_FAILURE_THRESHOLD = 5   # Error (Network/5xx/429) ติดกันกี่ครั้งถึงหยุดยิง
+CIRCUIT_COOLDOWN = 30           # วินาทีที่หยุดก่อนลองใหม่
+CIRCUIT_EXEMPT_ENDPOINTS = {"/api/status", "/api/v3/servertime"}   # ใช้ตรวจว่า Server กลับมาแล้ว
+
+# --- Candle Cache ---
+CANDLE_BARS = 100           # จำนวนแท่งเทียนที่เก็บไว้ต่อเหรียญ (ดึงครั้งแรกครั้งเดียว)
+
+# --- Server Clock Sync ---
+CLOCK_SYNC_INTERVAL = 60    # วินาที: รีเฟรช offset เวลากับ Server Bitkub
+CLOCK_SYNC_SAMPLES = 3      # จำนวนครั้งที่วัดต่อรอบ (เลือกครั้งที่ RTT ต่ำสุด)
+
+# --- HTTP Client Pool (ใช้ร่วมกันทั้งโปรเซส) ---
+HTTP2_ENABLED = True        # ใช้ HTTP/2 ถ้าติดตั้ง h2 ไว้ (pip install httpx[http2]) ไม่งั้นใช้ HTTP/1.1
+HTTP_MAX_CONNECTIONS = 20
+HTTP_MAX_KEEPALIVE = 10
+HTTP_KEEPALIVE_EXPIRY = 60  # วินาที
+HTTP_TIMEOUTS = {           # วินาที แยกตามกลุ่ม endpoint
+    "default": 10.0,
+    "connect": 5.0,
+    "status": 5.0,
+    "servertime": 3.0,
+    "market": 10.0,
+    "trade": 15.0,
+    "telegram": 10.0,
+}
+
+# --- Database Pool ---
+DB_READERS = 2              # จำนวน Connection สำหรับอ่าน (เขียนใช้ Connection เดียวเสมอ)
+DB_CACHED_STATEMENTS = 256  # จำนวน Prepared Statement ที่ cache ต่อ Connection
+DB_BUSY_TIMEOUT_MS = 5000
+
+# --- Order Journal (write-behind) ---
+JOURNAL_FLUSH_INTERVAL = 1.0    # วินาที: flush คิว orders/positions ลง DB
+JOURNAL_MAX_BATCH = 100         # flush ทันทีเมื่อคิวมีถึงจำนวนนี้
+
+# --- Open Order Reconciliation (reconcile.py) ---
+RECONCILE_INTERVAL = 300            # วินาที: กระทบยอดออเดอร์ค้างของทุกเหรียญพร้อมกัน
+RECONCILE_ORDER_MAX_AGE = 900       # วินาที: Limit order ของบอทที่ค้างนานกว่านี้ถูกยกเลิก
+RECONCILE_CANCEL_UNTRACKED = False  # True = ยกเลิกออเดอร์ที่บอทไม่ได้ส่งเองด้วย (ปกติยกเลิกเฉพาะตอนสัญญาณเปลี่ยน)
+
+# --- Wallet Cache (wallet_cache.py) ---
+WALLET_REFRESH_INTERVAL = 30    # วินาที: ดึงยอดใหม่ตามรอบ (และทันทีหลังส่ง/ยกเลิกคำสั่ง)
+WALLET_MAX_AGE = 30             # วินาที: ยอดที่เก่ากว่านี้ต้องดึงใหม่ก่อนใช้ (Bot และ /api/wallet)
+
+# --- Price Cache (/api/ticker) ---
+PRICE_MAX_AGE = 60          # วินาที: ราคาในหน่วยความจำของบอทที่เก่ากว่านี้ถือว่า stale
+
+# --- Candle Archive (คลังแท่งเทียนบนดิสก์) ---
+ARCHIVE_DIR = "candles"     # โฟลเดอร์เก็บไฟล์ <SYMBOL>_<resolution>.bin
+
+# --- Multi-Timeframe ---
+# ดึงกราฟจาก Bitkub แค่ BASE_TIMEFRAME ต่อเหรียญ แล้วรวมแท่งเป็น Timeframe ใน RESAMPLE_TIMEFRAMES เอง
+# (Timeframe อื่น เช่น 1 หรือ 1440 ดึงตรงจาก Bitkub ตาม resolution นั้น)
+BASE_TIMEFRAME = 5
+RESAMPLE_TIMEFRAMES = (5, 15, 60, 240)
+TREND_TIMEFRAME = None      # เช่น 240 = ไม่เปิด BUY ใหม่ถ้ากราฟ 4 ชม. เป็นขาลง (EMA 20 < EMA 50), None = ปิด
+                            # (ต้องอยู่ใน RESAMPLE_TIMEFRAMES เหมือน Timeframe ของเหรียญ จึงไม่ต้องยิง API เพิ่ม)
+
+# --- Indicator Backend ---
+INDICATOR_BACKEND = "auto"  # "auto" = ใช้ Kernel (Numba) ถ้าติดตั้งไว้, "pandas" = บังคับใช้ pandas
+
+# --- Exchange Backend ---
+EXCHANGE_BACKEND = "bitkub"     # "bitkub" = ซื้อขายจริง, "paper" = Paper Trading (paper_exchange.py)
+PAPER_DB_NAME = "paper_bot.db"  # โหมด paper ใช้ DB แยก (ไม่ปน Position จริง)
+PAPER_BALANCE_THB = 100000.0    # เงินเริ่มต้นใน Wallet จำลอง
+PAPER_FEE_PCT = 0.25            # ค่าธรรมเนียมต่อคำสั่ง (%)
+PAPER_SLIPPAGE_PCT = 0.0        # Market order ได้ราคาแย่กว่าราคาล่าสุดกี่ %
+PAPER_REPLAY_START = None       # None = ใช้ราคาจริงตามเวลาจริง, unix time = เล่นกราฟจากคลังเริ่มที่เวลานั้น
+PAPER_REPLAY_END = None         # None = จนถึงแท่งสุดท้ายในคลัง
+PAPER_SPEED = 0                 # Replay: 0 = ข้ามเวลาพักทันที (เร็วสุด), N = เร็วกว่าเวลาจริง N เท่า
+
+# --- Execution (execution.py) ---
+EXEC_ENABLED = True             # False = ส่ง Market order ก้อนเดียวแบบเดิม
+EXEC_DEPTH_LEVELS = 20          # จำนวนระดับราคาที่ดึงต่อฝั่ง
+EXEC_DEPTH_TTL = 2.0            # วินาที: อายุ cache ของ Order book
+EXEC_MAX_SLIPPAGE_PCT = 0.3     # Slippage โดยประมาณ (เทียบราคาดีที่สุด) ไม่เกินนี้ -> Market order
+EXEC_LIMIT_SLIPPAGE_PCT = 0.5   # ราคาเพดานของ Marketable limit ห่างจากราคาดีที่สุดกี่ %
+EXEC_MAX_CHILDREN = 4           # แบ่งคำสั่งได้สูงสุดกี่ก้อน
+EXEC_CHILD_DELAY = 2.0          # วินาทีระหว่างคำสั่งย่อย
+EXEC_MIN_ORDER_THB = 10         # ขั้นต่ำต่อคำสั่งของ Bitkub
+
+# --- Market Data WebSocket (market_feed.py) ---
+WS_FEED_ENABLED = True          # ต้องติดตั้ง websockets (ไม่มี = Polling อย่างเดียว)
+WS_FEED_URL = "wss://api.bitkub.com/websocket-api/"     # แทนที่ได้ด้วย env WS_URL
+WS_FEED_SYMBOLS_PER_CONN = 20   # เหรียญต่อ 1 Connection (2 stream ต่อเหรียญ: trade + ticker)
+WS_FEED_PING_INTERVAL = 20      # วินาที: Ping เช็คว่า Connection ยังไม่ตาย
@@ -1,6 +1,12 @@
 import aiosqlite
+import asyncio
 import time
-from config import DB_NAME
+from contextlib import asynccontextmanager
+import config
+import metrics
+
+# 🟢 Paper Trading ใช้ไฟล์ DB แยกจากของจริง
+DB_NAME = config.PAPER_DB_NAME if config.EXCHANGE_BACKEND == "paper" else config.DB_NAME
 
 # ฟังก์ชันนี้ใช้ตอนเปิดโปรแกรมครั้งแรก (Sync ได้ ไม่เป็นไร)
 def init_db():
@@ -38,14 +44,298 @@ def init_db():
         )
     """)
     conn.commit()
+    _migrate(conn)
     conn.close()
 
+# 🟢 Schema Migration: เพิ่มทีละเวอร์ชัน (เก็บเลขเวอร์ชันไว้ใน PRAGMA user_version)
+# DB เก่าที่เปิดขึ้นมาจะรันเฉพาะขั้นที่ยังไม่เคยรัน
+MIGRATIONS = [
+    # v1: index สำหรับหน้า History (เรียงตามเวลา / กรองตามเหรียญ)
+    [
+        "CREATE INDEX IF NOT EXISTS idx_orders_ts ON orders(ts)",
+        "CREATE INDEX IF NOT EXISTS idx_orders_symbol_ts ON orders(symbol, ts)",
+    ],
+    # v2: Timeframe แยกรายเหรียญ (NULL = ใช้ config.TIMEFRAME)
+    [
+        "ALTER TABLE symbols ADD COLUMN timeframe INTEGER",
+    ],
+    # v3: Checkpoint สถานะในหน่วยความจำของ BotEngine (engine_state.py)
+    [
+        """CREATE TABLE IF NOT EXISTS engine_state (
+            name TEXT,
+            key TEXT,
+            value TEXT,
+            version INTEGER,
+            updated REAL,
+            PRIMARY KEY (name, key)
+        )""",
+    ],
+    # v4: Limit order ของบอทที่ยังค้างอยู่ (reconcile.py ใช้เทียบกับ my-open-orders ของ Bitkub)
+    [
+        """CREATE TABLE IF NOT EXISTS pending_orders (
+            order_id TEXT PRIMARY KEY,
+            symbol TEXT,
+            side TEXT,
+            amount REAL,
+            rate REAL,
+            receive REAL,
+            ts REAL
+        )""",
+    ],
+    # v5: ส่วนที่ match แล้วและถูกนับเข้า cost/coin แล้ว (filled = หน่วยเดียวกับ amount, received = สิ่งที่ได้รับ)
+    # แถวเดิมถูกนับเต็มจำนวนตอนส่งคำสั่ง
+    [
+        "ALTER TABLE pending_orders ADD COLUMN filled REAL NOT NULL DEFAULT 0",
+        "ALTER TABLE pending_orders ADD COLUMN received REAL NOT NULL DEFAULT 0",
+        "UPDATE pending_orders SET filled = amount, received = receive",
+    ],
+]
+
+def _migrate(conn):
+    version = conn.execute("PRAGMA user_version").fetchone()[0]
+    for target, statements in enumerate(MIGRATIONS[version:], start=version + 1):
+        for sql in statements:
+            conn.execute(sql)
+        conn.execute(f"PRAGMA user_version={target}")
+        conn.commit()
+        print(f"🛠️ DB migrated to v{target}")
+
+# --- Connection Pool ---
+# 🟢 เปิด Connection ค้างไว้ตลอดอายุแอป: Writer 1 ตัว (เขียนทีละคำสั่ง) + Reader หลายตัว
+# Statement ที่ใช้บ่อยถูก cache ไว้ใน Connection (cached_statements) ไม่ต้อง prepare ใหม่ทุกครั้ง
+_writer = None
+_write_lock = None
+_readers = None
+_pool_loop = None
+_open_lock = None
+_open_lock_loop = None
+
+async def _connect():
+    conn = await aiosqlite.connect(DB_NAME, cached_statements=config.DB_CACHED_STATEMENTS)
+    conn.row_factory = aiosqlite.Row
+    await conn.execute("PRAGMA journal_mode=WAL;")
+    await conn.execute("PRAGMA synchronous=NORMAL;")
+    await conn.execute(f"PRAGMA busy_timeout={int(config.DB_BUSY_TIMEOUT_MS)};")
+    return conn
+
+async def open_pool():
+    global _writer, _write_lock, _readers, _pool_loop
+    loop = asyncio.get_running_loop()
+    if _writer is not None and _pool_loop is loop:
+        return
+    _writer = await _connect()
+    _write_lock = asyncio.Lock()
+    _readers = asyncio.Queue()
+    for _ in range(max(1, config.DB_READERS)):
+        _readers.put_nowait(await _connect())
+    _pool_loop = loop
+
+async def close_pool():
+    global _writer, _readers, _pool_loop
+    if _writer is None:
+        return
+    # flush คิว write-behind ให้ลง DB ก่อนปิด Connection
+    await journal.stop()
+    # รอให้คำสั่งเขียนที่ค้างอยู่ทำงานเสร็จก่อนปิด
+    async with _write_lock:
+        await _writer.close()
+    while _readers is not None and not _readers.empty():
+        await _readers.get_nowait().close()
+    _writer, _readers, _pool_loop = None, None, None
+
+async def _ensure_pool():
+    global _open_lock, _open_lock_loop
+    loop = asyncio.get_running_loop()
+    if _writer is not None and _pool_loop is loop:
+        return
+    # เปิดอัตโนมัติเมื่อถูกเรียกนอก FastAPI (เช่นสคริปต์ Backtest / Benchmark)
+    if _open_lock_loop is not loop:
+        _open_lock, _open_lock_loop = asyncio.Lock(), loop
+    async with _open_lock:
+        await open_pool()
+
+@asynccontextmanager
+async def _write():
+    """Transaction สำหรับเขียน: commit เมื่อจบ block, rollback ถ้าเกิด Error"""
+    await _ensure_pool()
+    # 🟢 เวลารวมรอ Lock + execute + commit
+    started = time.perf_counter()
+    async with _write_lock:
+        try:
+            yield _writer
+            await _writer.commit()
+        except BaseException:
+            await _writer.rollback()
+            raise
+        finally:
+            metrics.DB_SECONDS.observe("write", value=time.perf_counter() - started)
+
+@asynccontextmanager
+async def _read():
+    await _ensure_pool()
+    started = time.perf_counter()
+    conn = await _readers.get()
+    try:
+        yield conn
+    finally:
+        _readers.put_nowait(conn)
+        metrics.DB_SECONDS.observe("read", value=time.perf_counter() - started)
+
+# --- Write-Behind Journal ---
+ORDER_FIELDS = ("order_id", "symbol", "type", "amount", "rate", "ts", "reason")
+PENDING_FIELDS = ("order_id", "symbol", "side", "amount", "rate", "receive", "ts", "filled", "received")
+
+class OrderJournal:
+    """
+    คิวเขียนแบบ write-behind สำหรับ orders, cost/coin ของแต่ละเหรียญ และ pending_orders
+    - รวมหลายคำสั่งเป็น Transaction เดียวด้วย executemany
+    - flush อัตโนมัติทุก flush_interval วินาที หรือเมื่อคิวถึง max_batch
+    - ผู้เรียกที่ต้องการให้ข้อมูลลง DB แล้วแน่นอน ให้ await journal.flush()
+    """
+    def __init__(self, flush_interval=None, max_batch=None):
+        self.flush_interval = flush_interval or config.JOURNAL_FLUSH_INTERVAL
+        self.max_batch = max_batch or config.JOURNAL_MAX_BATCH
+        self._orders = []
+        self._positions = {}    # s_id -> (cost, coin) ค่าล่าสุดชนะ
+        self._pending = {}      # order_id -> แถว pending_orders (None = ลบออก)
+        self._task = None
+        self._wake = None
+        self._flush_lock = None
+        self._listeners = []
+
+    @property
+    def running(self):
+        return self._task is not None and not self._task.done()
+
+    def pending(self):
+        return len(self._orders) + len(self._positions) + len(self._pending)
+
+    def has_pending_positions(self):
+        return bool(self._positions)
+
+    def _notify(self):
+        if self._wake is not None and self.pending() >= self.max_batch:
+            self._wake.set()
+
+    def add_order(self, row):
+        self._orders.append(row)
+        self._notify()
+
+    def add_position(self, s_id, cost, coin):
+        self._positions[s_id] = (cost, coin)
+        self._notify()
+
+    def add_pending(self, row):
+        self._pending[row[0]] = row
+        self._notify()
+
+    def remove_pending(self, order_id):
+        self._pending[str(order_id)] = None
+        self._notify()
+
+    def subscribe(self, callback):
+        """
+        ลงทะเบียน callback(orders, positions) ที่จะถูกเรียกหลัง commit สำเร็จ
+        orders เป็น list ของ dict (คอลัมน์เดียวกับตาราง orders), positions เป็น {s_id: (cost, coin)}
+        """
+        self._listeners.append(callback)
+
+    async def flush(self):
+        if self._flush_lock is None:
+            self._flush_lock = asyncio.Lock()
+        async with self._flush_lock:
+            if not self.pending():
+                return 0
+            orders, positions, pending = self._orders, self._positions, self._pending
+            self._orders, self._positions, self._pending = [], {}, {}
+            try:
+                async with _write() as db:
+                    if pending:
+                        upserts = [row for row in pending.values() if row is not None]
+                        removed = [(order_id,) for order_id, row in pending.items() if row is None]
+                        if upserts:
+                            await db.executemany(
+                                f"INSERT OR REPLACE INTO pending_orders ({', '.join(PENDING_FIELDS)}) "
+                            f"VALUES ({', '.join('?' * len(PENDING_FIELDS))})",
+                                upserts
+                            )
+                        if removed:
+                            await db.executemany("DELETE FROM pending_orders WHERE order_id=?", removed)
+                    if positions:
+                        await db.executemany(
+                            "UPDATE symbols SET cost=?, coin=? WHERE id=?",
+                            [(cost, coin, s_id) for s_id, (cost, coin) in positions.items()]
+                        )
+                    if orders:
+                        await db.executemany("""
+                            INSERT INTO orders (order_id, symbol, type, amount, rate, ts, reason)
+                            VALUES (?, ?, ?, ?, ?, ?, ?)
+                        """, orders)
+            except Exception:
+                # เขียนไม่สำเร็จ -> คืนเข้าคิว (ค่า position ที่ใหม่กว่าในคิวยังคงชนะ)
+                self._orders = orders + self._orders
+                for s_id, value in positions.items():
+                    self._positions.setdefault(s_id, value)
+                for order_id, row in pending.items():
+                    self._pending.setdefault(order_id, row)
+                raise
+            metrics.DB_FLUSH_ROWS.inc("orders", amount=len(orders))
+            metrics.DB_FLUSH_ROWS.inc("positions", amount=len(positions))
+            if orders:
+                print(f"✅ Saved {len(orders)} order(s) to DB ({', '.join(sorted({o[1] for o in orders}))}).")
+
+        # แจ้ง listener นอก Lock (เช่น ส่ง Event ไปหน้า Dashboard) ไม่ให้ถ่วงการ flush รอบถัดไป
+        if self._listeners:
+            order_dicts = [dict(zip(ORDER_FIELDS, row)) for row in orders]
+            for callback in self._listeners:
+                try:
+                    await callback(order_dicts, positions)
+                except Exception as e:
+                    print(f"⚠️ Journal Listener Error: {e}")
+        return len(orders) + len(positions) + len(pending)
+
+    async def run(self):
+        while True:
+            try:
+                await asyncio.wait_for(self._wake.wait(), timeout=self.flush_interval)
+            except asyncio.TimeoutError:
+                pass
+            self._wake.clear()
+            try:
+                await self.flush()
+            except Exception as e:
+                print(f"⚠️ Journal Flush Error: {e}")
+
+    def start(self):
+        if not self.running:
+            self._wake = asyncio.Event()
+            self._flush_lock = asyncio.Lock()
+            self._task = asyncio.create_task(self.run())
+
+    async def stop(self):
+        """หยุด background task แล้ว flush ที่เหลือทั้งหมดลง DB"""
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        await self.flush()
+
+journal = OrderJournal()
+
 # --- Async Functions ---
 
+async def _flush_positions():
+    # อ่าน cost/coin ต้องเห็นค่าที่ยังค้างในคิวด้วย (read-after-write)
+    if journal.has_pending_positions():
+        await journal.flush()
+
 # 🟢 1. สำหรับ Dashboard (ดึงทั้งหมด)
 async def get_all_symbols():
-    async with aiosqlite.connect(DB_NAME) as db:
-        db.row_factory = aiosqlite.Row
+    await _flush_positions()
+    async with _read() as db:
         # ดึงทั้งหมด ไม่สน status
         async with db.execute("SELECT * FROM symbols ORDER BY symbol ASC") as cursor:
             rows = await cursor.fetchall()
@@ -53,85 +343,159 @@ async def get_all_symbols():
 
 # 🟢 2. สำหรับ Bot Engine (ดึงเฉพาะที่เปิด)
 async def get_active_symbols():
-    async with aiosqlite.connect(DB_NAME) as db:
-        db.row_factory = aiosqlite.Row
+    await _flush_positions()
+    async with _read() as db:
         # ดึงเฉพาะ status = 'true'
         async with db.execute("SELECT * FROM symbols WHERE status = 'true'") as cursor:
             rows = await cursor.fetchall()
             return [dict(row) for row in rows]
 
-# 🟢 3. เพิ่มการรับค่า strategy
-async def add_symbol(symbol, money_limit, cost_st, strategy=1):
-    async with aiosqlite.connect(DB_NAME) as db:
-        try:
+# 🟢 3. เพิ่มการรับค่า strategy / timeframe
+async def add_symbol(symbol, money_limit, cost_st, strategy=1, timeframe=None):
+    try:
+        async with _write() as db:
             await db.execute(
-                "INSERT INTO symbols (symbol, money_limit, cost_st, strategy) VALUES (?, ?, ?, ?)",
-                (symbol, money_limit, cost_st, strategy)
+                "INSERT INTO symbols (symbol, money_limit, cost_st, strategy, timeframe) VALUES (?, ?, ?, ?, ?)",
+                (symbol, money_limit, cost_st, strategy, timeframe)
             )
-            await db.commit()
-            return True
-        except:
-            return False
+        return True
+    except:
+        return False
 
 async def update_cost_coin(s_id, new_cost, new_coin):
-    async with aiosqlite.connect(DB_NAME) as db:
-        await db.execute(
-            "UPDATE symbols SET cost=?, coin=? WHERE id=?",
-            (new_cost, new_coin, s_id)
-        )
-        await db.commit()
+    # 🟢 เข้าคิว write-behind (ถ้าไม่ได้ start journal ไว้ จะเขียนทันที)
+    journal.add_position(s_id, new_cost, new_coin)
+    if not journal.running:
+        await journal.flush()
 
-async def save_order(symbol, order_data, reason):
+def queue_order(symbol, order_data, reason):
+    """เข้าคิว journal อย่างเดียว (ผู้เรียก flush เองเพื่อรวมกับการปรับ cost/coin ใน Transaction เดียว)"""
     # 1. ดึงข้อมูล result ออกมาจาก JSON (เพราะ response มี error, result)
     if isinstance(order_data, dict) and "result" in order_data:
         data = order_data["result"]
     else:
         data = order_data
 
-    # 2. บันทึกลงฐานข้อมูล
-    async with aiosqlite.connect(DB_NAME) as db:
-        await db.execute("""
-            INSERT INTO orders (order_id, symbol, type, amount, rate, ts, reason)
-            VALUES (?, ?, ?, ?, ?, ?, ?)
-        """, (
-            str(data.get('id', '')),        
-            symbol,                         
-            data.get('typ', 'limit'),       
-            float(data.get('amt', 0)),      
-            float(data.get('rat', 0)),      
-            int(data.get('ts', int(time.time()))), 
-            reason
-        ))
-        await db.commit()
-        print(f"✅ Saved order {data.get('id')} for {symbol} to DB.")
+    # 2. เข้าคิวบันทึกลงฐานข้อมูล (รวมเป็น Transaction เดียวตอน flush)
+    journal.add_order((
+        str(data.get('id', '')),        
+        symbol,                         
+        data.get('typ', 'limit'),       
+        float(data.get('amt', 0)),      
+        float(data.get('rat', 0)),      
+        int(data.get('ts', int(time.time()))), 
+        reason
+    ))
+
+async def save_order(symbol, order_data, reason):
+    queue_order(symbol, order_data, reason)
+    if not journal.running:
+        await journal.flush()
 
 async def delete_symbol_data(s_id):
-    async with aiosqlite.connect(DB_NAME) as db:
+    async with _write() as db:
         await db.execute("DELETE FROM symbols WHERE id=?", (s_id,))
-        await db.commit()
 
-# 🟢 4. เพิ่มการอัปเดตฟิลด์ strategy
+# 🟢 4. เพิ่มการอัปเดตฟิลด์ strategy / timeframe
 async def update_symbol_data(s_id, data):
-    async with aiosqlite.connect(DB_NAME) as db:
+    async with _write() as db:
         await db.execute(
-            "UPDATE symbols SET status=?, money_limit=?, cost_st=?, strategy=? WHERE id=?",
-            (data['status'], data['money_limit'], data['cost_st'], data.get('strategy', 1), s_id)
+            "UPDATE symbols SET status=?, money_limit=?, cost_st=?, strategy=?, timeframe=? WHERE id=?",
+            (data['status'], data['money_limit'], data['cost_st'], data.get('strategy', 1), data.get('timeframe'), s_id)
         )
-        await db.commit()
 
-async def get_orders(limit=50):
-    async with aiosqlite.connect(DB_NAME) as db:
-        db.row_factory = aiosqlite.Row
-        # ดึงข้อมูล เรียงจากเวลาล่าสุด (ts DESC)
-        async with db.execute(f"SELECT * FROM orders ORDER BY ts DESC LIMIT {limit}") as cursor:
+async def get_orders(limit=50, symbol=None, before=None, before_id=None):
+    """
+    ประวัติออเดอร์ล่าสุดแบบแบ่งหน้า (Keyset Pagination)
+    หน้าถัดไป: ส่ง ts และ id ของแถวสุดท้ายมาเป็น before / before_id
+    """
+    limit = max(1, min(int(limit), 500))
+    where, params = [], []
+    if symbol:
+        where.append("symbol = ?")
+        params.append(symbol)
+    if before is not None:
+        if before_id is not None:
+            where.append("(ts, id) < (?, ?)")
+            params += [before, before_id]
+        else:
+            where.append("ts < ?")
+            params.append(before)
+
+    sql = "SELECT * FROM orders"
+    if where:
+        sql += " WHERE " + " AND ".join(where)
+    # ดึงข้อมูล เรียงจากเวลาล่าสุด (ts DESC) ใช้ index idx_orders_ts / idx_orders_symbol_ts
+    sql += " ORDER BY ts DESC, id DESC LIMIT ?"
+    params.append(limit)
+
+    async with _read() as db:
+        async with db.execute(sql, params) as cursor:
             rows = await cursor.fetchall()
             return [dict(row) for row in rows]
         
 async def get_symbol_by_name(symbol):
-    async with aiosqlite.connect(DB_NAME) as db:
-        db.row_factory = aiosqlite.Row
+    await _flush_positions()
+    async with _read() as db:
         async with db.execute("SELECT * FROM symbols WHERE symbol = ?", (symbol,)) as cursor:
             row = await cursor.fetchone()
             if row:
                 return dict(row)
-            return None
\ No newline at end of file
+            return None
+
+# 🟢 Checkpoint สถานะของ BotEngine (ดู engine_state.py)
+async def load_engine_state(version):
+    async with _read() as db:
+        async with db.execute("SELECT name, key, value FROM engine_state WHERE version = ?", (version,)) as cursor:
+            return [tuple(row) for row in await cursor.fetchall()]
+
+async def save_engine_state(upserts, deletes):
+    """upserts: [(name, key, value_json, version)], deletes: [(name, key)] ใน Transaction เดียว"""
+    now = time.time()
+    async with _write() as db:
+        if upserts:
+            await db.executemany("""
+                INSERT INTO engine_state (name, key, value, version, updated) VALUES (?, ?, ?, ?, ?)
+                ON CONFLICT(name, key) DO UPDATE SET value=excluded.value, version=excluded.version, updated=excluded.updated
+            """, [row + (now,) for row in upserts])
+        if deletes:
+            await db.executemany("DELETE FROM engine_state WHERE name=? AND key=?", deletes)
+
+# 🟢 Limit order ที่บอทส่งแล้วยังค้าง (ดู reconcile.py)
+async def track_pending_order(symbol, side, order_data, ts, filled=0.0, received=0.0):
+    """filled/received = ส่วนที่ match แล้วและนับเข้า cost/coin ไปแล้วตอนส่งคำสั่ง"""
+    data = order_data.get("result", order_data) if isinstance(order_data, dict) else order_data
+    side = side.lower()
+    amount, rate = float(data.get('amt', 0)), float(data.get('rat', 0))
+    # ยอดที่จะได้ถ้า match ครบ (Limit order บางที่ไม่ส่ง rec มา -> ประมาณจากราคา)
+    receive = float(data.get('rec', 0) or 0)
+    if not receive and rate > 0:
+        receive = amount / rate if side == 'buy' else amount * rate
+    journal.add_pending((
+        str(data.get('id', '')),
+        symbol,
+        side,
+        amount,
+        rate,
+        receive,
+        float(ts),
+        float(filled),
+        float(received),
+    ))
+    if not journal.running:
+        await journal.flush()
+
+def untrack_pending_order(order_id):
+    # เข้าคิวพร้อมกับ position/order ที่ปรับ (ลง DB ใน Transaction เดียวตอน flush)
+    journal.remove_pending(order_id)
+
+async def get_pending_orders(symbol=None):
+    if journal.pending():
+        await journal.flush()
+    async with _read() as db:
+        if symbol is None:
+            query, params = "SELECT * FROM pending_orders", ()
+        else:
+            query, params = "SELECT * FROM pending_orders WHERE symbol = ?", (symbol,)
+        async with db.execute(query, params) as cursor:
+            return {row["order_id"]: dict(row) for row in await cursor.fetchall()}
@@ -0,0 +1,109 @@
+"""
+Checkpoint สถานะในหน่วยความจำของ BotEngine ลง SQLite (ตาราง engine_state)
+เพื่อให้ Restart / Deploy ใหม่แล้วบอทตัดสินใจเหมือนเดิมทันที ไม่ต้องรอหลายรอบ
+
+- trailing_highs         : จุดสูงสุดของ TTP (ถ้าหาย จะขายช้ากว่าที่ควร)
+- active_auto_strategies : กลยุทธ์ที่ใช้ซื้อในโหมด Auto (ถ้าหาย จะ fallback เป็น Strat 1 ตอนขาย)
+- last_status            : สัญญาณล่าสุด (ถ้าหาย จะยกเลิกออเดอร์ค้างโดยไม่จำเป็นในรอบแรก)
+- market_regimes         : สถานะตลาดที่โชว์บน Dashboard
+
+แต่ละ dict เป็น TrackedDict ที่จดไว้ว่า key ไหนเปลี่ยน -> checkpoint เขียนเฉพาะแถวที่เปลี่ยน
+(upsert / delete ใน Transaction เดียว) ถ้าไม่มีอะไรเปลี่ยนจะไม่แตะ DB เลย
+แถวที่ version ไม่ตรงกับ STATE_VERSION (เขียนด้วยโค้ดรุ่นเก่า) จะถูกข้ามตอนโหลด
+"""
+import json
+import time
+
+import database as db
+
+# 🟢 เพิ่มเลขนี้เมื่อรูปแบบค่าที่เก็บเปลี่ยน (ค่าเก่าจะไม่ถูกโหลด)
+STATE_VERSION = 1
+
+STATE_FIELDS = ("trailing_highs", "active_auto_strategies", "last_status", "market_regimes")
+
+
+class TrackedDict(dict):
+    """dict ที่จำ key ที่ถูกแก้/ลบตั้งแต่ checkpoint ล่าสุด (ค่าเดิมซ้ำไม่นับว่าเปลี่ยน)"""
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.dirty = set()
+
+    def __setitem__(self, key, value):
+        if key in self and dict.__getitem__(self, key) == value:
+            return
+        dict.__setitem__(self, key, value)
+        self.dirty.add(key)
+
+    def __delitem__(self, key):
+        dict.__delitem__(self, key)
+        self.dirty.add(key)
+
+    def pop(self, key, *default):
+        if key in self:
+            self.dirty.add(key)
+        return dict.pop(self, key, *default)
+
+    def setdefault(self, key, default=None):
+        if key not in self:
+            self[key] = default
+        return dict.__getitem__(self, key)
+
+    def update(self, *args, **kwargs):
+        for key, value in dict(*args, **kwargs).items():
+            self[key] = value
+
+    def clear(self):
+        self.dirty.update(self.keys())
+        dict.clear(self)
+
+    def load(self, items):
+        """ใส่ค่าที่โหลดจาก DB โดยไม่นับว่าเปลี่ยน"""
+        dict.update(self, items)
+
+
+class EngineCheckpoint:
+    """โหลด/บันทึก field ใน STATE_FIELDS ของ engine ลงตาราง engine_state"""
+    def __init__(self, engine):
+        self.engine = engine
+        self.saved_at = None
+
+    def _fields(self):
+        return {name: getattr(self.engine, name) for name in STATE_FIELDS}
+
+    async def restore(self):
+        """โหลด checkpoint กลับเข้า engine คืนจำนวนค่าที่โหลดได้"""
+        rows = await db.load_engine_state(STATE_VERSION)
+        fields = self._fields()
+        loaded = {name: {} for name in STATE_FIELDS}
+        for name, key, value in rows:
+            if name in loaded:
+                loaded[name][key] = json.loads(value)
+        for name, items in loaded.items():
+            fields[name].load(items)
+        return len(rows)
+
+    async def save(self):
+        """เขียนเฉพาะค่าที่เปลี่ยน คืนจำนวนแถวที่เขียน/ลบ"""
+        upserts, deletes = [], []
+        taken = []
+        for name, values in self._fields().items():
+            if not values.dirty:
+                continue
+            dirty, values.dirty = values.dirty, set()
+            taken.append((values, dirty))
+            for key in dirty:
+                if key in values:
+                    upserts.append((name, key, json.dumps(values[key]), STATE_VERSION))
+                else:
+                    deletes.append((name, key))
+        if not upserts and not deletes:
+            return 0
+        try:
+            await db.save_engine_state(upserts, deletes)
+        except Exception:
+            # เขียนไม่สำเร็จ -> จำไว้ว่ายังไม่ได้บันทึก (รอบหน้าลองใหม่)
+            for values, dirty in taken:
+                values.dirty |= dirty
+            raise
+        self.saved_at = time.time()
+        return len(upserts) + len(deletes)
@@ -0,0 +1,233 @@
+"""
+ส่งคำสั่งซื้อขายแบบดู Order book ก่อน (ลด Slippage ในคู่เหรียญที่สภาพคล่องต่ำ)
+
+1. ดึง Depth ทั้งสองฝั่ง (get_bids + get_asks) เก็บ cache สั้นๆ ต่อเหรียญ
+2. ประเมินราคาเฉลี่ยถ้าส่ง Market order ขนาดนี้ เทียบกับราคาที่ดีที่สุด (best) = Slippage โดยประมาณ
+3. เลือกวิธีส่ง:
+   - market : Slippage ไม่เกิน EXEC_MAX_SLIPPAGE_PCT (หรือไม่มีข้อมูล Order book)
+   - limit  : Marketable limit ที่ราคาเพดาน (best ± EXEC_LIMIT_SLIPPAGE_PCT) ถ้า Depth ถึงเพดานพอสำหรับทั้งก้อน
+   - split  : แบ่งเป็นคำสั่งย่อยไม่เกิน EXEC_MAX_CHILDREN ก้อน เว้นระยะให้ Order book เติมก่อนส่งก้อนถัดไป
+
+หลังส่งแต่ละก้อนจะถาม order-info ว่า match ไปเท่าไหร่ นับเข้า cost/coin เฉพาะส่วนที่ match แล้ว
+ส่วนของ Limit order ที่ยังค้างอยู่ที่ราคาเพดานจะถูกบันทึกไว้ใน pending_orders แล้วให้ OrderReconciler
+(reconcile.py) นับเพิ่มตอนยืนยันว่า match หรือยกเลิกทิ้งเมื่อค้างนานเกินไป
+"""
+import asyncio
+import math
+import time
+
+import config
+import utils
+
+
+def parse_levels(result):
+    """
+    แปลง result ของ bids/asks เป็น [(ราคา, จำนวนเหรียญ)] เรียงจากราคาที่ดีที่สุด
+    รองรับทั้งแบบ V3 (dict: price, size/volume) และแบบเดิม (list: [id, ts, volume, rate, amount])
+    """
+    levels = []
+    for row in result or []:
+        try:
+            if isinstance(row, dict):
+                price = float(row["price"])
+                size = float(row.get("size") or float(row.get("volume", 0)) / price)
+            else:
+                price, size = float(row[3]), float(row[4])
+        except (KeyError, IndexError, TypeError, ValueError, ZeroDivisionError):
+            continue
+        if price > 0 and size > 0:
+            levels.append((price, size))
+    return levels
+
+
+def walk_book(levels, side, amount, limit_price=None):
+    """
+    จำลองการกิน Order book
+    - BUY : amount เป็น THB, กิน asks จากราคาต่ำไปสูง
+    - SELL: amount เป็นเหรียญ, กิน bids จากราคาสูงไปต่ำ
+    หยุดที่ limit_price (ถ้าระบุ) คืน (จำนวนที่ใช้ไป, จำนวนที่ได้, ราคาเฉลี่ย) เป็นหน่วยเดียวกับ amount/ผลลัพธ์
+    """
+    used = got = 0.0
+    for price, size in levels:
+        if limit_price is not None and (price > limit_price if side == "BUY" else price < limit_price):
+            break
+        remaining = amount - used
+        if remaining <= 0:
+            break
+        if side == "BUY":
+            spend = min(remaining, size * price)
+            used += spend
+            got += spend / price
+        else:
+            qty = min(remaining, size)
+            used += qty
+            got += qty * price
+    if used <= 0:
+        return 0.0, 0.0, None
+    avg = used / got if side == "BUY" else got / used
+    return used, got, avg
+
+
+def parse_fill(result, side):
+    """
+    แปลง result ของ order-info เป็น (จำนวนที่ match แล้ว, จำนวนที่ได้รับ, ยังค้างอยู่บน Order book)
+    - BUY : filled = THB, received = เหรียญ (หัก fee แล้ว)
+    - SELL: filled = เหรียญ, received = THB (หัก fee แล้ว)
+    """
+    history = result.get("history") or []
+    filled = received = 0.0
+    if history:
+        for fill in history:
+            amount, rate, fee = float(fill.get("amount", 0)), float(fill.get("rate", 0)), float(fill.get("fee", 0))
+            if amount <= 0 or rate <= 0:
+                continue
+            filled += amount
+            received += (amount - fee) / rate if side == "BUY" else amount * rate - fee
+    else:
+        filled, rate = float(result.get("filled", 0) or 0), float(result.get("rate", 0) or 0)
+        total = float(result.get("total", 0) or result.get("amount", 0) or 0)
+        if filled > 0 and rate > 0:
+            fee = float(result.get("fee", 0) or 0) * (filled / total if total else 1)
+            received = (filled - fee) / rate if side == "BUY" else filled * rate - fee
+    status = str(result.get("status", "")).lower()
+    still_open = status not in ("filled", "cancelled", "canceled", "rejected")
+    return filled, max(0.0, received), still_open
+
+
+class DepthCache:
+    """Depth ล่าสุดของแต่ละเหรียญ (bids, asks, เวลาที่ดึง) อายุ EXEC_DEPTH_TTL วินาที"""
+    def __init__(self, ttl=None):
+        self.ttl = config.EXEC_DEPTH_TTL if ttl is None else ttl
+        self._books = {}
+
+    def invalidate(self, sym):
+        self._books.pop(utils.normalize_symbol(sym, to_api=True), None)
+
+    async def get(self, api, client, sym):
+        key = utils.normalize_symbol(sym, to_api=True)
+        cached = self._books.get(key)
+        if cached is not None and time.monotonic() - cached[2] < self.ttl:
+            return cached[0], cached[1]
+        bids_res, asks_res = await asyncio.gather(
+            api.get_bids(client, sym, config.EXEC_DEPTH_LEVELS),
+            api.get_asks(client, sym, config.EXEC_DEPTH_LEVELS),
+        )
+        bids = parse_levels(bids_res.get("result")) if bids_res.get("error") == 0 else []
+        asks = parse_levels(asks_res.get("result")) if asks_res.get("error") == 0 else []
+        bids.sort(key=lambda level: -level[0])
+        asks.sort(key=lambda level: level[0])
+        self._books[key] = (bids, asks, time.monotonic())
+        return bids, asks
+
+
+def plan_order(bids, asks, side, amount):
+    """
+    เลือกวิธีส่งคำสั่ง คืน dict: mode (market/limit/split), children, limit_price, est_slippage_pct
+    children = จำนวนคำสั่งย่อย (market/limit = 1)
+    """
+    book = asks if side == "BUY" else bids
+    if not book:
+        return {"mode": "market", "children": 1, "limit_price": None, "est_slippage_pct": None}
+
+    best = book[0][0]
+    used, _, avg = walk_book(book, side, amount)
+    if used + 1e-12 < amount:
+        # Depth ที่ดึงมาไม่พอทั้งก้อน: ถือว่าส่วนที่เหลือโดนราคาแย่สุดที่เห็น
+        worst = book[-1][0]
+        avg = worst if avg is None else avg
+    slippage = (avg - best) / best * 100 if side == "BUY" else (best - avg) / best * 100
+    plan = {"mode": "market", "children": 1, "limit_price": None, "est_slippage_pct": round(slippage, 4)}
+    if slippage <= config.EXEC_MAX_SLIPPAGE_PCT and used + 1e-12 >= amount:
+        return plan
+
+    tolerance = config.EXEC_LIMIT_SLIPPAGE_PCT / 100
+    limit_price = best * (1 + tolerance) if side == "BUY" else best * (1 - tolerance)
+    within, _, _ = walk_book(book, side, amount, limit_price)
+    plan["limit_price"] = limit_price
+    if within + 1e-12 >= amount:
+        plan["mode"] = "limit"
+        return plan
+
+    # Depth ถึงเพดานไม่พอ -> แบ่งก้อนตามสัดส่วนที่ Order book รับได้ตอนนี้
+    children = math.ceil(amount / within) if within > 0 else config.EXEC_MAX_CHILDREN
+    plan["mode"] = "split"
+    plan["children"] = max(2, min(config.EXEC_MAX_CHILDREN, children))
+    return plan
+
+
+class Executor:
+    """
+    ส่งคำสั่งซื้อขายตามแผนจาก Order book แล้วรวมผลให้ execute_trade ปรับ cost/coin
+    คืน dict: error, orders (result ของแต่ละคำสั่งที่สำเร็จ), spent, received, pending, mode, est_slippage_pct
+    - BUY : spent = THB, received = เหรียญ
+    - SELL: spent = เหรียญ, received = THB
+    spent/received = เฉพาะส่วนที่ match แล้ว
+    pending = Limit order ที่ยังค้างอยู่ [{result, filled, received}] (filled/received = ส่วนที่นับไปแล้ว)
+    """
+    def __init__(self, api, depth=None):
+        self.api = api
+        self.depth = depth or DepthCache()
+
+    async def execute(self, client, sym, side, amount, ref_price):
+        side = side.upper()
+        if not config.EXEC_ENABLED:
+            plan = {"mode": "market", "children": 1, "limit_price": None, "est_slippage_pct": None}
+        else:
+            bids, asks = await self.depth.get(self.api, client, sym)
+            plan = plan_order(bids, asks, side, amount)
+
+        children = plan["children"]
+        child_amount = amount / children
+        min_thb = config.EXEC_MIN_ORDER_THB
+        if children > 1 and (child_amount if side == "BUY" else child_amount * ref_price) < min_thb:
+            # ก้อนย่อยเล็กกว่าขั้นต่ำของ Bitkub -> ส่ง Market ก้อนเดียว (ราคาเพดานคิดไว้สำหรับก้อนย่อย)
+            children, child_amount = 1, amount
+            plan = {**plan, "mode": "market", "children": 1, "limit_price": None}
+
+        outcome = {"error": 0, "orders": [], "spent": 0.0, "received": 0.0, "pending": [],
+                   "mode": plan["mode"], "est_slippage_pct": plan["est_slippage_pct"]}
+        sent = 0.0
+
+        for k in range(children):
+            if k > 0:
+                # ให้ Order book เติมก่อน แล้วคิดราคาเพดานใหม่จาก Depth ล่าสุด
+                await asyncio.sleep(config.EXEC_CHILD_DELAY)
+                self.depth.invalidate(sym)
+                bids, asks = await self.depth.get(self.api, client, sym)
+                plan = plan_order(bids, asks, side, child_amount)
+            size = amount - sent if k == children - 1 else child_amount
+
+            if plan["mode"] == "market":
+                res = await self.api.place_order(client, sym, size, 0, side, type='market')
+            else:
+                res = await self.api.place_order(client, sym, size, plan["limit_price"], side, type='limit')
+
+            if res.get('error') != 0:
+                if not outcome["orders"]:
+                    outcome["error"] = res.get('error')
+                    outcome["result"] = res.get('result')
+                break
+
+            result = res['result']
+            price = plan["limit_price"] or ref_price
+            # Market order ได้ rat = 0 กลับมา บันทึกเป็นราคาอ้างอิงแทน (เหมือนเดิม)
+            result['rat'] = result.get('rat') or price
+            filled, received, still_open = await self._fill_status(client, sym, side, result, size, price)
+            outcome["orders"].append(result)
+            sent += size
+            outcome["spent"] += filled
+            outcome["received"] += received
+            if result.get('typ') == 'limit' and still_open:
+                outcome["pending"].append({"result": result, "filled": filled, "received": received})
+
+        self.depth.invalidate(sym)
+        return outcome
+
+    async def _fill_status(self, client, sym, side, result, size, price):
+        """ส่วนที่ match แล้วของคำสั่งที่เพิ่งส่ง (ถาม order-info ไม่ได้: Market = ครบ, Limit = ยังไม่ match)"""
+        info = await self.api.get_order_info(client, sym, result.get('id'), side.lower())
+        if isinstance(info, dict) and info.get('error') == 0 and isinstance(info.get('result'), dict):
+            return parse_fill(info['result'], side)
+        if result.get('typ') == 'market':
+            return size, result.get('rec', 0) or (size / price if side == "BUY" else size * price), False
+        return 0.0, 0.0, True
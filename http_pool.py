@@ -0,0 +1,33 @@
+import httpx
+import config
+
+
+def _http2_available():
+    try:
+        import h2  # noqa: F401
+        return True
+    except ImportError:
+        return False
+
+
+def timeout_for(kind):
+    """Timeout ของ endpoint แต่ละกลุ่ม (status, servertime, market, trade, telegram)"""
+    total = config.HTTP_TIMEOUTS.get(kind, config.HTTP_TIMEOUTS["default"])
+    return httpx.Timeout(total, connect=min(total, config.HTTP_TIMEOUTS["connect"]))
+
+
+def create_http_client():
+    """
+    สร้าง httpx.AsyncClient ตัวเดียวที่ใช้ทั้งแอป (Bot, API Routes, Telegram)
+    เปิด keep-alive และ HTTP/2 (ถ้ามี h2) เพื่อไม่ต้องเปิด TCP/TLS ใหม่ทุก Request
+    """
+    http2 = config.HTTP2_ENABLED and _http2_available()
+    if config.HTTP2_ENABLED and not http2:
+        print("ℹ️ h2 not installed, using HTTP/1.1 (pip install httpx[http2])")
+
+    limits = httpx.Limits(
+        max_connections=config.HTTP_MAX_CONNECTIONS,
+        max_keepalive_connections=config.HTTP_MAX_KEEPALIVE,
+        keepalive_expiry=config.HTTP_KEEPALIVE_EXPIRY,
+    )
+    return httpx.AsyncClient(http2=http2, limits=limits, timeout=timeout_for("default"))
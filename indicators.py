@@ -1,7 +1,17 @@
 import pandas as pd
 import numpy as np
 
+import indicators_kernel as kernel
+
+# 🟢 ถ้าติดตั้ง Numba ไว้ ใช้ Kernel ที่คอมไพล์แล้ว (ผลเท่าเดิม) ไม่งั้นใช้ pandas ตามเดิม
+USE_KERNEL = kernel.ENABLED
+
+def _series(values, like):
+    return pd.Series(values, index=like.index)
+
 def calculate_rsi(data, period=14):
+    if USE_KERNEL:
+        return _series(kernel.rsi(kernel.as_array(data), period), data)
     delta = data.diff()
     gain = np.where(delta > 0, delta, 0)
     loss = np.where(delta < 0, -delta, 0)
@@ -12,6 +22,10 @@ def calculate_rsi(data, period=14):
     return pd.Series(rsi, index=data.index)
 
 def calculate_macd(data, short_window=12, long_window=26, signal_window=9):
+    if USE_KERNEL:
+        values = kernel.as_array(data)
+        macd = kernel.ema(values, 2.0 / (short_window + 1)) - kernel.ema(values, 2.0 / (long_window + 1))
+        return _series(macd, data), _series(kernel.ema(macd, 2.0 / (signal_window + 1)), data)
     ema_short = data.ewm(span=short_window, adjust=False).mean()
     ema_long = data.ewm(span=long_window, adjust=False).mean()
     macd = ema_short - ema_long
@@ -19,6 +33,9 @@ def calculate_macd(data, short_window=12, long_window=26, signal_window=9):
     return macd, signal
 
 def calculate_bollinger_bands(data, period=20, num_std=2):
+    if USE_KERNEL:
+        ma, upper_band, lower_band = kernel.bollinger(kernel.as_array(data), period, float(num_std))
+        return _series(ma, data), _series(upper_band, data), _series(lower_band, data)
     ma = data.rolling(window=period).mean()
     std_dev = data.rolling(window=period).std()
     upper_band = ma + (num_std * std_dev)
@@ -26,6 +43,9 @@ def calculate_bollinger_bands(data, period=20, num_std=2):
     return ma, upper_band, lower_band
 
 def calculate_stochastic(data, high, low, period=14):
+    if USE_KERNEL:
+        k, d = kernel.stochastic(kernel.as_array(data), kernel.as_array(high), kernel.as_array(low), period)
+        return _series(k, data), _series(d, data)
     low_min = low.rolling(window=period).min()
     high_max = high.rolling(window=period).max()
     k = ((data - low_min) / (high_max - low_min)) * 100
@@ -34,10 +54,15 @@ def calculate_stochastic(data, high, low, period=14):
 
 def calculate_ema(series, period):
     """คำนวณ Exponential Moving Average (EMA)"""
+    if USE_KERNEL:
+        return _series(kernel.ema(kernel.as_array(series), 2.0 / (period + 1)), series)
     return series.ewm(span=period, adjust=False).mean()
 
 def calculate_adx(df, period=14):
     """คำนวณ Average Directional Index (ADX) วัดความแรงของเทรนด์"""
+    if USE_KERNEL:
+        adx = kernel.adx(kernel.as_array(df['high']), kernel.as_array(df['low']), kernel.as_array(df['close']), period)
+        return _series(adx, df)
     high = df['high']
     low = df['low']
     close = df['close']
@@ -61,4 +86,23 @@ def calculate_adx(df, period=14):
     dx = (abs(plus_di - minus_di) / abs(plus_di + minus_di)) * 100
     adx = dx.ewm(alpha=1/period, adjust=False).mean()
     
-    return adx.fillna(0)
\ No newline at end of file
+    return adx.fillna(0)
+
+def calculate_all(df):
+    """
+    Indicator ทุกตัวที่ analyze_market/backtest ใช้ จาก DataFrame (close, high, low)
+    คืน dict {ชื่อคอลัมน์: NumPy array} -> Kernel คำนวณในลูปเดียว, pandas เรียกทีละฟังก์ชัน
+    """
+    if USE_KERNEL:
+        return kernel.compute_all(df['close'], df['high'], df['low'])
+    close = df['close']
+    macd, signal = calculate_macd(close)
+    bb_mid, bb_upper, bb_lower = calculate_bollinger_bands(close)
+    stoch_k, stoch_d = calculate_stochastic(close, df['high'], df['low'])
+    values = {
+        "RSI": calculate_rsi(close), "MACD": macd, "Signal": signal,
+        "BB_Mid": bb_mid, "BB_Upper": bb_upper, "BB_Lower": bb_lower,
+        "EMA_20": calculate_ema(close, 20), "EMA_50": calculate_ema(close, 50),
+        "ADX": calculate_adx(df, 14), "Stoch_K": stoch_k, "Stoch_D": stoch_d,
+    }
+    return {name: series.to_numpy() for name, series in values.items()}
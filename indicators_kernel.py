@@ -0,0 +1,335 @@
+"""
+Kernel ของ indicators.py บน NumPy array (float64 ต่อเนื่อง) คอมไพล์ด้วย Numba ถ้าติดตั้งไว้
+
+- compute_all() คำนวณ RSI, MACD, Bollinger, Stochastic, EMA 20/50 และ ADX จากข้อมูลชุดเดียว
+  (ewm ทุกตัวอยู่ในลูปเดียวกัน, rolling ใช้ผลรวมเลื่อนหน้าต่าง ไม่สร้าง Series/DataFrame กลางทาง)
+- ผลตรงกับ pandas path (ewm adjust=False รวมการจัดการ NaN, rolling min_periods เดิม)
+- ไม่มี Numba -> ENABLED = False และ indicators.py ใช้ pandas ตามเดิม
+  (ฟังก์ชันในไฟล์นี้ยังเรียกได้แบบ Python ธรรมดา แต่ช้า ใช้ตรวจความถูกต้องเท่านั้น)
+"""
+import math
+
+import numpy as np
+
+import config
+
+try:
+    import numba
+except ImportError:
+    numba = None
+
+HAVE_NUMBA = numba is not None
+ENABLED = HAVE_NUMBA and getattr(config, "INDICATOR_BACKEND", "auto") != "pandas"
+
+NAN = np.nan
+
+
+def _jit(fn):
+    if HAVE_NUMBA:
+        return numba.njit(cache=True, nogil=True)(fn)
+    return fn
+
+
+@_jit
+def _div(a, b):
+    # หารแบบ IEEE เหมือน NumPy/pandas (Numba โหมดปกติจะ raise ZeroDivisionError)
+    if b == 0.0:
+        if a == 0.0 or a != a:
+            return NAN
+        return math.copysign(math.inf, a) * math.copysign(1.0, b)
+    return a / b
+
+
+@_jit
+def _ewm_step(weighted, old_wt, x, alpha):
+    # 1 ก้าวของ series.ewm(alpha=..., adjust=False).mean() (ignore_na=False)
+    if weighted == weighted:
+        old_wt *= (1.0 - alpha)
+        if x == x:
+            if weighted != x:
+                weighted = (old_wt * weighted + alpha * x) / (old_wt + alpha)
+            old_wt = 1.0
+    elif x == x:
+        weighted = x
+    return weighted, old_wt
+
+
+@_jit
+def _nanmax3(a, b, c):
+    # เหมือน DataFrame.max(axis=1) (ข้าม NaN, NaN ทั้งหมด -> NaN)
+    out = NAN
+    if a == a: out = a
+    if b == b and (out != out or b > out): out = b
+    if c == c and (out != out or c > out): out = c
+    return out
+
+
+@_jit
+def _signbit(v):
+    # จริงสำหรับค่าติดลบรวมถึง -0.0
+    return v < 0 or (v == 0 and math.copysign(1.0, v) < 0)
+@_jit
+def rolling_mean(x, period, min_periods):
+    # เหมือน Series.rolling(period, min_periods).mean() (ผลรวมแบบ Kahan เลื่อนหน้าต่าง ตาม pandas)
+    n = x.shape[0]
+    out = np.empty(n)
+    nobs, neg_ct, same = 0, 0, 0
+    sum_x, comp_add, comp_rem = 0.0, 0.0, 0.0
+    prev = x[0] if n else NAN
+    for i in range(n):
+        if i >= period:
+            val = x[i - period]
+            if val == val:
+                nobs -= 1
+                y = -val - comp_rem
+                t = sum_x + y
+                comp_rem = t - sum_x - y
+                sum_x = t
+                if _signbit(val): neg_ct -= 1
+        val = x[i]
+        if val == val:
+            nobs += 1
+            y = val - comp_add
+            t = sum_x + y
+            comp_add = t - sum_x - y
+            sum_x = t
+            if _signbit(val): neg_ct += 1
+            if val == prev: same += 1
+            else: same = 1
+            prev = val
+        if nobs >= min_periods and nobs > 0:
+            r = sum_x / nobs
+            if same >= nobs: r = prev
+            elif neg_ct == 0 and r < 0: r = 0.0
+            elif neg_ct == nobs and r > 0: r = 0.0
+            out[i] = r
+        else:
+            out[i] = NAN
+    return out
+@_jit
+def rolling_std(x, period, min_periods, ddof):
+    # เหมือน Series.rolling(period, min_periods).std(ddof) (Welford เลื่อนหน้าต่าง ตาม pandas)
+    n = x.shape[0]
+    out = np.empty(n)
+    nobs, same = 0, 0
+    mean_x, ssqdm, comp_add, comp_rem = 0.0, 0.0, 0.0, 0.0
+    prev = x[0] if n else NAN
+    for i in range(n):
+        if i >= period:
+            val = x[i - period]
+            if val == val:
+                nobs -= 1
+                if nobs:
+                    prev_mean = mean_x - comp_rem
+                    y = val - comp_rem
+                    t = y - mean_x
+                    comp_rem = t + mean_x - y
+                    mean_x -= t / nobs
+                    ssqdm -= (val - prev_mean) * (val - mean_x)
+                else:
+                    mean_x, ssqdm = 0.0, 0.0
+        val = x[i]
+        if val == val:
+            if val == prev: same += 1
+            else: same = 1
+            prev = val
+            nobs += 1
+            prev_mean = mean_x - comp_add
+            y = val - comp_add
+            t = y - mean_x
+            comp_add = t + mean_x - y
+            mean_x += t / nobs
+            ssqdm += (val - prev_mean) * (val - mean_x)
+        if nobs >= min_periods and nobs > ddof:
+            if nobs == 1: out[i] = 0.0
+            else:
+                v = ssqdm / (nobs - ddof)
+                out[i] = math.sqrt(v) if v > 0 else 0.0
+        else:
+            out[i] = NAN
+    return out
+
+
+@_jit
+def ema(x, alpha):
+    out = np.empty(x.shape[0])
+    weighted, old_wt = NAN, 1.0
+    for i in range(x.shape[0]):
+        weighted, old_wt = _ewm_step(weighted, old_wt, x[i], alpha)
+        out[i] = weighted
+    return out
+
+
+@_jit
+def _gain_loss(close):
+    n = close.shape[0]
+    gain = np.zeros(n)
+    loss = np.zeros(n)
+    for i in range(1, n):
+        delta = close[i] - close[i - 1]
+        if delta > 0: gain[i] = delta
+        elif delta < 0: loss[i] = -delta
+    return gain, loss
+
+
+@_jit
+def _rsi_from(gain, loss, period, out):
+    avg_gain = rolling_mean(gain, period, 1)
+    avg_loss = rolling_mean(loss, period, 1)
+    for i in range(out.shape[0]):
+        rs = _div(avg_gain[i], avg_loss[i])
+        out[i] = 100.0 - _div(100.0, 1.0 + rs)
+
+
+@_jit
+def rsi(close, period):
+    gain, loss = _gain_loss(close)
+    out = np.empty(close.shape[0])
+    _rsi_from(gain, loss, period, out)
+    return out
+
+
+@_jit
+def _bollinger_into(close, period, num_std, mid, upper, lower):
+    mean = rolling_mean(close, period, period)
+    std = rolling_std(close, period, period, 1)
+    for i in range(close.shape[0]):
+        mid[i] = mean[i]
+        upper[i] = mean[i] + num_std * std[i]
+        lower[i] = mean[i] - num_std * std[i]
+
+
+@_jit
+def bollinger(close, period, num_std):
+    n = close.shape[0]
+    mid, upper, lower = np.empty(n), np.empty(n), np.empty(n)
+    _bollinger_into(close, period, num_std, mid, upper, lower)
+    return mid, upper, lower
+
+
+@_jit
+def _stochastic_into(close, high, low, period, k, d):
+    # rolling(period).min()/max() ต้องครบหน้าต่างและไม่มี NaN, %D = rolling(3).mean() ของ %K
+    for i in range(close.shape[0]):
+        k[i] = NAN
+        d[i] = NAN
+        if i < period - 1: continue
+        lo, hi = low[i], high[i]
+        ok = lo == lo and hi == hi
+        for j in range(i - period + 1, i):
+            if low[j] != low[j] or high[j] != high[j]:
+                ok = False
+                break
+            lo = min(lo, low[j])
+            hi = max(hi, high[j])
+        if ok:
+            k[i] = _div(close[i] - lo, hi - lo) * 100.0
+        if i >= period + 1 and k[i] == k[i] and k[i - 1] == k[i - 1] and k[i - 2] == k[i - 2]:
+            d[i] = (k[i] + k[i - 1] + k[i - 2]) / 3.0
+
+
+@_jit
+def stochastic(close, high, low, period):
+    n = close.shape[0]
+    k, d = np.empty(n), np.empty(n)
+    _stochastic_into(close, high, low, period, k, d)
+    return k, d
+
+
+@_jit
+def adx(high, low, close, period):
+    n = close.shape[0]
+    alpha = 1.0 / period
+    out = np.empty(n)
+    atr, pdm, mdm, avg = (NAN, 1.0), (NAN, 1.0), (NAN, 1.0), (NAN, 1.0)
+    for i in range(n):
+        plus, minus = 0.0, 0.0
+        if i > 0:
+            up = high[i] - high[i - 1]
+            down = low[i] - low[i - 1]
+            if up > down and up > 0: plus = up
+            # เทียบกับ plus_dm ที่กรองแล้ว (เหมือน calculate_adx เดิม)
+            if down > plus and down > 0: minus = down
+            tr = _nanmax3(high[i] - low[i], abs(high[i] - close[i - 1]), abs(low[i] - close[i - 1]))
+        else:
+            tr = high[i] - low[i]
+        atr = _ewm_step(atr[0], atr[1], tr, alpha)
+        pdm = _ewm_step(pdm[0], pdm[1], plus, alpha)
+        mdm = _ewm_step(mdm[0], mdm[1], minus, alpha)
+        plus_di = 100.0 * _div(pdm[0], atr[0])
+        minus_di = 100.0 * _div(mdm[0], atr[0])
+        dx = _div(abs(plus_di - minus_di), abs(plus_di + minus_di)) * 100.0
+        avg = _ewm_step(avg[0], avg[1], dx, alpha)
+        out[i] = avg[0] if avg[0] == avg[0] else 0.0
+    return out
+
+
+@_jit
+def _compute_all(close, high, low, rsi_period, bb_period, bb_std, stoch_period, adx_period):
+    n = close.shape[0]
+    out = np.empty((11, n))   # แถวตาม FIELDS
+    gain = np.zeros(n)
+    loss = np.zeros(n)
+    a12, a26, a9 = 2.0 / 13.0, 2.0 / 27.0, 2.0 / 10.0
+    a20, a50, a_adx = 2.0 / 21.0, 2.0 / 51.0, 1.0 / adx_period
+    # state ของ ewm แต่ละตัว = (ค่าเฉลี่ย, old_wt)
+    e12, e26, sig = (NAN, 1.0), (NAN, 1.0), (NAN, 1.0)
+    e20, e50 = (NAN, 1.0), (NAN, 1.0)
+    atr, pdm, mdm, avg = (NAN, 1.0), (NAN, 1.0), (NAN, 1.0), (NAN, 1.0)
+
+    # --- ลูปหลัก: ทุกตัวที่เป็น ewm (MACD, EMA, ADX) + gain/loss ของ RSI ---
+    for i in range(n):
+        c = close[i]
+        plus, minus = 0.0, 0.0
+        if i > 0:
+            delta = c - close[i - 1]
+            if delta > 0: gain[i] = delta
+            elif delta < 0: loss[i] = -delta
+            up = high[i] - high[i - 1]
+            down = low[i] - low[i - 1]
+            if up > down and up > 0: plus = up
+            if down > plus and down > 0: minus = down
+            tr = _nanmax3(high[i] - low[i], abs(high[i] - close[i - 1]), abs(low[i] - close[i - 1]))
+        else:
+            tr = high[i] - low[i]
+
+        e12 = _ewm_step(e12[0], e12[1], c, a12)
+        e26 = _ewm_step(e26[0], e26[1], c, a26)
+        macd = e12[0] - e26[0]
+        sig = _ewm_step(sig[0], sig[1], macd, a9)
+        e20 = _ewm_step(e20[0], e20[1], c, a20)
+        e50 = _ewm_step(e50[0], e50[1], c, a50)
+        out[1, i] = macd
+        out[2, i] = sig[0]
+        out[6, i] = e20[0]
+        out[7, i] = e50[0]
+
+        atr = _ewm_step(atr[0], atr[1], tr, a_adx)
+        pdm = _ewm_step(pdm[0], pdm[1], plus, a_adx)
+        mdm = _ewm_step(mdm[0], mdm[1], minus, a_adx)
+        plus_di = 100.0 * _div(pdm[0], atr[0])
+        minus_di = 100.0 * _div(mdm[0], atr[0])
+        dx = _div(abs(plus_di - minus_di), abs(plus_di + minus_di)) * 100.0
+        avg = _ewm_step(avg[0], avg[1], dx, a_adx)
+        out[8, i] = avg[0] if avg[0] == avg[0] else 0.0
+
+    # --- หน้าต่างเลื่อน (rolling) ---
+    _rsi_from(gain, loss, rsi_period, out[0])
+    _bollinger_into(close, bb_period, bb_std, out[3], out[4], out[5])
+    _stochastic_into(close, high, low, stoch_period, out[9], out[10])
+    return out
+
+
+FIELDS = ("RSI", "MACD", "Signal", "BB_Mid", "BB_Upper", "BB_Lower", "EMA_20", "EMA_50", "ADX",
+          "Stoch_K", "Stoch_D")
+
+
+def as_array(values):
+    return np.ascontiguousarray(np.asarray(values, dtype=np.float64))
+
+
+def compute_all(close, high, low, rsi_period=14, bb_period=20, bb_std=2.0, stoch_period=14, adx_period=14):
+    """Indicator ทุกตัวในครั้งเดียว คืน dict {ชื่อคอลัมน์: array} (ชื่อเดียวกับที่ analyze_market ใช้)"""
+    out = _compute_all(as_array(close), as_array(high), as_array(low),
+                       rsi_period, bb_period, float(bb_std), stoch_period, adx_period)
+    return dict(zip(FIELDS, out))
@@ -0,0 +1,385 @@
+"""
+Indicator แบบ Streaming (O(1) ต่อแท่ง) ให้ผลตรงกับฟังก์ชันใน indicators.py
+
+ทุกคลาสมี 2 เมธอด:
+- append(...)  เมื่อมีแท่งใหม่เข้ามา
+- update(...)  เมื่อแท่งล่าสุด (แท่งที่ยังไม่ปิด) เปลี่ยนค่า -> คำนวณแท่งสุดท้ายใหม่จาก state ก่อนหน้า
+"""
+import math
+from collections import deque
+
+import numpy as np
+
+NAN = float("nan")
+
+
+def _div(a, b):
+    # หารแบบเดียวกับ NumPy/pandas (หาร 0 ได้ inf หรือ nan แทนการ raise)
+    if b == 0:
+        if a == 0 or a != a:
+            return NAN
+        return math.copysign(math.inf, a) * math.copysign(1.0, b)
+    return a / b
+
+
+class _RollingWindow:
+    """ผลรวมแบบเลื่อนหน้าต่าง (sum และ sum of squares) พร้อมแก้ค่าตัวสุดท้ายได้"""
+    RESYNC_EVERY = 1000
+
+    def __init__(self, period):
+        self.period = period
+        self.values = deque()
+        self.total = 0.0
+        self.total_sq = 0.0
+        self.shift = None   # ลบค่าอ้างอิงก่อนยกกำลัง ลดการสูญเสียความแม่นยำ
+        self.nonzero = 0
+        # จำนวนค่าท้ายหน้าต่างที่เท่ากันติดกัน (ทั้งหน้าต่างเท่ากัน -> mean = ค่านั้น, std = 0 แบบ pandas)
+        self.run = 0
+        self._run_before = 0    # run ที่จบที่ค่าก่อนตัวสุดท้าย (ใช้ตอน replace_last)
+        self._since_resync = 0
+
+    def __len__(self):
+        return len(self.values)
+
+    def _add(self, x, sign):
+        d = x - self.shift
+        self.total += sign * d
+        self.total_sq += sign * d * d
+        if x != 0:
+            self.nonzero += sign
+
+    def append(self, x):
+        if self.shift is None:
+            self.shift = x
+        self._run_before = self.run
+        self.run = self.run + 1 if self.values and self.values[-1] == x else 1
+        self.values.append(x)
+        self._add(x, 1)
+        if len(self.values) > self.period:
+            self._add(self.values.popleft(), -1)
+            self.run = min(self.run, self.period)
+            self._run_before = min(self._run_before, self.period - 1)
+        self._since_resync += 1
+        if self._since_resync >= self.RESYNC_EVERY:
+            self._resync()
+
+    def replace_last(self, x):
+        self._add(self.values[-1], -1)
+        self.values[-1] = x
+        self._add(x, 1)
+        self.run = self._run_before + 1 if len(self.values) > 1 and self.values[-2] == x else 1
+
+    def _resync(self):
+        # คำนวณผลรวมใหม่จากหน้าต่างจริงเป็นระยะ กัน error สะสมจากการบวกลบ
+        self.shift = self.values[-1]
+        self.total = sum(v - self.shift for v in self.values)
+        self.total_sq = sum((v - self.shift) ** 2 for v in self.values)
+        self._since_resync = 0
+
+    def mean(self):
+        n = len(self.values)
+        if n == 0:
+            return NAN
+        if self.nonzero == 0:
+            return 0.0
+        if self.run >= n:
+            return self.values[-1]
+        return self.shift + self.total / n
+
+    def std(self):
+        n = len(self.values)
+        if n < 2:
+            return NAN
+        if self.run >= n:
+            return 0.0
+        var = (self.total_sq - self.total * self.total / n) / (n - 1)
+        return math.sqrt(max(var, 0.0))
+
+
+class StreamingEMA:
+    """เทียบเท่า series.ewm(span=period หรือ alpha=..., adjust=False).mean() รวมถึงการจัดการ NaN"""
+    def __init__(self, span=None, alpha=None):
+        self.alpha = alpha if alpha is not None else 2.0 / (span + 1.0)
+        self._prev = (NAN, 1.0)
+        self._state = (NAN, 1.0)
+        self._started = False
+
+    @property
+    def value(self):
+        return self._state[0]
+
+    def _step(self, state, x):
+        weighted, old_wt = state
+        if weighted == weighted:
+            old_wt *= (1.0 - self.alpha)
+            if x == x:
+                # เหมือน pandas/indicators_kernel: ค่าเท่าเดิมไม่คำนวณซ้ำ (กัน error ปัดเศษในช่วงราคานิ่ง)
+                if weighted != x:
+                    weighted = (old_wt * weighted + self.alpha * x) / (old_wt + self.alpha)
+                old_wt = 1.0
+        elif x == x:
+            weighted = x
+        return (weighted, old_wt)
+
+    def append(self, x):
+        self._prev = self._state
+        self._state = self._step(self._prev, x)
+        self._started = True
+        return self._state[0]
+
+    def update(self, x):
+        if not self._started:
+            return self.append(x)
+        self._state = self._step(self._prev, x)
+        return self._state[0]
+
+
+class StreamingRSI:
+    """เทียบเท่า indicators.calculate_rsi (ค่าเฉลี่ย gain/loss แบบ rolling mean, min_periods=1)"""
+    def __init__(self, period=14):
+        self.gains = _RollingWindow(period)
+        self.losses = _RollingWindow(period)
+        self._prev_close = NAN   # ราคาปิดของแท่งก่อนแท่งล่าสุด
+        self._last_close = NAN
+        self.value = NAN
+
+    def _split(self, close, ref):
+        delta = close - ref
+        gain = delta if delta > 0 else 0.0
+        loss = -delta if delta < 0 else 0.0
+        return gain, loss
+
+    def _compute(self):
+        rs = _div(self.gains.mean(), self.losses.mean())
+        self.value = 100 - (100 / (1 + rs)) if rs == rs else NAN
+        return self.value
+
+    def append(self, close):
+        self._prev_close, self._last_close = self._last_close, close
+        gain, loss = self._split(close, self._prev_close)
+        self.gains.append(gain)
+        self.losses.append(loss)
+        return self._compute()
+
+    def update(self, close):
+        if len(self.gains) == 0:
+            return self.append(close)
+        self._last_close = close
+        gain, loss = self._split(close, self._prev_close)
+        self.gains.replace_last(gain)
+        self.losses.replace_last(loss)
+        return self._compute()
+
+
+class StreamingMACD:
+    """เทียบเท่า indicators.calculate_macd -> (macd, signal)"""
+    def __init__(self, short_window=12, long_window=26, signal_window=9):
+        self.ema_short = StreamingEMA(span=short_window)
+        self.ema_long = StreamingEMA(span=long_window)
+        self.signal_ema = StreamingEMA(span=signal_window)
+        self.value = (NAN, NAN)
+
+    def append(self, close):
+        macd = self.ema_short.append(close) - self.ema_long.append(close)
+        self.value = (macd, self.signal_ema.append(macd))
+        return self.value
+
+    def update(self, close):
+        macd = self.ema_short.update(close) - self.ema_long.update(close)
+        self.value = (macd, self.signal_ema.update(macd))
+        return self.value
+
+
+class StreamingBollinger:
+    """เทียบเท่า indicators.calculate_bollinger_bands -> (mid, upper, lower)"""
+    def __init__(self, period=20, num_std=2):
+        self.period = period
+        self.num_std = num_std
+        self.window = _RollingWindow(period)
+        self.value = (NAN, NAN, NAN)
+
+    def _compute(self):
+        if len(self.window) < self.period:
+            self.value = (NAN, NAN, NAN)
+        else:
+            ma, std = self.window.mean(), self.window.std()
+            self.value = (ma, ma + self.num_std * std, ma - self.num_std * std)
+        return self.value
+
+    def append(self, close):
+        self.window.append(close)
+        return self._compute()
+
+    def update(self, close):
+        if len(self.window) == 0:
+            return self.append(close)
+        self.window.replace_last(close)
+        return self._compute()
+
+
+class StreamingStochastic:
+    """เทียบเท่า indicators.calculate_stochastic -> (k, d)"""
+    def __init__(self, period=14, d_period=3):
+        self.period = period
+        self.highs = deque(maxlen=period)
+        self.lows = deque(maxlen=period)
+        self.ks = deque(maxlen=d_period)
+        self.value = (NAN, NAN)
+
+    def _compute(self, close):
+        if len(self.highs) < self.period:
+            k = NAN
+        else:
+            # หน้าต่างคงที่ (period แท่ง) จึงเป็น O(period) = O(1) ต่อแท่ง
+            low_min, high_max = min(self.lows), max(self.highs)
+            k = _div(close - low_min, high_max - low_min) * 100
+        return k
+
+    def _finish(self, k):
+        if len(self.ks) < self.ks.maxlen or any(v != v for v in self.ks):
+            d = NAN
+        else:
+            d = sum(self.ks) / len(self.ks)
+        self.value = (k, d)
+        return self.value
+
+    def append(self, close, high, low):
+        self.highs.append(high)
+        self.lows.append(low)
+        k = self._compute(close)
+        self.ks.append(k)
+        return self._finish(k)
+
+    def update(self, close, high, low):
+        if not self.highs:
+            return self.append(close, high, low)
+        self.highs[-1] = high
+        self.lows[-1] = low
+        k = self._compute(close)
+        self.ks[-1] = k
+        return self._finish(k)
+
+
+class StreamingADX:
+    """เทียบเท่า indicators.calculate_adx (Wilder smoothing, alpha = 1/period)"""
+    def __init__(self, period=14):
+        alpha = 1.0 / period
+        self.atr = StreamingEMA(alpha=alpha)
+        self.plus = StreamingEMA(alpha=alpha)
+        self.minus = StreamingEMA(alpha=alpha)
+        self.adx = StreamingEMA(alpha=alpha)
+        self._prev_bar = None   # (high, low, close) ของแท่งก่อนแท่งล่าสุด
+        self._last_bar = None
+        self.value = 0.0
+
+    def _inputs(self, high, low, close):
+        ref = self._prev_bar
+        if ref is None:
+            return 0.0, 0.0, high - low
+        p_high, p_low, p_close = ref
+        up, down = high - p_high, low - p_low
+        # ลำดับเดียวกับเวอร์ชัน pandas: minus_dm เทียบกับ plus_dm ที่กรองแล้ว
+        plus_dm = up if (up > down and up > 0) else 0.0
+        minus_dm = down if (down > plus_dm and down > 0) else 0.0
+        tr = max(high - low, abs(high - p_close), abs(low - p_close))
+        return plus_dm, minus_dm, tr
+
+    def _compute(self, step, high, low, close):
+        plus_dm, minus_dm, tr = self._inputs(high, low, close)
+        atr = step(self.atr, tr)
+        plus_di = 100 * _div(step(self.plus, plus_dm), atr)
+        minus_di = 100 * _div(step(self.minus, minus_dm), atr)
+        dx = _div(abs(plus_di - minus_di), abs(plus_di + minus_di)) * 100
+        adx = step(self.adx, dx)
+        self.value = adx if adx == adx else 0.0
+        return self.value
+
+    def append(self, high, low, close):
+        self._prev_bar = self._last_bar
+        self._last_bar = (high, low, close)
+        return self._compute(StreamingEMA.append, high, low, close)
+
+    def update(self, high, low, close):
+        if self._last_bar is None:
+            return self.append(high, low, close)
+        self._last_bar = (high, low, close)
+        return self._compute(StreamingEMA.update, high, low, close)
+
+
+class IndicatorSet:
+    """
+    ชุด Indicator ทั้งหมดที่ BotEngine.analyze_market ใช้ ต่อ 1 เหรียญ
+    เก็บค่าย้อนหลัง 3 แท่งไว้สำหรับระบบดักจับ Whipsaw และ MACD Cross
+
+    State สะสมตั้งแต่แท่งแรกที่เคยป้อน (ไม่ใช่แค่ CANDLE_BARS แท่งใน DataFrame รอบนั้น)
+    ค่าที่ได้จึงเท่ากับ calculate_all บนประวัติทั้งหมด EMA/ADX ที่ warm-up นานกว่าจึงต่างจากการคำนวณ
+    ใหม่บนหน้าต่าง 100 แท่งแบบเดิมเล็กน้อย (เริ่มใหม่จากหน้าต่างเฉพาะตอนข้อมูลขาดช่วง)
+    ดู tests/test_indicators_stream.py
+    """
+    HISTORY = 3
+
+    def __init__(self):
+        self.rsi = StreamingRSI(14)
+        self.macd = StreamingMACD()
+        self.bb = StreamingBollinger()
+        self.ema_20 = StreamingEMA(span=20)
+        self.ema_50 = StreamingEMA(span=50)
+        self.adx = StreamingADX(14)
+        self.rows = deque(maxlen=self.HISTORY)
+        self.last_ts = None
+
+    def _row(self, step, close, high, low):
+        macd, signal = step(self.macd, close)
+        bb_mid, bb_upper, bb_lower = step(self.bb, close)
+        return {
+            "close": close,
+            "RSI": step(self.rsi, close),
+            "MACD": macd,
+            "Signal": signal,
+            "BB_Mid": bb_mid,
+            "BB_Upper": bb_upper,
+            "BB_Lower": bb_lower,
+            "EMA_20": step(self.ema_20, close),
+            "EMA_50": step(self.ema_50, close),
+            "ADX": step(self.adx, high, low, close),
+        }
+
+    def append(self, ts, close, high, low):
+        self.rows.append(self._row(lambda ind, *a: ind.append(*a), close, high, low))
+        self.last_ts = ts
+
+    def update(self, close, high, low):
+        self.rows[-1] = self._row(lambda ind, *a: ind.update(*a), close, high, low)
+
+    def sync(self, df):
+        """
+        ป้อนเฉพาะแท่งที่เปลี่ยนจาก DataFrame ของ CandleStore
+        - แท่งที่มี timestamp = last_ts (แท่งที่ยังไม่ปิดรอบก่อน) -> update
+        - แท่งหลังจากนั้น -> append
+        ถ้าหา last_ts ไม่เจอ (ข้อมูลขาดช่วง) จะสร้าง state ใหม่จากทั้ง DataFrame
+        """
+        ts = df["timestamp"].to_numpy()
+        close = df["close"].to_numpy(dtype=np.float64)
+        high = df["high"].to_numpy(dtype=np.float64)
+        low = df["low"].to_numpy(dtype=np.float64)
+
+        start = 0
+        if self.last_ts is not None:
+            pos = int(np.searchsorted(ts, self.last_ts))
+            if pos < len(ts) and ts[pos] == self.last_ts:
+                self.update(float(close[pos]), float(high[pos]), float(low[pos]))
+                start = pos + 1
+            else:
+                self.__init__()
+
+        for i in range(start, len(ts)):
+            self.append(ts[i], float(close[i]), float(high[i]), float(low[i]))
+        return self
+
+    @property
+    def last(self):
+        return self.rows[-1]
+
+    @property
+    def prev(self):
+        return self.rows[-2] if len(self.rows) >= 2 else None
@@ -1,19 +1,26 @@
 import os
+import json
+import secrets
 import asyncio
 import httpx
+import numpy as np
 from fastapi import FastAPI, WebSocket, WebSocketDisconnect, Request, Response, Form, HTTPException, Depends
-from fastapi.responses import HTMLResponse, RedirectResponse, JSONResponse
+from fastapi.responses import HTMLResponse, RedirectResponse, JSONResponse, PlainTextResponse
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.staticfiles import StaticFiles
 from pydantic import BaseModel
 
 import database as db
+import config
+import metrics
 import utils 
-from bitkub import BitkubClient 
 from bot_engine import BotEngine
+from candle_store import base_resolution, resample
+from http_pool import create_http_client
 
 # --- Settings & Config ---
 BOT_PASSWORD = os.getenv("BOT_PASSWORD", "1234")
+METRICS_TOKEN = os.getenv("METRICS_TOKEN")   # Bearer token ให้ Prometheus scrape /metrics (ไม่ตั้ง = ต้อง Login)
 
 # เริ่มต้น DB
 db.init_db() 
@@ -44,19 +51,31 @@ class ConnectionManager:
     async def connect(self, websocket: WebSocket):
         await websocket.accept()
         self.active_connections.append(websocket)
+        metrics.WS_CLIENTS.set(value=len(self.active_connections))
 
     def disconnect(self, websocket: WebSocket):
-        self.active_connections.remove(websocket)
+        if websocket in self.active_connections:
+            self.active_connections.remove(websocket)
+            metrics.WS_CLIENTS.set(value=len(self.active_connections))
 
     async def broadcast(self, message: str):
-        for connection in self.active_connections[:]:
-            try:
-                await connection.send_text(message)
-            except:
-                self.disconnect(connection)
+        if not self.active_connections: return
+        with metrics.timer(metrics.WS_BROADCAST_SECONDS):
+            for connection in self.active_connections[:]:
+                try:
+                    await connection.send_text(message)
+                except:
+                    self.disconnect(connection)
+
+    async def broadcast_json(self, payload: dict):
+        # 🟢 Event แบบ JSON (type: snapshot/price/positions/orders/wallet/status/...) แปลงเป็น String ครั้งเดียว
+        if not self.active_connections: return
+        await self.broadcast(json.dumps(payload, ensure_ascii=False, default=str))
 
 ws_manager = ConnectionManager()
 bot = BotEngine(ws_manager)
+# 🟢 ทุก Route ใช้ BitkubClient ตัวเดียวกับบอท (แชร์ Candle Store และนาฬิกา Server)
+api = bot.api
 
 # --- Pydantic Models ---
 class UpdateSymbolModel(BaseModel):
@@ -64,6 +83,7 @@ class UpdateSymbolModel(BaseModel):
     money_limit: float
     cost_st: float
     strategy: int = 1 
+    timeframe: int | None = None    # None = ใช้ config.TIMEFRAME
 
 class TestTradeModel(BaseModel):
     symbol: str 
@@ -73,12 +93,32 @@ class TestTradeModel(BaseModel):
 # =====================================================================
 # --- 🔒 ระบบ Security / Gatekeeper ---
 # =====================================================================
+async def get_http(request: Request) -> httpx.AsyncClient:
+    # httpx.AsyncClient กลาง (สร้างตอน startup, ปิดตอน shutdown)
+    return request.app.state.http
+
+def is_logged_in(token):
+    return token == "logged_in_success"
+
 async def check_user(request: Request):
     token = request.cookies.get("access_token")
-    if token != "logged_in_success":
+    if not is_logged_in(token):
         raise HTTPException(status_code=401, detail="Please login first")
     return token
 
+async def check_metrics_access(request: Request):
+    # 🟢 Login แล้ว (Cookie) หรือ Scraper ส่ง Authorization: Bearer <METRICS_TOKEN>
+    if is_logged_in(request.cookies.get("access_token")):
+        return
+    scheme, _, token = request.headers.get("authorization", "").partition(" ")
+    if METRICS_TOKEN and scheme.lower() == "bearer" and secrets.compare_digest(token, METRICS_TOKEN):
+        return
+    raise HTTPException(status_code=401, detail="Please login first")
+
+async def publish_symbols():
+    # แจ้งทุกแท็บที่เปิด Dashboard ว่ารายการเหรียญเปลี่ยน
+    await bot.publish("symbols", symbols=await db.get_all_symbols())
+
 # =====================================================================
 # --- 🖥️ Web Pages (HTML Routes) ---
 # =====================================================================
@@ -130,21 +170,27 @@ async def logout():
 # =====================================================================
 # --- 🤖 Bot Control APIs (ต้อง Login ก่อน) ---
 # =====================================================================
+@app.get("/metrics", dependencies=[Depends(check_metrics_access)])
+async def get_metrics():
+    # 🟢 Prometheus scrape (text exposition format)
+    return PlainTextResponse(metrics.render(), media_type="text/plain; version=0.0.4")
+
 @app.get("/bot-status")
 async def get_bot_status():
-    return {"running": bot.running}
+    return {"running": bot.running, "last_cycle": bot.last_cycle}
 
 @app.post("/start-bot", dependencies=[Depends(check_user)])
 async def start_bot():
     if bot.running:
         return {"message": "Bot is already running"}
-    asyncio.create_task(bot.run_loop())
+    await bot.stop(config.SHUTDOWN_GRACE)    # Loop เดิมที่กำลังหยุดต้องจบก่อน (ไม่ให้ finally ไปหยุด Feed/TTP ของ Loop ใหม่)
+    bot.start()
     return {"message": "Bot start command received"}
 
 @app.post("/stop-bot", dependencies=[Depends(check_user)])
 async def stop_bot():
-    bot.running = False
-    return {"message": "Bot stopping..."}
+    await bot.stop(config.SHUTDOWN_GRACE)
+    return {"message": "Bot stopped"}
 
 # =====================================================================
 # --- 📊 Database & Trading APIs (ต้อง Login ก่อน) ---
@@ -163,10 +209,12 @@ async def add_symbol(request: Request):
     money_limit = float(data.get("money_limit", 1000))
     cost_st = float(data.get("cost_st", 100))
     strategy = int(data.get("strategy", 1))
+    timeframe = int(data["timeframe"]) if data.get("timeframe") else None
 
-    success = await db.add_symbol(symbol, money_limit, cost_st, strategy)
+    success = await db.add_symbol(symbol, money_limit, cost_st, strategy, timeframe)
     
     if success:
+        await publish_symbols()
         return {"status": "success", "message": f"Added {symbol}"}
     else:
         return {"status": "error", "message": "Add failed (Duplicate or Error)"}
@@ -175,6 +223,7 @@ async def add_symbol(request: Request):
 async def delete_symbol(symbol_id: int): 
     try:
         await db.delete_symbol_data(symbol_id) 
+        await publish_symbols()
         return {"message": f"Deleted ID {symbol_id}"}
     except Exception as e:
         return {"error": str(e)}
@@ -186,44 +235,58 @@ async def update_symbol(symbol_id: int, item: UpdateSymbolModel):
             "status": item.status,
             "money_limit": item.money_limit,
             "cost_st": item.cost_st,
-            "strategy": item.strategy 
+            "strategy": item.strategy,
+            "timeframe": item.timeframe
         }
         await db.update_symbol_data(symbol_id, data)
+        await publish_symbols()
         return {"message": f"Updated ID {symbol_id}"}
     except Exception as e:
         return {"error": str(e)}
     
 @app.get("/history", dependencies=[Depends(check_user)])
-async def history():
-    return await db.get_orders()
+async def history(symbol: str = None, before: float = None, before_id: int = None, limit: int = 50):
+    # 🟢 แบ่งหน้าด้วย ts/id ของแถวสุดท้าย: /history?symbol=BTC&before=<ts>&before_id=<id>&limit=50
+    if symbol:
+        symbol = utils.normalize_symbol(symbol, to_api=False)
+    return await db.get_orders(limit=limit, symbol=symbol, before=before, before_id=before_id)
 
 @app.get("/open-orders", dependencies=[Depends(check_user)])
-async def read_open_orders(sym: str = "THB_BTC"):
-    async with httpx.AsyncClient() as client:
-        bk = BitkubClient()
-        response = await bk.get_open_orders(client, sym)
-        return response
+async def read_open_orders(sym: str = "THB_BTC", client: httpx.AsyncClient = Depends(get_http)):
+    return await api.get_open_orders(client, sym)
 
 # 🟢 [ปรับปรุงใหม่] API ดึงราคาเหรียญทั้งหมดเพื่อแสดงหน้า PnL
-# เปลี่ยนจาก Ticker V1 มาดึงจาก get_candles เพื่อให้ราคา "ตรงกับที่บอทเห็นเป๊ะๆ 100%"
+# อ่านจากราคาที่บอทเพิ่งคำนวณ (ตรงกับที่บอทเห็นเป๊ะๆ 100%) ไม่ต้องยิง API ต่อเหรียญ
 @app.get("/api/ticker", dependencies=[Depends(check_user)])
-async def get_ticker():
-    api = BitkubClient()
+async def get_ticker(max_age: float = None, client: httpx.AsyncClient = Depends(get_http)):
     active_symbols = await db.get_active_symbols()
     result = {}
+    missing = []
     
-    async with httpx.AsyncClient() as client:
-        for row in active_symbols:
-            sym = row['symbol']
-            try:
-                # ดึงราคาปิดแท่งล่าสุด (วิธีเดียวกับที่บอทใช้เป๊ะ)
-                df = await api.get_candles(client, sym)
-                if df is not None and not df.empty:
-                    last_price = df.iloc[-1]["close"]
-                    # จัด Format คืนค่าให้ตรงกับที่หน้า dashboard.html คาดหวัง
-                    result[sym] = {"last": float(last_price)}
-            except Exception as e:
-                print(f"Ticker Fetch Error for {sym}: {e}")
+    for row in active_symbols:
+        sym = row['symbol']
+        price = bot.get_price(sym, max_age)
+        if price is None or (price["stale"] and not bot.running):
+            missing.append(sym)
+        else:
+            # จัด Format คืนค่าให้ตรงกับที่หน้า dashboard.html คาดหวัง (+ อายุข้อมูล)
+            result[sym] = price
+
+    # บอทหยุดอยู่ -> ไม่มีใครอัปเดตราคา ดึงกราฟของทุกเหรียญที่ขาดพร้อมกันในครั้งเดียว
+    if missing and not bot.running:
+        semaphore = asyncio.Semaphore(config.MAX_CONCURRENT_SYMBOLS)
+
+        async def fetch(sym):
+            async with semaphore:
+                return await api.get_candles(client, sym)
+
+        frames = await asyncio.gather(*(fetch(sym) for sym in missing), return_exceptions=True)
+        for sym, df in zip(missing, frames):
+            if isinstance(df, Exception):
+                print(f"Ticker Fetch Error for {sym}: {df}")
+            elif df is not None and not df.empty:
+                bot.set_price(sym, df.iloc[-1]["close"])
+                result[sym] = bot.get_price(sym, max_age)
                 
     return result
 
@@ -233,63 +296,104 @@ async def get_market_regime():
     # ดึงค่าที่ BotEngine คำนวณทิ้งไว้มาโชว์เลย ไม่ต้องคำนวณใหม่ให้เปลืองเครื่อง
     return bot.market_regimes
     
+# 🟢 [เพิ่มใหม่] กราฟย้อนหลังจากคลังบนดิสก์ (+ แท่งที่ยังไม่ปิดจากหน่วยความจำของบอท) สำหรับวาดกราฟ
+@app.get("/api/candles/{symbol}", dependencies=[Depends(check_user)])
+async def get_candle_history(symbol: str, resolution: int = None, limit: int = 500, before: int = None):
+    resolution = resolution or config.TIMEFRAME
+    limit = max(1, min(limit, 5000))
+    # 🟢 คลัง/Store เก็บเฉพาะ stream ฐาน (BASE_TIMEFRAME) -> อ่านแท่งฐานแล้วรวมเป็น Timeframe ที่ขอ
+    base = base_resolution(resolution)
+    ratio = resolution // base
+    bars = api.archive.read(symbol, base, end=before)[-(limit + 1) * ratio:]
+    columns = {col: np.asarray(bars[col]) for col in ("t", "o", "h", "l", "c", "v")}
+
+    if before is None:
+        key = (utils.normalize_symbol(symbol, to_api=True), base)
+        live = api.candles.columns(key)
+        if live is not None and len(live["t"]):
+            newer = live["t"] > (columns["t"][-1] if len(columns["t"]) else 0)
+            columns = {col: np.concatenate((values, live[col][newer])) for col, values in columns.items()}
+
+    if resolution != base:
+        columns = resample(columns, resolution)
+    result = {col: values[-limit:].tolist() for col, values in columns.items()}
+    return {"symbol": symbol, "resolution": resolution, **result}
+
 # --- Test Endpoints (สำหรับ Dev/Test) ---
 @app.post("/test/buy", dependencies=[Depends(check_user)])
-async def test_buy(order: TestTradeModel):
-    api = BitkubClient()
-    async with httpx.AsyncClient() as client:
-        res = await api.place_order(client, order.symbol, order.amount, order.rate, 'BUY', type='limit')
-        return res
+async def test_buy(order: TestTradeModel, client: httpx.AsyncClient = Depends(get_http)):
+    return await api.place_order(client, order.symbol, order.amount, order.rate, 'BUY', type='limit')
 
 @app.post("/test/sell", dependencies=[Depends(check_user)])
-async def test_sell(order: TestTradeModel):
-    api = BitkubClient()
-    async with httpx.AsyncClient() as client:
-        res = await api.place_order(client, order.symbol, order.amount, order.rate, 'SELL', type='limit')
-        return res
+async def test_sell(order: TestTradeModel, client: httpx.AsyncClient = Depends(get_http)):
+    return await api.place_order(client, order.symbol, order.amount, order.rate, 'SELL', type='limit')
     
 @app.get("/test/price/{symbol}", dependencies=[Depends(check_user)])
-async def check_current_price(symbol: str):
-    api = BitkubClient()
-    async with httpx.AsyncClient() as client:
-        df = await api.get_candles(client, symbol)
-        if df is not None:
-            last_price = df.iloc[-1]["close"]
-            return {"symbol": symbol, "last_price": last_price}
-        return {"error": "Could not fetch price"}
+async def check_current_price(symbol: str, client: httpx.AsyncClient = Depends(get_http)):
+    df = await api.get_candles(client, symbol)
+    if df is not None:
+        last_price = df.iloc[-1]["close"]
+        return {"symbol": symbol, "last_price": last_price}
+    return {"error": "Could not fetch price"}
 
 # 🟢 [เพิ่มใหม่] API สำหรับดึงยอดเงินบาท (THB) จากกระเป๋า Bitkub
+# อ่านจาก Wallet cache กลาง (ดึงใหม่เฉพาะเมื่อเก่ากว่า max_age วินาที ค่าเริ่มต้น config.WALLET_MAX_AGE)
 @app.get("/api/wallet", dependencies=[Depends(check_user)])
-async def get_wallet_balance():
-    api = BitkubClient()
-    async with httpx.AsyncClient() as client:
-        try:
-            res = await api.get_wallet(client)
-            if res.get('error') == 0:
-                # ดึงเฉพาะยอด THB ออกมา
-                thb_balance = res.get('result', {}).get('THB', 0.0)
-                return {"status": "success", "THB": thb_balance}
-            return {"status": "error", "THB": 0.0}
-        except Exception as e:
-            print(f"Wallet Fetch Error: {e}")
-            return {"status": "error", "THB": 0.0}
+async def get_wallet_balance(max_age: float = None, client: httpx.AsyncClient = Depends(get_http)):
+    try:
+        res = await api.wallet.get(client, max_age)
+        if res.get('error') == 0:
+            # ดึงเฉพาะยอด THB ออกมา
+            thb_balance = res.get('result', {}).get('THB', 0.0)
+            age = api.wallet.age()
+            return {"status": "success", "THB": thb_balance, "age": None if age is None else round(age, 3)}
+        return {"status": "error", "THB": 0.0}
+    except Exception as e:
+        print(f"Wallet Fetch Error: {e}")
+        return {"status": "error", "THB": 0.0}
 
 # =====================================================================
 # --- 📡 WebSocket & Startup ---
 # =====================================================================
 @app.websocket("/ws")
 async def websocket_endpoint(websocket: WebSocket):
+    # 🟢 Snapshot/Event มี cost, coin, ออเดอร์ และยอดเงิน -> ต้อง Login เหมือน Route อื่น
+    if not is_logged_in(websocket.cookies.get("access_token")):
+        await websocket.close(code=1008)
+        return
     await ws_manager.connect(websocket)
     try:
+        # 🟢 ส่งสถานะทั้งหมดครั้งแรก หลังจากนั้นหน้าเว็บรับเฉพาะ Event ที่เปลี่ยน
+        await websocket.send_text(json.dumps(await bot.snapshot(), ensure_ascii=False, default=str))
         while True:
             await websocket.receive_text()
     except WebSocketDisconnect:
+        pass
+    finally:
         ws_manager.disconnect(websocket)
 
 @app.on_event("startup")
 async def startup_event():
+    # 🟢 สร้าง HTTP Client กลางครั้งเดียว แล้วแชร์ให้ทั้ง Bot และทุก Route
+    await db.open_pool()
+    db.journal.start()
+    app.state.http = create_http_client()
+    bot.http = app.state.http
+    api.clock.start(app.state.http)
+    api.wallet.start(app.state.http)
     print("🎬 Application Startup: Launching Bot Loop...")
-    asyncio.create_task(bot.run_loop())
+    bot.start()
+
+@app.on_event("shutdown")
+async def shutdown_event():
+    print("🛑 Application Shutdown: Stopping bot loop...")
+    # 🟢 รอ run_loop จบก่อน (TTP/Feed หยุด, journal flush และ Checkpoint ครั้งเดียว) แล้วค่อยปิด HTTP และ DB
+    await bot.stop()
+    api.clock.stop()
+    await api.wallet.stop()
+    print("🛑 Application Shutdown: Closing HTTP pool...")
+    await app.state.http.aclose()
+    await db.close_pool()
 
 if __name__ == "__main__":
     import uvicorn
@@ -0,0 +1,178 @@
+"""
+ราคาแบบ Streaming จาก Bitkub WebSocket (market.trade.<sym> + market.ticker.<sym>)
+
+- เปิด Connection ละไม่เกิน WS_FEED_SYMBOLS_PER_CONN เหรียญ (หลาย stream ต่อ URL เดียว)
+- หลุดแล้วต่อใหม่เองด้วย Backoff แบบเดียวกับ BitkubClient._request
+- Trade ทุกรายการอัปเดตแท่งที่ยังไม่ปิดใน CandleStore (Polling รอบถัดไปจะทับด้วยแท่งจาก Server)
+- ราคาเปลี่ยนเมื่อไหร่เรียก on_price(symbol, price, ts) ทันที (BotEngine ใช้เช็ค TTP)
+  ถ้า on_price ของเหรียญนั้นยังทำงานไม่เสร็จ จะเก็บไว้แค่ราคาล่าสุดแล้วเรียกต่อทีเดียว
+
+ต้องติดตั้ง `websockets` ถ้าไม่มีบอทจะใช้ Polling อย่างเดียวเหมือนเดิม
+ทดสอบกับ Server จำลองได้ที่ benchmarks/fake_bitkub_ws.py
+"""
+import asyncio
+import json
+import logging
+import os
+import time
+
+import config
+import metrics
+import utils
+from rate_limiter import backoff_delay
+
+try:
+    import websockets
+except ImportError:
+    websockets = None
+
+HAVE_WEBSOCKETS = websockets is not None
+
+
+def stream_names(symbols):
+    """ชื่อ stream ของ Bitkub ต่อเหรียญ (เช่น market.trade.thb_btc, market.ticker.thb_btc)"""
+    names = []
+    for symbol in symbols:
+        sym = utils.normalize_symbol(symbol).lower()
+        names += [f"market.trade.{sym}", f"market.ticker.{sym}"]
+    return names
+
+
+def parse_messages(raw):
+    """1 frame อาจมีหลาย JSON คั่นด้วยขึ้นบรรทัดใหม่ คืน list ของ dict"""
+    if isinstance(raw, bytes):
+        raw = raw.decode("utf-8", "replace")
+    messages = []
+    for line in raw.splitlines():
+        line = line.strip()
+        if not line:
+            continue
+        try:
+            msg = json.loads(line)
+        except ValueError:
+            continue
+        if isinstance(msg, dict):
+            messages.append(msg)
+    return messages
+
+
+def parse_tick(msg):
+    """ข้อความ trade/ticker -> (kind, symbol แบบ THB_BTC, ราคา, จำนวน, ts วินาที) หรือ None"""
+    stream = msg.get("stream") or ""
+    if stream.startswith("market.trade."):
+        kind, price, amount, ts = "trade", msg.get("rat"), msg.get("amt"), msg.get("ts")
+    elif stream.startswith("market.ticker."):
+        kind, price, amount, ts = "ticker", msg.get("last"), 0, None
+    else:
+        return None
+    try:
+        price, amount = float(price), float(amount or 0)
+        ts = float(ts) if ts else time.time()
+    except (TypeError, ValueError):
+        return None
+    if price <= 0:
+        return None
+    if ts > 1e12:   # บาง stream ส่งเป็น ms
+        ts /= 1000
+    return kind, utils.normalize_symbol(stream.rsplit(".", 1)[1]), price, amount, ts
+
+
+class MarketFeed:
+    def __init__(self, on_price, candles=None, url=None, symbols_per_conn=None):
+        self.on_price = on_price
+        self.candles = candles
+        self.url = (url or os.getenv("WS_URL", config.WS_FEED_URL)).rstrip("/") + "/"
+        self.per_conn = symbols_per_conn or config.WS_FEED_SYMBOLS_PER_CONN
+        self._groups = {}       # tuple ของเหรียญ -> Task ของ Connection นั้น
+        self._last_price = {}
+        self._latest = {}       # ราคาที่รอส่งให้ on_price
+        self._busy = set()
+        self._tasks = set()
+        self.connected = 0
+
+    @property
+    def running(self):
+        return bool(self._groups)
+
+    def symbols(self):
+        return {sym for group in self._groups for sym in group}
+
+    def sync(self, symbols):
+        """
+        ปรับ Subscription ให้ตรงกับเหรียญที่เปิดอยู่ (เรียกทุกรอบ run_cycle)
+        เปิดใหม่เฉพาะกลุ่มที่เปลี่ยน Connection ที่เหรียญไม่เปลี่ยนยังต่ออยู่เหมือนเดิม
+        """
+        wanted = {utils.normalize_symbol(s) for s in symbols}
+        pending = set(wanted - self.symbols())
+        for group in list(self._groups):
+            if not set(group) <= wanted:
+                self._groups.pop(group).cancel()
+                pending |= set(group) & wanted
+        pending = sorted(pending)
+        for i in range(0, len(pending), self.per_conn):
+            group = tuple(pending[i:i + self.per_conn])
+            self._groups[group] = asyncio.create_task(self._run(group))
+
+    async def stop(self):
+        tasks = list(self._groups.values())
+        self._groups.clear()
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+
+    async def _run(self, group):
+        url = self.url + ",".join(stream_names(group))
+        attempt = 0
+        while True:
+            try:
+                async with websockets.connect(url, ping_interval=config.WS_FEED_PING_INTERVAL, open_timeout=10) as ws:
+                    attempt = 0
+                    self._set_connected(1)
+                    logging.info(f"📡 Market feed connected ({len(group)} symbols)")
+                    try:
+                        async for raw in ws:
+                            for msg in parse_messages(raw):
+                                self._handle(msg)
+                    finally:
+                        self._set_connected(-1)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                print(f"⚠️ Market Feed Error: {e}")
+            # หลุด (Server ปิด / Network / Timeout) -> รอแล้วต่อใหม่
+            metrics.FEED_RECONNECTS.inc()
+            await asyncio.sleep(max(1.0, backoff_delay(attempt)))
+            attempt += 1
+
+    def _set_connected(self, delta):
+        self.connected += delta
+        metrics.FEED_CONNECTIONS.set(value=self.connected)
+
+    def _handle(self, msg):
+        tick = parse_tick(msg)
+        if tick is None:
+            return
+        kind, sym, price, amount, ts = tick
+        metrics.FEED_MESSAGES.inc(kind)
+        if kind == "trade" and self.candles is not None:
+            self.candles.apply_trade(utils.normalize_symbol(sym, to_api=True), price, amount, ts)
+        if self._last_price.get(sym) == price:
+            return
+        self._last_price[sym] = price
+        self._latest[sym] = (price, ts)
+        if sym not in self._busy:
+            self._busy.add(sym)
+            task = asyncio.create_task(self._drain(sym))
+            self._tasks.add(task)
+            task.add_done_callback(self._tasks.discard)
+
+    async def _drain(self, sym):
+        try:
+            while sym in self._latest:
+                price, ts = self._latest.pop(sym)
+                try:
+                    await self.on_price(sym, price, ts)
+                except Exception as e:
+                    print(f"⚠️ {sym} Price Handler Error: {e}")
+        finally:
+            self._busy.discard(sym)
@@ -0,0 +1,212 @@
+"""
+Metrics แบบ Prometheus (text exposition format) สำหรับ /metrics
+
+- Counter / Gauge / Histogram เก็บเป็น dict ในหน่วยความจำ (ไม่มี Lock เพราะทุกอย่างรันใน event loop เดียว)
+- observe/inc ใช้แค่ dict lookup + bisect จึงเรียกใน hot path ได้
+- ชื่อ label เป็น tuple ตามลำดับที่ประกาศไว้ตอนสร้าง metric
+
+ตัวอย่าง:
+    with metrics.timer(metrics.STAGE_SECONDS, "analyze_market"):
+        ...
+    metrics.BITKUB_ERRORS.inc("/api/v3/market/place-bid", "18")
+"""
+import bisect
+import functools
+import time
+from contextlib import contextmanager
+
+# วินาที: ครอบตั้งแต่ DB query (~0.1ms) จนถึง Request ที่ timeout (10s+)
+DEFAULT_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+_registry = []
+
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _labels(names, values, extra=None):
+    pairs = [f'{n}="{_escape(v)}"' for n, v in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+def _number(value):
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class _Metric:
+    kind = "untyped"
+
+    def __init__(self, name, doc, labels=()):
+        self.name = name
+        self.doc = doc
+        self.label_names = tuple(labels)
+        self._values = {}
+        _registry.append(self)
+
+    def _header(self):
+        return [f"# HELP {self.name} {self.doc}", f"# TYPE {self.name} {self.kind}"]
+
+    def render(self):
+        lines = self._header()
+        for key, value in sorted(self._values.items()):
+            lines.append(f"{self.name}{_labels(self.label_names, key)} {_number(value)}")
+        return lines
+
+
+class Counter(_Metric):
+    kind = "counter"
+
+    def inc(self, *labels, amount=1):
+        self._values[labels] = self._values.get(labels, 0) + amount
+
+    def value(self, *labels):
+        return self._values.get(labels, 0)
+
+
+class Gauge(_Metric):
+    kind = "gauge"
+
+    def set(self, *labels, value):
+        self._values[labels] = value
+
+    def inc(self, *labels, amount=1):
+        self._values[labels] = self._values.get(labels, 0) + amount
+
+    def value(self, *labels):
+        return self._values.get(labels, 0)
+
+
+class Histogram(_Metric):
+    kind = "histogram"
+
+    def __init__(self, name, doc, labels=(), buckets=DEFAULT_BUCKETS):
+        super().__init__(name, doc, labels)
+        self.buckets = tuple(sorted(buckets))
+
+    def observe(self, *labels, value):
+        entry = self._values.get(labels)
+        if entry is None:
+            # [จำนวนต่อ bucket (ไม่สะสม) ..., +Inf], ผลรวม, จำนวนครั้ง
+            entry = self._values[labels] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+        entry[0][bisect.bisect_left(self.buckets, value)] += 1
+        entry[1] += value
+        entry[2] += 1
+
+    def count(self, *labels):
+        entry = self._values.get(labels)
+        return entry[2] if entry else 0
+
+    def render(self):
+        lines = self._header()
+        for key, (counts, total, n) in sorted(self._values.items()):
+            cumulative = 0
+            for bound, count in zip(self.buckets + (float("inf"),), counts):
+                cumulative += count
+                le = 'le="%s"' % _number(float(bound))
+                lines.append(f"{self.name}_bucket{_labels(self.label_names, key, le)} {cumulative}")
+            lines.append(f"{self.name}_sum{_labels(self.label_names, key)} {_number(total)}")
+            lines.append(f"{self.name}_count{_labels(self.label_names, key)} {n}")
+        return lines
+
+
+@contextmanager
+def timer(histogram, *labels):
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        histogram.observe(*labels, value=time.perf_counter() - started)
+
+
+def timed(histogram, *labels):
+    """Decorator จับเวลา async function ลง histogram"""
+    def decorator(fn):
+        @functools.wraps(fn)
+        async def wrapper(*args, **kwargs):
+            started = time.perf_counter()
+            try:
+                return await fn(*args, **kwargs)
+            finally:
+                histogram.observe(*labels, value=time.perf_counter() - started)
+        return wrapper
+    return decorator
+
+
+def _error_code(result):
+    """รหัส Error จากผลของ BitkubClient (None = สำเร็จ)"""
+    if isinstance(result, dict):
+        if "error" in result:
+            return None if result["error"] == 0 else str(result["error"])
+        if "s" in result:   # /tradingview/history
+            return None if result["s"] in ("ok", "no_data") else str(result["s"])
+    if isinstance(result, list):    # /api/status
+        return None if all(item.get("status") == "ok" for item in result) else "status"
+    return None
+
+
+def observe_api(endpoint):
+    """
+    Decorator สำหรับ method ของ BitkubClient: latency, จำนวนครั้ง และ Error code ต่อ endpoint
+    endpoint เป็น str หรือ function ที่รับ argument ชุดเดียวกับ method แล้วคืนชื่อ endpoint
+    """
+    def decorator(fn):
+        @functools.wraps(fn)
+        async def wrapper(*args, **kwargs):
+            started = time.perf_counter()
+            label = endpoint(*args, **kwargs) if callable(endpoint) else endpoint
+            BITKUB_REQUESTS.inc(label)
+            try:
+                result = await fn(*args, **kwargs)
+            except Exception:
+                BITKUB_ERRORS.inc(label, "exception")
+                raise
+            finally:
+                BITKUB_SECONDS.observe(label, value=time.perf_counter() - started)
+            code = _error_code(result)
+            if code is not None:
+                BITKUB_ERRORS.inc(label, code)
+            return result
+        return wrapper
+    return decorator
+
+
+def render():
+    """ข้อความทั้งหมดสำหรับ GET /metrics"""
+    lines = []
+    for metric in _registry:
+        lines.extend(metric.render())
+    return "\n".join(lines) + "\n"
+
+
+# =====================================================================
+# --- Metric ของบอท ---
+# =====================================================================
+BITKUB_SECONDS = Histogram("bitkub_request_seconds", "Latency of Bitkub API calls", ("endpoint",))
+BITKUB_REQUESTS = Counter("bitkub_requests_total", "Bitkub API calls", ("endpoint",))
+BITKUB_ERRORS = Counter("bitkub_errors_total", "Bitkub API calls that failed, by Bitkub error code", ("endpoint", "code"))
+BITKUB_RETRIES = Counter("bitkub_retries_total", "Bitkub requests retried, by reason", ("endpoint", "reason"))
+CIRCUIT_OPEN = Gauge("bitkub_circuit_open", "1 while the Bitkub circuit breaker is open")
+
+STAGE_SECONDS = Histogram("bot_stage_seconds", "Duration of bot hot-path stages", ("stage",))
+CYCLE_SECONDS = Histogram("bot_cycle_seconds", "Duration of one run_loop cycle", buckets=(0.1, 0.25, 0.5, 1, 2, 5, 10, 20, 30, 60, 120))
+CYCLE_SYMBOLS = Gauge("bot_cycle_symbols", "Active symbols processed in the last cycle")
+CYCLES = Counter("bot_cycles_total", "Completed run_loop cycles")
+TRADES = Counter("bot_trades_total", "Orders sent by execute_trade", ("side", "result"))
+
+DB_SECONDS = Histogram("db_query_seconds", "Time holding a DB connection", ("kind",))
+DB_FLUSH_ROWS = Counter("db_journal_rows_total", "Rows written by the order journal", ("table",))
+
+FEED_MESSAGES = Counter("feed_messages_total", "Messages from the Bitkub market-data WebSocket", ("kind",))
+FEED_RECONNECTS = Counter("feed_reconnects_total", "Market-data WebSocket reconnects")
+FEED_CONNECTIONS = Gauge("feed_connections", "Open market-data WebSocket connections")
+
+ORDERS_RECONCILED = Counter("orders_reconciled_total", "Open orders resolved by the reconciliation pass", ("result",))
+WALLET_READS = Counter("wallet_cache_reads_total", "Wallet reads served from cache (hit) or fetched (miss)", ("result",))
+
+WS_CLIENTS = Gauge("ws_clients", "Connected dashboard WebSocket clients")
+WS_BROADCAST_SECONDS = Histogram("ws_broadcast_seconds", "Time to send one message to every WebSocket client")
@@ -0,0 +1,281 @@
+"""
+Sweep ค่าพารามิเตอร์ใน config.py ด้วย backtest.py แบบขนานทุก Core
+
+- Grid search:   python optimize.py data/ --grid RSI_OVERSOLD=25,30,35 TTP_DROP_PCT=0.3:1.0:0.1
+- Random search: python optimize.py data/ --random 500 --seed 1
+  (ถ้าไม่ระบุ --grid จะสุ่มจาก SPACE ด้านล่าง)
+
+กราฟของแต่ละเหรียญถูกเขียนเป็นไฟล์ .npy ครั้งเดียว แล้วทุก Worker เปิดแบบ memmap
+(ส่งแค่ path ข้ามโปรเซส ไม่ pickle DataFrame) ผลลัพธ์ต่อท้ายลงไฟล์ JSONL
+รันซ้ำด้วยไฟล์เดิมจะข้ามชุดที่ทดสอบแล้ว (Resume ได้)
+"""
+import argparse
+import hashlib
+import itertools
+import json
+import os
+import random
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+import numpy as np
+
+import backtest
+import config
+
+# ชื่อค่าใน config.py -> ชื่อพารามิเตอร์ของ backtest.py
+# TAKE_PROFIT_PCT = จุดขายขั้นต่ำของ Strategy (ก่อนบวก FEE_BUFFER)
+KNOBS = {
+    "RSI_OVERSOLD": "rsi_oversold",
+    "TAKE_PROFIT_PCT": "min_profit_pct",
+    "DCA_DROP_PCT": "dca_drop_pct",
+    "TTP_ACTIVATION_PCT": "ttp_activation_pct",
+    "TTP_DROP_PCT": "ttp_drop_pct",
+    "TIMEFRAME": None,
+}
+
+# ช่วงค่าเริ่มต้นสำหรับ Random search
+SPACE = {
+    "RSI_OVERSOLD": [20, 25, 30, 35],
+    "TAKE_PROFIT_PCT": [0.5, 1.0, 1.5, 2.0, 3.0],
+    "DCA_DROP_PCT": [1.0, 2.0, 3.0, 5.0],
+    "TTP_ACTIVATION_PCT": [0.5, 1.0, 1.5, 2.0, 3.0],
+    "TTP_DROP_PCT": [0.3, 0.5, 0.8, 1.0, 1.5],
+    "TIMEFRAME": [5, 15, 60],
+}
+
+COLUMNS = ("t", "o", "h", "l", "c", "v")
+RANK_BY = ("pnl_pct", "max_drawdown_pct", "win_rate", "score")
+
+
+def parse_values(text):
+    """'25,30,35' หรือ 'start:stop:step' (รวม stop) -> list ของตัวเลข"""
+    if ":" in text:
+        start, stop, step = (float(x) for x in text.split(":"))
+        count = int(round((stop - start) / step)) + 1
+        return [round(start + i * step, 10) for i in range(count)]
+    return [float(x) if "." in x else int(x) for x in text.split(",")]
+
+
+def param_key(symbol, strategy, combo):
+    raw = json.dumps([symbol, strategy, sorted(combo.items())], sort_keys=True)
+    return hashlib.sha1(raw.encode()).hexdigest()[:16]
+
+
+def grid_combos(space):
+    names = sorted(space)
+    return [dict(zip(names, values)) for values in itertools.product(*(space[n] for n in names))]
+
+
+def random_combos(space, count, seed=None):
+    rng = random.Random(seed)
+    names = sorted(space)
+    seen, combos = set(), []
+    total = 1
+    for n in names: total *= len(space[n])
+    while len(combos) < min(count, total):
+        combo = {n: rng.choice(space[n]) for n in names}
+        key = tuple(combo[n] for n in names)
+        if key in seen: continue
+        seen.add(key)
+        combos.append(combo)
+    return combos
+
+
+# =====================================================================
+# --- 🗂️ แชร์กราฟข้ามโปรเซสด้วย memmap ---
+# =====================================================================
+def export_shared(files, cache_dir):
+    """เขียนกราฟแต่ละเหรียญเป็น .npy (6 x n, float64) คืน {symbol: path ที่ Worker เปิดแบบ memmap}"""
+    os.makedirs(cache_dir, exist_ok=True)
+    shared = {}
+    for symbol, path in files.items():
+        if path.endswith(".bin"):
+            # ไฟล์ของ candle_archive เปิดแบบ memmap ได้อยู่แล้ว ไม่ต้องแปลง
+            shared[symbol] = path
+            continue
+        target = os.path.join(cache_dir, f"{symbol}.npy")
+        if not os.path.exists(target) or os.path.getmtime(target) < os.path.getmtime(path):
+            candles = backtest.load_candles(path)
+            n = len(candles["t"])
+            arr = np.stack([np.asarray(candles.get(col, np.zeros(n)), dtype=np.float64) for col in COLUMNS])
+            np.save(target, arr)
+        shared[symbol] = target
+    return shared
+
+
+def _open_shared(path):
+    if path.endswith(".bin"):
+        return backtest.load_candles(path)
+    arr = np.load(path, mmap_mode="r")
+    candles = {col: arr[k] for k, col in enumerate(COLUMNS)}
+    candles["t"] = candles["t"].astype(np.int64)
+    return candles
+
+
+# Cache ต่อ Worker: กราฟ + Indicator ของ (ไฟล์, Timeframe) ล่าสุด
+_worker_cache = {}
+
+
+def _prepared(path, timeframe):
+    key = (path, timeframe)
+    cached = _worker_cache.get(key)
+    if cached is None:
+        _worker_cache.clear()
+        candles = _open_shared(path)
+        if timeframe:
+            candles = backtest.resample(candles, timeframe)
+        close = np.ascontiguousarray(candles["c"], dtype=np.float64)
+        candles["c"] = close
+        values = backtest.compute_indicators(close, candles["h"], candles["l"])
+        cached = _worker_cache[key] = (candles, values)
+    return cached
+
+
+def run_batch(symbol, path, strategy, timeframe, combos, base_params):
+    """
+    Worker: Backtest ทุกชุดพารามิเตอร์ของ 1 เหรียญ / 1 Timeframe
+    Indicator คำนวณครั้งเดียวต่อ batch, สัญญาณคำนวณใหม่เฉพาะเมื่อค่า RSI เปลี่ยน
+    """
+    candles, values = _prepared(path, timeframe)
+    signals_cache = {}
+    results = []
+    for combo in combos:
+        params = dict(base_params, strategy=strategy)
+        for name, value in combo.items():
+            if KNOBS.get(name): params[KNOBS[name]] = value
+        rsi_key = (params["rsi_oversold"], params["rsi_overbought"])
+        if rsi_key not in signals_cache:
+            signals_cache[rsi_key] = backtest.compute_signals(candles["c"], values, params)
+        signals, auto_strat = signals_cache[rsi_key]
+        result = backtest.replay(candles, params, signals, auto_strat)
+        result.pop("trade_list", None)
+        result["score"] = round(result["pnl_pct"] - result["max_drawdown_pct"] / 2, 4)
+        results.append({
+            "key": param_key(symbol, strategy, combo),
+            "symbol": symbol,
+            "strategy": strategy,
+            "params": combo,
+            "result": result,
+        })
+    return results
+
+
+# =====================================================================
+# --- 🏁 ตัวจัดการ Sweep ---
+# =====================================================================
+def load_done(results_path):
+    """อ่านผลเดิมจากไฟล์ JSONL (บรรทัดที่เขียนไม่ครบจากการถูกหยุดกลางคันจะถูกข้าม)"""
+    done = {}
+    if not os.path.exists(results_path):
+        return done
+    with open(results_path, encoding="utf-8") as f:
+        for line in f:
+            try:
+                row = json.loads(line)
+            except ValueError:
+                continue
+            done[row["key"]] = row
+    return done
+
+
+def plan_tasks(shared, strategy, combos, done, workers):
+    """แบ่งงานเป็น batch ตาม (เหรียญ, Timeframe) ให้แต่ละ Worker ใช้ Indicator ชุดเดียวกันซ้ำ"""
+    groups = {}
+    for symbol in shared:
+        for combo in combos:
+            if param_key(symbol, strategy, combo) in done: continue
+            timeframe = combo.get("TIMEFRAME")
+            groups.setdefault((symbol, timeframe), []).append(combo)
+
+    pending = sum(len(g) for g in groups.values())
+    # ให้มีงานอย่างน้อย ~4 batch ต่อ Worker เพื่อกระจายโหลดให้ครบทุก Core
+    batch_size = max(1, min(64, pending // max(1, workers * 4)))
+    tasks = []
+    for (symbol, timeframe), group in groups.items():
+        for k in range(0, len(group), batch_size):
+            tasks.append((symbol, shared[symbol], strategy, timeframe, group[k:k + batch_size]))
+    return tasks, pending
+
+
+def rank(rows, rank_by="score", top=10):
+    """จัดอันดับผลต่อเหรียญ (max_drawdown_pct ยิ่งน้อยยิ่งดี)"""
+    by_symbol = {}
+    for row in rows:
+        by_symbol.setdefault(row["symbol"], []).append(row)
+    reverse = rank_by != "max_drawdown_pct"
+    return {
+        symbol: sorted(group, key=lambda r: r["result"][rank_by], reverse=reverse)[:top]
+        for symbol, group in sorted(by_symbol.items())
+    }
+
+
+def sweep(files, combos, strategy=1, results_path="optimize_results.jsonl", cache_dir=".optimize_cache",
+          workers=None, base_params=None):
+    """รัน Sweep ทั้งหมด (ข้ามชุดที่มีในไฟล์ผลแล้ว) คืนผลทั้งหมดของเหรียญที่ระบุ"""
+    workers = workers or os.cpu_count() or 1
+    base_params = base_params or backtest.default_params()
+    shared = export_shared(files, cache_dir)
+    done = load_done(results_path)
+    tasks, pending = plan_tasks(shared, strategy, combos, done, workers)
+    print(f"🧪 {len(combos)} combos x {len(shared)} symbols | {pending} to run ({len(done)} done) on {workers} workers")
+
+    started, finished = time.perf_counter(), 0
+    with open(results_path, "a", encoding="utf-8") as out, ProcessPoolExecutor(max_workers=workers) as pool:
+        futures = [pool.submit(run_batch, *task, base_params) for task in tasks]
+        for future in as_completed(futures):
+            for row in future.result():
+                out.write(json.dumps(row, ensure_ascii=False) + "\n")
+                done[row["key"]] = row
+            out.flush()
+            finished += 1
+            if finished % max(1, len(futures) // 20) == 0 or finished == len(futures):
+                print(f"   {finished}/{len(futures)} batches | {time.perf_counter() - started:.1f}s")
+
+    keys = {param_key(s, strategy, c) for s in shared for c in combos}
+    return [row for key, row in done.items() if key in keys]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Parallel parameter sweep for config.py trading knobs")
+    parser.add_argument("path", help="ไฟล์ .csv/.npz/.bin หรือโฟลเดอร์ที่มีไฟล์ต่อเหรียญ (เช่น candles/)")
+    parser.add_argument("--grid", nargs="*", default=[], metavar="NAME=VALUES",
+                        help=f"ค่าที่จะทดสอบ ({', '.join(KNOBS)}) เช่น TTP_DROP_PCT=0.3:1.0:0.1")
+    parser.add_argument("--random", type=int, default=0, help="สุ่ม N ชุดจาก Grid/SPACE แทนการรันครบทุกชุด")
+    parser.add_argument("--seed", type=int, default=None)
+    parser.add_argument("--strategy", type=int, default=1, choices=[1, 2, 3, 4])
+    parser.add_argument("--cost-st", type=float, default=100.0)
+    parser.add_argument("--money-limit", type=float, default=1000.0)
+    parser.add_argument("--workers", type=int, default=None, help="จำนวนโปรเซส (ค่าเริ่มต้น = จำนวน CPU)")
+    parser.add_argument("--results", default="optimize_results.jsonl", help="ไฟล์ผลลัพธ์ (ใช้ไฟล์เดิมเพื่อ Resume)")
+    parser.add_argument("--cache-dir", default=".optimize_cache")
+    parser.add_argument("--rank-by", default="score", choices=RANK_BY)
+    parser.add_argument("--top", type=int, default=5)
+    args = parser.parse_args()
+
+    space = {}
+    for item in args.grid:
+        name, _, values = item.partition("=")
+        name = name.strip().upper()
+        if name not in KNOBS:
+            parser.error(f"unknown knob {name} (choose from {', '.join(KNOBS)})")
+        space[name] = parse_values(values)
+    if not space:
+        space = SPACE if args.random else {"TIMEFRAME": [config.TIMEFRAME]}
+    combos = random_combos(space, args.random, args.seed) if args.random else grid_combos(space)
+
+    base = backtest.default_params()
+    base.update({"cost_st": args.cost_st, "money_limit": args.money_limit})
+    rows = sweep(backtest.find_data_files(args.path), combos, args.strategy, args.results,
+                 args.cache_dir, args.workers, base)
+
+    for symbol, best in rank(rows, args.rank_by, args.top).items():
+        print(f"\n🏆 {symbol} (by {args.rank_by})")
+        for row in best:
+            r = row["result"]
+            knobs = " ".join(f"{k}={v}" for k, v in row["params"].items())
+            print(f"   pnl={r['pnl_pct']:+.2f}% maxDD={r['max_drawdown_pct']:.2f}% trades={r['trades']:<4} | {knobs}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,460 @@
+"""
+Paper Trading: Exchange จำลองที่ใช้แทน BitkubClient (config.EXCHANGE_BACKEND = "paper")
+
+- คำสั่งซื้อขาย/Wallet/Open orders อยู่ในหน่วยความจำ ไม่ยิง Endpoint ที่ต้อง Sign เลย
+- Market order จับคู่ที่ราคาล่าสุด (+ slippage) หักค่าธรรมเนียม, Limit order รอจนแท่งเทียนแตะราคา
+- โหมด Live (PAPER_REPLAY_START = None): ใช้กราฟจริงจาก Bitkub (Public endpoint) ตามเวลาจริง
+- โหมด Replay: เล่นกราฟจากคลังบนดิสก์ (หรือกราฟสุ่มถ้าไม่มี) ด้วยนาฬิกาจำลอง ไม่ต้องใช้ Network
+  PAPER_SPEED = 0 -> เวลาเดินเฉพาะตอนบอทพัก (LOOP_INTERVAL) จึงรันหลายสัปดาห์ได้ในไม่กี่นาที
+
+ใช้งาน (Replay จาก Command line, ใช้ DB แยก):
+    python candle_archive.py backfill THB_BTC THB_ETH --days 60 --resolution 5
+    python paper_exchange.py THB_BTC THB_ETH --days 30 --strategy 4 --cost-st 100 --money-limit 1000
+"""
+import argparse
+import asyncio
+import itertools
+import time
+import zlib
+
+import numpy as np
+
+import config
+import utils
+from bitkub import BitkubClient
+from candle_store import CandleStore, COLUMNS, base_resolution
+from candle_archive import as_columns
+
+STATUS_OK = [
+    {"name": "Non-secure endpoints", "status": "ok", "message": ""},
+    {"name": "Secure endpoints", "status": "ok", "message": ""},
+]
+
+
+class SimClock:
+    """
+    นาฬิกาจำลอง (ใช้แทน ServerClock)
+    - speed > 0 : เวลาจำลองเดินเร็วกว่าจริง `speed` เท่า (1 = เวลาจริง)
+    - speed = 0 : เวลาเดินเฉพาะตอน sleep() (ข้ามไปทันที ไม่รอจริง)
+    """
+    def __init__(self, start=None, speed=1.0):
+        self.start_time = time.time() if start is None else float(start)
+        self.speed = speed
+        self.offset_ms = 0.0
+        self.rtt_ms = None
+        self.synced_at = time.monotonic()
+        self._started = time.monotonic()
+        self._skipped = 0.0
+
+    def time(self):
+        elapsed = (time.monotonic() - self._started) * self.speed if self.speed else 0.0
+        return self.start_time + elapsed + self._skipped
+
+    def now_ms(self):
+        return int(self.time() * 1000)
+
+    async def sleep(self, seconds):
+        if self.speed:
+            await asyncio.sleep(seconds / self.speed)
+        else:
+            self._skipped += seconds
+            await asyncio.sleep(0)
+
+    # --- ให้ใช้แทน ServerClock ได้ (ไม่มี Server ให้ sync) ---
+    def needs_sync(self):
+        return False
+
+    async def sync(self, client=None):
+        return True
+
+    def start(self, client=None):
+        return None
+
+    def stop(self):
+        pass
+
+
+def synthetic_candles(symbol, start, end, resolution):
+    """กราฟสุ่มแบบ Random walk (seed จากชื่อเหรียญ ได้กราฟเดิมทุกครั้ง) สำหรับเหรียญที่ไม่มีในคลัง"""
+    bar = resolution * 60
+    t = np.arange(start // bar * bar, end + bar, bar, dtype=np.int64)
+    rng = np.random.default_rng(zlib.crc32(symbol.encode()))
+    close = 100 * np.exp(np.cumsum(rng.normal(0, 0.003 * np.sqrt(resolution / 5), len(t))))
+    spread = np.abs(rng.normal(0, 0.0015, len(t)))
+    open_ = np.r_[close[0], close[:-1]]
+    return {
+        "t": t,
+        "o": open_,
+        "h": np.maximum(open_, close) * (1 + spread),
+        "l": np.minimum(open_, close) * (1 - spread),
+        "c": close,
+        "v": rng.uniform(1, 100, len(t)),
+    }
+
+
+class PaperExchange(BitkubClient):
+    """
+    Exchange จำลอง: มี method ชุดเดียวกับ BitkubClient (Bot และ Route ใน main.py เรียกได้เหมือนเดิม)
+    replay_start = None -> Live paper trading (ราคาจริง, เวลาจริง)
+    """
+    def __init__(self, replay_start=None, replay_end=None, speed=None, balance_thb=None,
+                 fee_pct=None, slippage_pct=None, archive=None):
+        super().__init__()
+        self.replay = replay_start is not None
+        self.replay_end = replay_end
+        speed = config.PAPER_SPEED if speed is None else speed
+        self.clock = SimClock(replay_start, speed if self.replay else 1.0)
+        self.fee_pct = config.PAPER_FEE_PCT if fee_pct is None else fee_pct
+        self.slippage_pct = config.PAPER_SLIPPAGE_PCT if slippage_pct is None else slippage_pct
+        if archive is not None:
+            self.archive = archive
+        if self.replay:
+            # 🟢 กราฟ Replay แยกจาก Store กลาง (ไม่ปนกับข้อมูลจริง)
+            self.candles = CandleStore()
+
+        self.balances = {"THB": float(config.PAPER_BALANCE_THB if balance_thb is None else balance_thb)}
+        self.open_orders = {}      # id -> order (in-memory order book ของเรา)
+        self.orders = {}           # id -> สถานะ + ประวัติการ match ของทุกออเดอร์ (สำหรับ order-info)
+        self.fills = []            # ประวัติการจับคู่ทั้งหมด
+        self.last_prices = {}      # api symbol -> ราคาล่าสุดที่บอทเห็น
+        self._seeded = False
+        self._ids = itertools.count(1)
+        self._data = {}            # (api symbol, resolution) -> คอลัมน์กราฟสำหรับ Replay
+
+    # =====================================================================
+    # --- เวลา ---
+    # =====================================================================
+    def time(self):
+        return self.clock.time()
+
+    async def sleep(self, seconds):
+        if self.replay and not self.clock.speed and self._data:
+            # โหมดเร็วสุด: ระหว่างแท่งเดียวกันกราฟไม่เปลี่ยน (แท่งที่ยังไม่ปิดเห็นแค่ราคาเปิด)
+            # ข้ามไปแท่งถัดไปเลย ผลลัพธ์เหมือนรันทุก LOOP_INTERVAL แต่เร็วกว่ามาก
+            now = self.clock.time()
+            bar = min(res for _, res in self._data) * 60
+            seconds = max(seconds, (now // bar + 1) * bar - now)
+        await self.clock.sleep(seconds)
+
+    # ราคาในโลกจำลองมาจากกราฟเท่านั้น (ไม่ต่อ WebSocket ของ Bitkub)
+    market_feed = False
+
+    @property
+    def exhausted(self):
+        """Replay เล่นถึงแท่งสุดท้ายแล้ว"""
+        if not self.replay:
+            return False
+        end = self.replay_end
+        if end is None and self._data:
+            end = max(int(data["t"][-1]) + res * 60 for (_, res), data in self._data.items() if len(data["t"]))
+        return end is not None and self.clock.time() >= end
+
+    async def get_server_status(self, client=None):
+        return STATUS_OK
+
+    async def get_server_timestamp(self, client=None):
+        return self.clock.now_ms()
+
+    async def get_signing_timestamp(self, client=None):
+        return self.clock.now_ms()
+
+    # =====================================================================
+    # --- กราฟ ---
+    # =====================================================================
+    def _series(self, symbol, resolution):
+        query_symbol = utils.normalize_symbol(symbol, to_api=True)
+        key = (query_symbol, resolution)
+        data = self._data.get(key)
+        if data is None:
+            bars = self.archive.read(symbol, resolution)
+            if len(bars):
+                data = as_columns(bars)
+            else:
+                # ไม่มีในคลัง -> กราฟสุ่มครอบช่วง Replay (รวมแท่งย้อนหลังสำหรับ Indicator)
+                start = int(self.clock.start_time) - self.candles.bars(key) * resolution * 60
+                end = self.replay_end or int(self.clock.start_time) + 7 * 86400
+                data = synthetic_candles(query_symbol, start, end, resolution)
+                print(f"ℹ️ Paper: {symbol} {resolution}m not in archive, using synthetic candles")
+            self._data[key] = data
+        return data
+
+    def _visible(self, symbol, resolution, bars, from_time=None):
+        """แท่งที่เริ่มก่อนเวลาจำลองปัจจุบัน แท่งที่ยังไม่ปิดเห็นแค่ราคาเปิด (ไม่รู้อนาคต)"""
+        data = self._series(symbol, resolution)
+        now = self.clock.time()
+        hi = int(np.searchsorted(data["t"], now, side="right"))
+        lo = max(0, hi - bars)
+        if from_time is not None:
+            lo = max(lo, int(np.searchsorted(data["t"], from_time, side="left")))
+        window = {col: np.array(data[col][lo:hi]) for col in COLUMNS}
+        if hi > lo and window["t"][-1] + resolution * 60 > now:
+            for col in ("h", "l", "c"):
+                window[col][-1] = window["o"][-1]
+            window["v"][-1] = 0.0
+        return window
+
+    async def fetch_history(self, client, symbol, resolution, from_time, to_time):
+        if not self.replay:
+            return await super().fetch_history(client, symbol, resolution, from_time, to_time)
+        window = self._visible(symbol, resolution, len(self._series(symbol, resolution)["t"]), from_time)
+        keep = window["t"] <= to_time
+        if not keep.any():
+            return {"s": "no_data"}
+        return {"s": "ok", **{col: window[col][keep].tolist() for col in COLUMNS}}
+
+    async def get_candles(self, client, symbol, timeframe=None):
+        if self.replay:
+            timeframe = timeframe or config.TIMEFRAME
+            resolution = base_resolution(timeframe)
+            key = (utils.normalize_symbol(symbol, to_api=True), resolution)
+            self.candles.reserve(key, timeframe)
+            window = self._visible(symbol, resolution, self.candles.bars(key))
+            if len(window["t"]) == 0:
+                return None
+            self.candles.reset(key)
+            self.candles.merge(key, window)
+            df = self.candles.frame(key, timeframe)
+        else:
+            df = await super().get_candles(client, symbol, timeframe)
+        if df is not None and len(df):
+            self._on_candles(symbol, df)
+        return df
+
+    # =====================================================================
+    # --- Wallet / Order book ---
+    # =====================================================================
+    async def _seed_balances(self):
+        """เริ่มต้นยอดเหรียญจาก Position ใน DB (รีสตาร์ทแล้วบอทยังขายของที่ถือได้)"""
+        if self._seeded: return
+        self._seeded = True
+        import database as db
+        for row in await db.get_all_symbols():
+            coin = utils.normalize_symbol(row["symbol"], to_api=True).split("_")[0].upper()
+            if row["coin"]:
+                self.balances[coin] = self.balances.get(coin, 0.0) + float(row["coin"])
+
+    def _coin(self, sym):
+        return utils.normalize_symbol(sym, to_api=True).split("_")[0].upper()
+
+    def _credit(self, currency, amount):
+        self.balances[currency] = self.balances.get(currency, 0.0) + amount
+        self.wallet.invalidate()
+
+    def _result(self, order_id, typ, amt, rat, fee, rec):
+        return {"id": order_id, "hash": f"paper-{order_id}", "typ": typ, "amt": amt, "rat": rat,
+                "fee": fee, "cre": 0, "rec": rec, "ts": int(self.clock.time())}
+
+    async def get_wallet(self, client=None):
+        await self._seed_balances()
+        return {"error": 0, "result": dict(self.balances)}
+
+    async def place_order(self, client, sym, amt, rat, side, type='limit'):
+        await self._seed_balances()
+        query_symbol = utils.normalize_symbol(sym, to_api=True)
+        coin = self._coin(sym)
+        side = side.upper()
+        amt, rat = float(amt), float(rat)
+        if side not in ("BUY", "SELL"):
+            return {'error': 999, 'result': 'Invalid side'}
+        if amt <= 0:
+            return {"error": 15, "result": "Amount too low"}
+
+        price = self.last_prices.get(query_symbol)
+        if type == "market":
+            if price is None:
+                return {"error": 11, "result": "Invalid symbol (no price yet)"}
+            slip = self.slippage_pct / 100
+            rat = price * (1 + slip) if side == "BUY" else price * (1 - slip)
+        elif rat <= 0:
+            return {"error": 20, "result": "Invalid rate"}
+
+        currency = "THB" if side == "BUY" else coin
+        if self.balances.get(currency, 0.0) + 1e-12 < amt:
+            return {"error": 18, "result": "Insufficient balance"}
+        self.balances[currency] -= amt     # Limit order: กันเงินไว้จนกว่าจะ match/ยกเลิก
+        self.wallet.invalidate()
+
+        order_id = str(next(self._ids))
+        self.orders[order_id] = {"sym": query_symbol, "side": side.lower(), "type": type, "rate": rat,
+                                 "amount": amt, "status": "unfilled", "history": [], "ts": int(self.clock.time())}
+        if type == "market":
+            fee, rec = self._fill(query_symbol, side, amt, rat, order_id)
+            result = self._result(order_id, type, amt, rat, fee, rec)
+        else:
+            self.open_orders[order_id] = {
+                "id": order_id, "sym": query_symbol, "side": side.lower(), "type": "limit",
+                "rate": rat, "amount": amt, "ts": int(self.clock.time()),
+            }
+            fee = amt * self.fee_pct / 100 * (1 if side == "BUY" else rat)
+            result = self._result(order_id, type, amt, rat, round(fee, 8), 0)
+        result['_req_rat'] = float(rat)
+        result['_req_amt'] = float(amt)
+        return {"error": 0, "result": result}
+
+    def _fill(self, query_symbol, side, amt, rat, order_id=None):
+        """จับคู่คำสั่ง (amt ถูกหักจาก Wallet ไปแล้ว) คืน (fee เป็น THB, จำนวนที่ได้รับ)"""
+        coin = query_symbol.split("_")[0].upper()
+        fee_rate = self.fee_pct / 100
+        if side == "BUY":
+            fee = amt * fee_rate
+            rec = (amt - fee) / rat
+            self._credit(coin, rec)
+        else:
+            gross = amt * rat
+            fee = gross * fee_rate
+            rec = gross - fee
+            self._credit("THB", rec)
+        self.fills.append({"sym": query_symbol, "side": side.lower(), "amt": amt, "rat": rat,
+                           "fee": fee, "rec": rec, "ts": int(self.clock.time())})
+        order = self.orders.get(order_id)
+        if order is not None:
+            order["status"] = "filled"
+            order["history"].append({"amount": amt, "credit": 0, "fee": round(fee, 8), "id": f"paper-fill-{len(self.fills)}",
+                                     "rate": rat, "timestamp": int(self.clock.time() * 1000)})
+        return round(fee, 8), round(rec, 8)
+
+    def _on_candles(self, symbol, df):
+        """ราคาล่าสุดสำหรับ Market order + จับคู่ Limit order ที่แท่งเทียนแตะราคาแล้ว"""
+        query_symbol = utils.normalize_symbol(symbol, to_api=True)
+        self.last_prices[query_symbol] = float(df["close"].iloc[-1])
+        pending = [o for o in self.open_orders.values() if o["sym"] == query_symbol]
+        if not pending: return
+        ts = df["timestamp"].to_numpy().astype("datetime64[s]").astype(np.int64)
+        for order in pending:
+            since = ts >= order["ts"] - (ts[-1] - ts[-2] if len(ts) > 1 else 0)
+            if not since.any(): continue
+            if order["side"] == "buy":
+                touched = df["low"].to_numpy()[since].min() <= order["rate"]
+            else:
+                touched = df["high"].to_numpy()[since].max() >= order["rate"]
+            if touched:
+                del self.open_orders[order["id"]]
+                self._fill(query_symbol, order["side"].upper(), order["amount"], order["rate"], order["id"])
+
+    async def get_open_orders(self, client, sym):
+        query_symbol = utils.normalize_symbol(sym, to_api=True)
+        fee_rate = self.fee_pct / 100
+        result = []
+        for o in self.open_orders.values():
+            if o["sym"] != query_symbol: continue
+            if o["side"] == "buy":
+                receive = o["amount"] * (1 - fee_rate) / o["rate"]
+            else:
+                receive = o["amount"] * o["rate"] * (1 - fee_rate)
+            result.append({"id": o["id"], "side": o["side"], "type": o["type"], "rate": o["rate"],
+                           "fee": 0, "credit": 0, "amount": o["amount"], "receive": receive, "ts": o["ts"]})
+        return {"error": 0, "result": result}
+
+    async def cancel_order(self, client, sym, order_id, side):
+        order = self.open_orders.pop(str(order_id), None)
+        if order is None:
+            return {"error": 21, "result": "Invalid order for cancellation"}
+        self._credit("THB" if order["side"] == "buy" else self._coin(order["sym"]), order["amount"])
+        self.orders[str(order_id)]["status"] = "cancelled"
+        return {"error": 0}
+
+    async def get_order_info(self, client, sym, order_id, side):
+        """รูปแบบเดียวกับ /api/v3/market/order-info (Limit order ที่นี่ match ทีเดียวทั้งก้อน)"""
+        order = self.orders.get(str(order_id))
+        if order is None:
+            return {"error": 21, "result": {}}
+        filled = sum(h["amount"] for h in order["history"])
+        return {"error": 0, "result": {
+            "id": str(order_id), "first": str(order_id), "parent": "0", "last": None,
+            "amount": order["amount"], "rate": order["rate"], "fee": sum(h["fee"] for h in order["history"]),
+            "credit": 0, "filled": filled, "total": order["amount"], "status": order["status"],
+            "partial_filled": 0 < filled < order["amount"], "remaining": order["amount"] - filled,
+            "history": list(order["history"]),
+        }}
+
+    async def get_bids(self, client, sym, limit=5):
+        # ตลาดจำลองไม่มี Depth (Market order ได้ราคาล่าสุดเสมอ) -> execution.py จะเลือก Market order
+        return {"error": 0, "result": []}
+
+    async def get_asks(self, client, sym, limit=5):
+        return {"error": 0, "result": []}
+
+    def equity(self):
+        """มูลค่ารวม (THB) ที่ราคาล่าสุด รวมเงินที่กันไว้ใน Limit order"""
+        total = self.balances.get("THB", 0.0)
+        for currency, amount in self.balances.items():
+            if currency == "THB" or not amount: continue
+            total += amount * self.last_prices.get(f"{currency.lower()}_thb", 0.0)
+        for o in self.open_orders.values():
+            total += o["amount"] if o["side"] == "buy" else o["amount"] * self.last_prices.get(o["sym"], 0.0)
+        return total
+
+
+# =====================================================================
+# --- Replay จาก Command line ---
+# =====================================================================
+class _ConsoleWS:
+    def __init__(self, verbose):
+        self.verbose = verbose
+
+    async def broadcast(self, message):
+        # ข้อความสำคัญ (ซื้อ/ขาย) ถูก print จาก log_and_broadcast อยู่แล้ว
+        if self.verbose:
+            print(message)
+
+    async def broadcast_json(self, payload):
+        pass
+
+
+async def _replay(args):
+    import logging
+    import httpx
+    import database as db
+    from bot_engine import BotEngine
+
+    if not args.verbose:
+        logging.getLogger().setLevel(logging.WARNING)
+
+    db.DB_NAME = args.db
+    db.init_db()
+    for symbol in args.symbols:
+        if not await db.get_symbol_by_name(utils.normalize_symbol(symbol)):
+            await db.add_symbol(utils.normalize_symbol(symbol), args.money_limit, args.cost_st, args.strategy, args.timeframe)
+
+    resolution = base_resolution(args.timeframe or config.TIMEFRAME)
+    exchange = PaperExchange(replay_start=0, speed=args.speed)
+    ends = [int(exchange.archive.read(s, resolution)["t"][-1]) for s in args.symbols if len(exchange.archive.read(s, resolution))]
+    end = min(ends) if ends else int(time.time()) // 60 * 60
+    exchange.clock.start_time = end - args.days * 86400
+    exchange.replay_end = end
+
+    bot = BotEngine(_ConsoleWS(args.verbose), exchange=exchange)
+    bot.tg_token = None     # ไม่ส่ง Telegram ระหว่าง Replay
+    started = time.perf_counter()
+    async with httpx.AsyncClient() as client:
+        bot.http = client
+        await bot.run_loop()
+    await db.close_pool()
+
+    wallet = exchange.balances
+    print(f"\n🏁 Replayed {args.days} days in {time.perf_counter() - started:.1f}s "
+          f"({time.strftime('%Y-%m-%d %H:%M', time.gmtime(exchange.clock.start_time))} -> "
+          f"{time.strftime('%Y-%m-%d %H:%M', time.gmtime(exchange.clock.time()))} UTC)")
+    print(f"   Fills: {len(exchange.fills)} | Fees: {sum(f['fee'] for f in exchange.fills):,.2f} THB")
+    print(f"   Wallet: {', '.join(f'{k} {v:,.8g}' for k, v in wallet.items() if v)}")
+    initial = config.PAPER_BALANCE_THB
+    equity = exchange.equity()
+    print(f"   Equity: {equity:,.2f} THB ({(equity - initial) / initial * 100:+.2f}%)")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Replay the bot against the paper exchange")
+    parser.add_argument("symbols", nargs="+")
+    parser.add_argument("--days", type=float, default=7)
+    parser.add_argument("--speed", type=float, default=0, help="0 = เร็วสุด (ข้ามเวลาพัก), 60 = 1 นาทีต่อวินาที")
+    parser.add_argument("--strategy", type=int, default=1)
+    parser.add_argument("--timeframe", type=int, default=None)
+    parser.add_argument("--cost-st", type=float, default=100)
+    parser.add_argument("--money-limit", type=float, default=1000)
+    parser.add_argument("--db", default=config.PAPER_DB_NAME)
+    parser.add_argument("--verbose", action="store_true")
+    asyncio.run(_replay(parser.parse_args()))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,160 @@
+import asyncio
+import random
+import time
+import config
+import metrics
+
+
+class TokenBucket:
+    """
+    Token Bucket แบบ async: เติม token ด้วยอัตรา `rate` ต่อวินาที เก็บได้สูงสุด `capacity`
+    เรียก `await bucket.acquire()` ก่อนยิง Request แต่ละครั้ง ถ้า token หมดจะรอจนกว่าจะเติมทัน
+
+    ปรับอัตราเองแบบ AIMD: โดน HTTP 429 -> ลดอัตราลงครึ่งหนึ่ง (penalize)
+    Request สำเร็จ -> ค่อยๆ เพิ่มกลับทีละ RATE_RECOVERY_STEP จนเท่าอัตราตั้งต้น (reward)
+    """
+    def __init__(self, rate, capacity=None):
+        self.base_rate = float(rate)
+        self.rate = self.base_rate
+        self.capacity = float(capacity if capacity is not None else max(1.0, rate))
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+        self._lock = None
+        self._lock_loop = None
+
+    def _refill(self):
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    async def acquire(self, tokens=1):
+        # Lock ผูกกับ event loop ที่ใช้อยู่ (สคริปต์ที่เรียก asyncio.run หลายครั้งใช้ได้)
+        loop = asyncio.get_running_loop()
+        if self._lock_loop is not loop:
+            self._lock, self._lock_loop = asyncio.Lock(), loop
+        # ใช้ Lock เพื่อให้คิวเป็นแบบมาก่อนได้ก่อน (ไม่แย่ง token กัน)
+        async with self._lock:
+            while True:
+                self._refill()
+                if self.tokens >= tokens:
+                    self.tokens -= tokens
+                    return
+                await asyncio.sleep((tokens - self.tokens) / self.rate)
+
+    def penalize(self):
+        self._refill()
+        self.rate = max(self.base_rate * config.RATE_MIN_FRACTION, self.rate / 2)
+        self.tokens = min(self.tokens, 0.0)
+
+    def reward(self):
+        if self.rate < self.base_rate:
+            self._refill()
+            self.rate = min(self.base_rate, self.rate + self.base_rate * config.RATE_RECOVERY_STEP)
+
+
+_buckets = {}
+
+def get_bucket(endpoint):
+    """คืน TokenBucket ของ endpoint นั้นๆ (สร้างครั้งแรกจาก config.RATE_LIMITS)"""
+    bucket = _buckets.get(endpoint)
+    if bucket is None:
+        limit = config.RATE_LIMITS.get(endpoint, 10)
+        bucket = TokenBucket(limit * config.RATE_LIMIT_SAFETY)
+        _buckets[endpoint] = bucket
+    return bucket
+
+
+def endpoint_class(endpoint):
+    """"secure" = endpoint ที่ต้อง Sign (wallet/order), "public" = ข้อมูลตลาด"""
+    return "secure" if endpoint in config.SECURE_ENDPOINTS else "public"
+
+
+_class_buckets = {}
+
+def get_class_bucket(endpoint):
+    """Bucket รวมของทั้งกลุ่ม (public / secure) ใช้คู่กับ bucket ราย endpoint"""
+    name = endpoint_class(endpoint)
+    bucket = _class_buckets.get(name)
+    if bucket is None:
+        bucket = _class_buckets[name] = TokenBucket(config.RATE_LIMIT_CLASSES[name] * config.RATE_LIMIT_SAFETY)
+    return bucket
+
+
+def backoff_delay(attempt):
+    """Exponential backoff แบบ full jitter: สุ่ม 0..min(max, base * 2^attempt)"""
+    return random.uniform(0, min(config.RETRY_MAX_DELAY, config.RETRY_BASE_DELAY * (2 ** attempt)))
+
+
+def retry_after_seconds(response):
+    """ค่า Retry-After (วินาที) จาก Response หรือ None ถ้าไม่มี/อ่านไม่ได้"""
+    value = response.headers.get("Retry-After")
+    if not value:
+        return None
+    try:
+        return min(float(value), config.RETRY_AFTER_MAX)
+    except ValueError:
+        from email.utils import parsedate_to_datetime
+        try:
+            return min(max(0.0, parsedate_to_datetime(value).timestamp() - time.time()), config.RETRY_AFTER_MAX)
+        except (TypeError, ValueError):
+            return None
+
+
+class CircuitOpenError(Exception):
+    pass
+
+
+class CircuitBreaker:
+    """
+    หยุดยิง Bitkub ชั่วคราวเมื่อพังต่อเนื่อง (กันโดนแบนตอน Server มีปัญหา)
+    - closed    : ปกติ
+    - open      : ล้มเหลวติดกัน `threshold` ครั้ง หรือ /api/status แจ้งว่าไม่ ok -> ปฏิเสธทุก Request `cooldown` วินาที
+    - half-open : ครบ cooldown แล้วปล่อยให้ลอง 1 Request ถ้าสำเร็จกลับเป็น closed
+      (Request ที่ลองไม่จบด้วย success/failure เช่นถูก Cancel -> end_probe คืนสิทธิ์
+       และถ้าค้างนานเกิน cooldown ก็ปล่อยให้ Request ถัดไปลองแทน breaker จึงไม่ค้างเปิดตลอดไป)
+    """
+    def __init__(self, threshold=None, cooldown=None):
+        self.threshold = threshold or config.CIRCUIT_FAILURE_THRESHOLD
+        self.cooldown = cooldown or config.CIRCUIT_COOLDOWN
+        self.failures = 0
+        self.opened_at = None
+        self.probe_started = None   # monotonic ตอนปล่อย Request ทดลองใน half-open (None = ไม่มี)
+
+    @property
+    def state(self):
+        if self.opened_at is None:
+            return "closed"
+        return "half-open" if time.monotonic() - self.opened_at >= self.cooldown else "open"
+
+    def allow(self):
+        state = self.state
+        if state == "closed":
+            return True
+        if state == "half-open":
+            now = time.monotonic()
+            if self.probe_started is None or now - self.probe_started >= self.cooldown:
+                self.probe_started = now
+                return True
+        return False
+
+    def end_probe(self, started):
+        """Request ทดลอง (ที่เริ่มตอน started) จบแล้ว ถ้ายังไม่ได้ตัดสินผล ให้ Request ถัดไปลองใหม่ได้"""
+        if started is not None and self.probe_started == started:
+            self.probe_started = None
+
+    def record_success(self):
+        if self.opened_at is not None:
+            metrics.CIRCUIT_OPEN.set(value=0)
+        self.failures = 0
+        self.opened_at = None
+        self.probe_started = None
+
+    def record_failure(self):
+        self.failures += 1
+        if self.probe_started is not None or self.failures >= self.threshold:
+            self.trip()
+
+    def trip(self):
+        self.opened_at = time.monotonic()
+        self.probe_started = None
+        metrics.CIRCUIT_OPEN.set(value=1)
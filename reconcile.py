@@ -0,0 +1,177 @@
+"""
+กระทบยอดออเดอร์ค้าง (my-open-orders) ของหลายเหรียญในรอบเดียว
+
+1. ดึง Open orders ของทุกเหรียญพร้อมกัน (ผ่าน Rate limiter ใน BitkubClient._request)
+2. เทียบกับตาราง pending_orders (Limit order ที่บอทส่งเองและยังไม่ครบ
+   filled/received = ส่วนที่ match แล้วและนับเข้า cost/coin ไปแล้ว)
+   - ออเดอร์ในตารางที่ไม่อยู่บน Bitkub แล้ว -> ถาม order-info ว่า Match ครบหรือถูกยกเลิก (ในแอป/หมดอายุ)
+     นับเฉพาะส่วนที่ match จริงเข้า cost/coin แล้วลบออกจากตาราง (ถามไม่ได้ -> เก็บไว้ตัดสินรอบหน้า
+     จนกว่าจะเกิน RECONCILE_ORDER_MAX_AGE แล้วเลิกติดตาม โดยคงยอดที่นับไว้แล้ว)
+   - ออเดอร์ที่ค้างเกินอายุ / ทุกออเดอร์ของเหรียญที่สัญญาณเปลี่ยน = ค้าง -> ยกเลิก
+3. ยกเลิกพร้อมกันทุกตัว ถาม order-info ว่าก่อนยกเลิก match ไปเท่าไหร่ นับเฉพาะส่วนนั้นเพิ่ม
+   + บันทึกประวัติ + ลบจากตาราง ทั้งหมดลง DB ใน Transaction เดียว (journal.flush ครั้งเดียว)
+
+ระหว่างปรับ cost/coin จะถือล็อค processing_coins ของเหรียญนั้น (ไม่ซื้อขายซ้อน)
+"""
+import asyncio
+import time
+
+import config
+import database as db
+import metrics
+from execution import parse_fill
+
+
+class OrderReconciler:
+    def __init__(self, engine):
+        self.engine = engine
+        self.last_run = None    # เวลา (ตามนาฬิกาของ Exchange) ของรอบกระทบยอดทุกเหรียญล่าสุด
+
+    def due(self):
+        return self.last_run is None or self.engine.api.time() - self.last_run >= config.RECONCILE_INTERVAL
+
+    def _is_stale(self, local_row, now, cancel_all):
+        if cancel_all:
+            return True
+        if local_row is None:
+            # ออเดอร์ที่บอทไม่ได้ส่งเอง (เช่น ตั้งเองในแอป) ยกเลิกเฉพาะตอนสัญญาณเปลี่ยน เว้นแต่ตั้งค่าไว้
+            return config.RECONCILE_CANCEL_UNTRACKED
+        return now - local_row['ts'] >= config.RECONCILE_ORDER_MAX_AGE
+
+    async def reconcile(self, client, symbols=None, cancel_all=False):
+        """
+        symbols   : รายชื่อเหรียญ (None = ทุกเหรียญที่เปิดใช้งาน นับเป็นรอบตามเวลา)
+        cancel_all: ยกเลิกทุกออเดอร์ค้างของเหรียญเหล่านี้ (ใช้ตอนสัญญาณเปลี่ยน)
+        คืน dict: checked, cancelled, filled, failed
+        """
+        engine, api = self.engine, self.engine.api
+        summary = {"checked": 0, "cancelled": 0, "filled": 0, "failed": 0}
+        if symbols is None:
+            symbols = [row['symbol'] for row in await db.get_active_symbols()]
+            self.last_run = api.time()
+        if not symbols:
+            return summary
+
+        with metrics.timer(metrics.STAGE_SECONDS, "reconcile"):
+            # อ่านตารางก่อนดึงจาก Exchange: ทุกออเดอร์ใน local ถูกส่งไปก่อนเราดึงแน่นอน
+            # (ถ้าอ่านทีหลัง ออเดอร์ที่ execute_trade/TTP เพิ่งส่งระหว่างนั้นจะดูเหมือน Match แล้ว)
+            local = await db.get_pending_orders()
+            responses = await asyncio.gather(*(api.get_open_orders(client, sym) for sym in symbols))
+            now = api.time()
+
+            stale, done = {}, {}
+            for sym, res in zip(symbols, responses):
+                if not isinstance(res, dict) or res.get('error') != 0:
+                    continue    # ดึงไม่สำเร็จ -> ไม่รู้สถานะจริง ข้ามเหรียญนี้ไปก่อน
+                summary["checked"] += 1
+                if sym in engine.processing_coins:
+                    continue    # กำลังซื้อขายเหรียญนี้อยู่ -> ไว้ตัดสินรอบหน้า
+                open_orders = res.get('result') or []
+                seen = {str(order.get('id')) for order in open_orders}
+                for order_id, row in local.items():
+                    if row['symbol'] == sym and order_id not in seen:
+                        done.setdefault(sym, []).append(row)
+                for order in open_orders:
+                    if self._is_stale(local.get(str(order.get('id'))), now, cancel_all):
+                        stale.setdefault(sym, []).append(order)
+
+            locked = sorted(set(stale) | set(done))
+            engine.processing_coins.update(locked)
+            try:
+                if locked:
+                    # cost/coin ล่าสุด (อ่านหลังถือล็อคแล้ว)
+                    rows = {row['symbol']: row for row in await db.get_all_symbols()}
+                    positions = {}
+                    if done:
+                        await self._settle(client, done, rows, positions, summary)
+                    if stale:
+                        await self._cancel(client, stale, local, rows, positions, summary)
+                    for sym, (cost, coin) in positions.items():
+                        db.journal.add_position(rows[sym]['id'], cost, coin)
+                await db.journal.flush()
+            finally:
+                engine.processing_coins.difference_update(locked)
+
+        metrics.ORDERS_RECONCILED.inc("filled", amount=summary["filled"])
+        metrics.ORDERS_RECONCILED.inc("cancelled", amount=summary["cancelled"])
+        metrics.ORDERS_RECONCILED.inc("cancel_failed", amount=summary["failed"])
+        if summary["cancelled"] or summary["failed"]:
+            await engine.log_and_broadcast(
+                f"🧹 Open orders: {summary['cancelled']} cancelled, {summary['filled']} filled, "
+                f"{summary['failed']} cancel failed ({summary['checked']} symbols)")
+        return summary
+
+    @staticmethod
+    def _book(rows, positions, local_row, filled, received):
+        """
+        ปรับ cost/coin ตามส่วนต่างระหว่างยอด match จริงกับที่นับไว้แล้ว (filled/received ในตาราง)
+        ส่วนต่างติดลบได้: ออเดอร์เก่าก่อน v5 ถูกนับเต็มจำนวนตอนส่ง ถ้าถูกยกเลิกจะถูกหักคืน
+        """
+        row = rows.get(local_row['symbol'])
+        if row is None:
+            return
+        d_filled = filled - local_row['filled']
+        d_received = received - local_row['received']
+        cost, coin = positions.get(row['symbol'], (row['cost'], row['coin']))
+        if local_row['side'] == 'buy':
+            cost, coin = max(0, cost + d_filled), max(0, coin + d_received)
+        elif local_row['side'] == 'sell':
+            cost, coin = max(0, cost - d_received), max(0, coin - d_filled)
+        positions[row['symbol']] = (cost, coin)
+
+    async def _settle(self, client, done, rows, positions, summary):
+        """ออเดอร์ที่หายจาก Open orders: Match ครบ หรือถูกยกเลิกนอกบอท (เช่น ยกเลิกในแอป Bitkub)"""
+        api = self.engine.api
+        jobs = [(sym, row) for sym, orders in done.items() for row in orders]
+        infos = await asyncio.gather(*(
+            api.get_order_info(client, sym, row['order_id'], row['side']) for sym, row in jobs
+        ), return_exceptions=True)
+        now = api.time()
+        for (sym, row), info in zip(jobs, infos):
+            if not isinstance(info, dict) or info.get('error') != 0 or not isinstance(info.get('result'), dict):
+                # ไม่รู้สถานะจริง -> รอบหน้าถามใหม่ (เลิกติดตามเมื่อเกินอายุ ไม่ให้บล็อคการซื้อขายเหรียญนี้ตลอดไป)
+                if now - row['ts'] >= config.RECONCILE_ORDER_MAX_AGE:
+                    db.untrack_pending_order(row['order_id'])
+                    summary["failed"] += 1
+                continue
+            filled, received, still_open = parse_fill(info['result'], row['side'].upper())
+            if still_open:
+                continue    # ยังค้างอยู่ (รายการ Open orders ไม่ครบ) -> รอบหน้า
+            self._book(rows, positions, row, filled, received)
+            db.untrack_pending_order(row['order_id'])
+            if str(info['result'].get('status', '')).lower() == 'filled':
+                summary["filled"] += 1
+            else:
+                summary["cancelled"] += 1
+                db.queue_order(sym, {"id": row['order_id'], "amt": row['amount'], "rat": row['rate'],
+                                     "ts": int(time.time()), "typ": "limit"}, f"Cancelled {row['side'].upper()}")
+
+    async def _cancel(self, client, stale, local, rows, positions, summary):
+        api = self.engine.api
+        jobs = [(sym, order) for sym, orders in stale.items() for order in orders]
+        results = await asyncio.gather(*(
+            api.cancel_order(client, sym, order.get('id'), (order.get('side') or '').lower()) for sym, order in jobs
+        ), return_exceptions=True)
+
+        cancelled = []
+        for (sym, order), res in zip(jobs, results):
+            if not isinstance(res, dict) or res.get('error') != 0:
+                summary["failed"] += 1
+                continue
+            summary["cancelled"] += 1
+            o_id, o_side = str(order.get('id')), (order.get('side') or '').lower()
+            o_amt, o_rate = float(order.get('amount', 0)), float(order.get('rate', 0))
+            db.queue_order(sym, {"id": o_id, "amt": o_amt, "rat": o_rate, "ts": int(time.time()), "typ": "limit"}, f"Cancelled {o_side.upper()}")
+            if o_id in local:
+                cancelled.append((sym, local[o_id]))
+
+        # ออเดอร์ที่บอทส่งเอง: ก่อนยกเลิกอาจ match ไปบางส่วน -> นับเฉพาะส่วนที่ match จริง
+        infos = await asyncio.gather(*(
+            api.get_order_info(client, sym, row['order_id'], row['side']) for sym, row in cancelled
+        ), return_exceptions=True)
+        for (sym, row), info in zip(cancelled, infos):
+            if not isinstance(info, dict) or info.get('error') != 0 or not isinstance(info.get('result'), dict):
+                continue    # ไม่รู้ยอดจริง -> ยังเก็บไว้ในตาราง ให้รอบหน้าตัดสินอีกครั้ง
+            filled, received, _ = parse_fill(info['result'], row['side'].upper())
+            self._book(rows, positions, row, filled, received)
+            db.untrack_pending_order(row['order_id'])
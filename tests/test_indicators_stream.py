@@ -0,0 +1,169 @@
+"""
+Indicator แบบ Streaming (indicators_stream.py) ต้องให้ค่าเท่ากับฟังก์ชันแบบ Batch ใน indicators.py
+ทั้งตอนเพิ่มแท่งใหม่ (append) และตอนแท่งล่าสุดเปลี่ยนค่า (update) เทียบทั้ง Kernel และ pandas
+
+รัน: python -m pytest -q tests
+"""
+import os
+import sys
+
+import numpy as np
+import pandas as pd
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import indicators  # noqa: E402
+import indicators_kernel  # noqa: E402
+from indicators_stream import (  # noqa: E402
+    IndicatorSet, StreamingADX, StreamingBollinger, StreamingEMA, StreamingMACD, StreamingRSI,
+    StreamingStochastic,
+)
+
+COLUMNS = ("RSI", "MACD", "Signal", "BB_Mid", "BB_Upper", "BB_Lower", "EMA_20", "EMA_50", "ADX")
+BACKENDS = [False] + ([True] if indicators_kernel.ENABLED else [])
+
+
+def make_bars(n=600, seed=7):
+    """Random walk + ช่วงราคานิ่ง (แท่งแบน high == low) ทดสอบกรณีหาร 0 และ EMA ที่ค่าไม่เปลี่ยน"""
+    rng = np.random.default_rng(seed)
+    close = 1_000_000 * np.exp(np.cumsum(rng.normal(0, 0.004, n)))
+    close[200:260] = close[199]
+    spread = np.abs(rng.normal(0, 0.003, n)) * close
+    high, low = close + spread, close - spread
+    high[200:260] = low[200:260] = close[199]
+    return pd.DataFrame({
+        "timestamp": pd.to_datetime(np.arange(n) * 300, unit="s"),
+        "close": close, "high": high, "low": low,
+    })
+
+
+def assert_close(actual, expected, label):
+    np.testing.assert_allclose(np.asarray(actual, dtype=np.float64), np.asarray(expected, dtype=np.float64),
+                               rtol=1e-9, atol=1e-9, equal_nan=True, err_msg=label)
+
+
+@pytest.fixture(params=BACKENDS, ids=lambda kernel: "kernel" if kernel else "pandas")
+def batch(request, monkeypatch):
+    """calculate_all บนทั้ง DataFrame ผ่าน Kernel (ถ้ามี Numba) และ pandas"""
+    monkeypatch.setattr(indicators, "USE_KERNEL", request.param)
+    return lambda df: indicators.calculate_all(df.reset_index(drop=True))
+
+
+def provisional_bars(df):
+    """ค่าระหว่างแท่ง (ก่อนปิด) ของทุกแท่ง ใช้ทดสอบ append แล้ว update ทับด้วยค่าปิดจริง"""
+    mid = (df["high"] + df["low"]) / 2
+    return df.assign(close=mid, low=mid)
+
+
+def feed(df, make, args, updates):
+    """ป้อนแท่งทีละแท่ง updates=True -> append ด้วยค่าระหว่างแท่งก่อน แล้ว update เป็นค่าปิดจริง"""
+    pre = provisional_bars(df)
+    ind, out = make(), []
+    for i in range(len(df)):
+        if updates:
+            ind.append(*args(pre, i))
+            out.append(ind.update(*args(df, i)))
+        else:
+            out.append(ind.append(*args(df, i)))
+    return out
+
+
+def close_only(df, i):
+    return (float(df["close"].iloc[i]),)
+
+
+def close_high_low(df, i):
+    return float(df["close"].iloc[i]), float(df["high"].iloc[i]), float(df["low"].iloc[i])
+
+
+def high_low_close(df, i):
+    return float(df["high"].iloc[i]), float(df["low"].iloc[i]), float(df["close"].iloc[i])
+
+
+@pytest.mark.parametrize("updates", [False, True], ids=["append", "update"])
+def test_single_indicators_match_batch(batch, updates):
+    df = make_bars()
+    expected = batch(df)
+
+    assert_close(feed(df, lambda: StreamingEMA(span=20), close_only, updates), expected["EMA_20"], "EMA_20")
+    assert_close(feed(df, lambda: StreamingEMA(span=50), close_only, updates), expected["EMA_50"], "EMA_50")
+    assert_close(feed(df, lambda: StreamingRSI(14), close_only, updates), expected["RSI"], "RSI")
+
+    macd = np.array(feed(df, StreamingMACD, close_only, updates))
+    assert_close(macd[:, 0], expected["MACD"], "MACD")
+    assert_close(macd[:, 1], expected["Signal"], "Signal")
+
+    bb = np.array(feed(df, StreamingBollinger, close_only, updates))
+    assert_close(bb[:, 0], expected["BB_Mid"], "BB_Mid")
+    assert_close(bb[:, 1], expected["BB_Upper"], "BB_Upper")
+    assert_close(bb[:, 2], expected["BB_Lower"], "BB_Lower")
+
+    stoch = np.array(feed(df, StreamingStochastic, close_high_low, updates))
+    assert_close(stoch[:, 0], expected["Stoch_K"], "Stoch_K")
+    assert_close(stoch[:, 1], expected["Stoch_D"], "Stoch_D")
+
+    assert_close(feed(df, lambda: StreamingADX(14), high_low_close, updates), expected["ADX"], "ADX")
+
+
+@pytest.mark.parametrize("updates", [False, True], ids=["append", "update"])
+def test_indicator_set_matches_batch(batch, updates):
+    df = make_bars()
+    expected = batch(df)
+    pre = provisional_bars(df)
+    state = IndicatorSet()
+    for i in range(len(df)):
+        ts = df["timestamp"].iloc[i]
+        if updates:
+            state.append(ts, *close_high_low(pre, i))
+            state.update(*close_high_low(df, i))
+        else:
+            state.append(ts, *close_high_low(df, i))
+        for name in COLUMNS:
+            assert_close(state.last[name], expected[name][i], f"{name}[{i}]")
+
+
+def test_sync_with_sliding_window_matches_full_history(batch):
+    """
+    BotEngine ส่ง DataFrame CANDLE_BARS แท่งล่าสุดทุกรอบ (แท่งสุดท้ายยังไม่ปิด)
+    State สะสมต่อเนื่อง จึงเท่ากับ calculate_all บนประวัติทั้งหมด ไม่ใช่บนหน้าต่าง 100 แท่ง
+    """
+    df = make_bars()
+    pre = provisional_bars(df)
+    bars = 100
+    state = IndicatorSet()
+    for end in range(bars, len(df) + 1):
+        window = df.iloc[end - bars:end]
+        # แท่งสุดท้ายก่อนปิด -> รอบถัดไปค่าปิดจริงมาทับ (sync ต้อง update แท่งนั้น ไม่ append ซ้ำ)
+        forming = pd.concat([window.iloc[:-1], pre.iloc[end - 1:end]])
+        state.sync(forming)
+        state.sync(window)
+
+    expected = batch(df)
+    for name in COLUMNS:
+        assert_close([row[name] for row in state.rows], expected[name][-IndicatorSet.HISTORY:], name)
+
+    # Warm-up ต่างจากการคำนวณใหม่บนหน้าต่างเดียว (แบบเดิมก่อนมี Streaming) -> EMA_50 ไม่เท่ากันพอดี
+    windowed = batch(df.iloc[-bars:])
+    assert not np.isclose(state.last["EMA_50"], windowed["EMA_50"][-1], rtol=1e-12, atol=0)
+
+
+def test_sync_rebuilds_after_gap(batch):
+    """หา last_ts ใน DataFrame ใหม่ไม่เจอ (ข้อมูลขาดช่วง) -> สร้าง State ใหม่จากหน้าต่างนั้น"""
+    df = make_bars()
+    state = IndicatorSet().sync(df.iloc[:100])
+    window = df.iloc[300:400]
+    state.sync(window)
+    expected = batch(window)
+    for name in COLUMNS:
+        assert_close(state.last[name], expected[name][-1], name)
+
+
+def test_ema_flat_series_stays_exact():
+    """ราคานิ่ง: EMA ต้องเท่าราคาพอดี (ไม่มี error ปัดเศษสะสม) เหมือน pandas"""
+    price = 0.1 + 0.2
+    ema = StreamingEMA(span=20)
+    for _ in range(500):
+        value = ema.append(price)
+    assert value == price
+    assert value == pd.Series([price] * 500).ewm(span=20, adjust=False).mean().iloc[-1]
@@ -0,0 +1,199 @@
+"""
+Trailing Take Profit (TTP) แยกจากรอบ Strategy
+
+- เฝ้าเฉพาะเหรียญที่มี coin > 0 เก็บข้อมูลต่อเหรียญเป็น array ช่องละเหรียญ:
+  ราคาที่เริ่ม TTP (ต้นทุนเฉลี่ย + TTP_ACTIVATION_PCT + FEE_BUFFER) และจุดสูงสุด (0 = ยังไม่เริ่ม)
+- update(symbol, price) เช็คราคาใหม่แบบ O(1) ไม่มี await / ไม่อ่าน DB (เรียกได้ทุก Tick จาก WebSocket)
+- ถึงจุดขาย -> เข้าคิวให้ Task ของ Monitor ขายเอง (ทางขายของ TTP มีทางเดียว รอบหลักแค่ส่งราคาเข้ามา)
+  (ใช้ล็อค processing_coins ร่วมกับรอบหลัก จึงไม่มีคำสั่งซ้อนกันในเหรียญเดียว)
+- จุดสูงสุดใหม่แจ้งหน้าเว็บเฉพาะตอนสูงกว่าที่แจ้งล่าสุด TTP_HIGH_STEP_PCT (ไม่แจ้งทุก Tick)
+- cost/coin อัปเดตจาก run_cycle (get_active_symbols) และจาก journal หลังซื้อขายทุกครั้ง
+- trailing_highs ของ BotEngine ยังเป็นตัวจริงที่ถูก checkpoint ไว้ Monitor เขียนจุดสูงสุดใหม่ลงไปด้วย
+"""
+import asyncio
+from array import array
+
+import config
+import database as db
+import metrics
+
+
+class TrailingMonitor:
+    def __init__(self, engine):
+        self.engine = engine
+        self.drop_factor = 1 - getattr(config, 'TTP_DROP_PCT', 0.5) / 100
+        self.activation_pct = getattr(config, 'TTP_ACTIVATION_PCT', 1.5) + config.FEE_BUFFER
+        self.announce_factor = 1 + config.TTP_HIGH_STEP_PCT / 100
+        self._slot = {}             # symbol -> index
+        self._symbols = []          # index -> symbol
+        self._activate = array('d')
+        self._high = array('d')
+        self._announced = array('d')    # จุดสูงสุดที่แจ้งหน้าเว็บล่าสุด
+        self._known = {}            # s_id -> symbol_data ล่าสุดของเหรียญที่เปิดใช้งาน
+        self._queue = None
+        self._queued = set()
+        self._task = None
+
+    def __len__(self):
+        return len(self._symbols)
+
+    def __contains__(self, sym):
+        return sym in self._slot
+
+    @property
+    def running(self):
+        return self._task is not None and not self._task.done()
+
+    def high(self, sym):
+        i = self._slot.get(sym)
+        return self._high[i] if i is not None else 0.0
+
+    # ==============================================================
+    # 🟢 ข้อมูลเหรียญที่ถืออยู่
+    # ==============================================================
+    def track(self, symbol_data):
+        """เริ่ม/อัปเดตการเฝ้าเหรียญ (coin <= 0 หรือปิดใช้งาน = เลิกเฝ้า)"""
+        sym, coin = symbol_data['symbol'], symbol_data['coin']
+        self._known[symbol_data['id']] = symbol_data
+        if coin <= 0 or symbol_data.get('status', 'true') != 'true':
+            self.untrack(sym)
+            return
+        activate = symbol_data['cost'] / coin * (1 + self.activation_pct / 100)
+        high = self.engine.trailing_highs.get(sym, 0.0)
+        i = self._slot.get(sym)
+        if i is None:
+            self._slot[sym] = len(self._symbols)
+            self._symbols.append(sym)
+            self._activate.append(activate)
+            self._high.append(high)
+            self._announced.append(high)
+        else:
+            self._activate[i] = activate
+            self._high[i] = high
+
+    def untrack(self, sym):
+        i = self._slot.pop(sym, None)
+        if i is None:
+            return
+        # ย้ายช่องสุดท้ายมาแทนช่องที่ลบ (array ไม่มีรู)
+        last = len(self._symbols) - 1
+        if i != last:
+            moved = self._symbols[last]
+            self._symbols[i] = moved
+            self._activate[i] = self._activate[last]
+            self._high[i] = self._high[last]
+            self._announced[i] = self._announced[last]
+            self._slot[moved] = i
+        self._symbols.pop()
+        self._activate.pop()
+        self._high.pop()
+        self._announced.pop()
+
+    def sync(self, symbols):
+        """ตั้งรายการเหรียญใหม่จากรอบ run_cycle (เฉพาะที่ status = 'true')"""
+        self._known = {}
+        for symbol_data in symbols:
+            self.track(symbol_data)
+        active = {s['symbol'] for s in symbols if s['coin'] > 0}
+        for sym in [s for s in self._symbols if s not in active]:
+            self.untrack(sym)
+
+    def update_position(self, s_id, cost, coin):
+        """cost/coin ใหม่หลังซื้อขาย (จาก OrderJournal listener)"""
+        symbol_data = self._known.get(s_id)
+        if symbol_data is not None:
+            self.track({**symbol_data, 'cost': cost, 'coin': coin})
+
+    # ==============================================================
+    # 🟢 Hot path: ทุกราคาใหม่
+    # ==============================================================
+    def update(self, sym, price):
+        """
+        เช็คราคาใหม่ของเหรียญ O(1) คืนค่า True ถ้าถึงจุดขาย TTP
+        (ถ้า Monitor รันอยู่จะเข้าคิวให้ขายเอง)
+        """
+        i = self._slot.get(sym)
+        if i is None:
+            return False
+        high = self._high[i]
+        if price >= self._activate[i] and price > high:
+            self._high[i] = price
+            self.engine.trailing_highs[sym] = price
+            announced = self._announced[i]
+            if announced <= 0 or price >= announced * self.announce_factor:
+                self._announced[i] = price
+                self._put(("high", sym, price))
+            return False
+        if high > 0 and price <= high * self.drop_factor:
+            if sym not in self._queued:
+                self._queued.add(sym)
+                self._put(("sell", sym, price))
+            return True
+        return False
+
+    def _put(self, item):
+        if self._queue is not None:
+            self._queue.put_nowait(item)
+        elif item[0] == "sell":
+            self._queued.discard(item[1])
+
+    # ==============================================================
+    # 🟢 ส่งคำสั่งขาย
+    # ==============================================================
+    async def sell(self, client, sym, price):
+        """
+        ขายตาม TTP คืนค่า True ถ้าขายแล้ว
+        ถือล็อค processing_coins ตั้งแต่อ่าน cost/coin ล่าสุดจาก DB จนส่งคำสั่งเสร็จ
+        (ถ้ารอบหลักเพิ่งขายไปก่อน จะเห็น coin = 0 แล้วไม่ขายซ้ำ)
+        """
+        engine = self.engine
+        if sym in engine.processing_coins: return False
+        engine.processing_coins.add(sym)
+        try:
+            symbol_data = await db.get_symbol_by_name(sym)
+            if not symbol_data or symbol_data['status'] != 'true' or symbol_data['coin'] <= 0:
+                self.untrack(sym)
+                return False
+            highest_price = self.high(sym) or engine.trailing_highs.get(sym)
+            if not highest_price:
+                return False
+            avg_cost = symbol_data['cost'] / symbol_data['coin']
+            current_pnl_pct = ((price - avg_cost) / avg_cost) * 100
+            reason_tp = f"🎯 Trailing TP | Drop from High {highest_price} | Sold at +{current_pnl_pct:.2f}%"
+            await engine.execute_trade(client, symbol_data, "SELL", price, reason_tp)
+            engine.trailing_highs.pop(sym, None)
+            self.untrack(sym)
+            return True
+        finally:
+            engine.processing_coins.discard(sym)
+
+    async def run(self):
+        while True:
+            kind, sym, price = await self._queue.get()
+            try:
+                if kind == "high":
+                    await self.engine.ws_manager.broadcast(f"🚀 {sym}: TTP Activated! New High: {price}")
+                elif self.engine._client is not None and self.engine.server_status_ok:
+                    with metrics.timer(metrics.STAGE_SECONDS, "ttp_sell"):
+                        await self.sell(self.engine._client, sym, price)
+            except Exception as e:
+                print(f"⚠️ {sym} TTP Monitor Error: {e}")
+            finally:
+                if kind == "sell":
+                    self._queued.discard(sym)
+
+    def start(self):
+        if not self.running:
+            self._queue = asyncio.Queue()
+            self._queued.clear()
+            self._task = asyncio.create_task(self.run())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        self._queue = None
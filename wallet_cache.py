@@ -0,0 +1,118 @@
+"""
+ยอดเงินใน Wallet ล่าสุด ใช้ร่วมกันระหว่าง Bot และ /api/wallet (ไม่ยิง get_wallet ทุกครั้งที่ถาม)
+
+- get(client, max_age) คืนยอดจาก cache ถ้าอายุไม่เกิน max_age วินาที ไม่งั้นดึงใหม่
+  (ดึงพร้อมกันหลายที่ -> ยิงจริงครั้งเดียว ที่เหลือรอผลเดียวกัน)
+- invalidate() เมื่อมีการส่ง/ยกเลิกคำสั่ง (หรือ Paper จับคู่ Limit) -> ยอดเดิมหมดอายุทันที
+  และ Task เบื้องหลังดึงใหม่ให้เลย
+- Task เบื้องหลังดึงใหม่ทุก WALLET_REFRESH_INTERVAL วินาที
+- ทุกครั้งที่ดึงสำเร็จจะเรียก callback ที่ subscribe ไว้ (เช่น ส่งยอด THB ไปหน้า Dashboard)
+"""
+import asyncio
+import time
+
+import config
+import metrics
+
+
+class WalletCache:
+    def __init__(self, api, refresh_interval=None):
+        self.api = api
+        self.refresh_interval = refresh_interval or config.WALLET_REFRESH_INTERVAL
+        self.wallet = None
+        self.fetched_at = None      # monotonic (None = หมดอายุ ต้องดึงใหม่)
+        self._generation = 0        # เพิ่มทุกครั้งที่ invalidate
+        self._lock = None
+        self._lock_loop = None
+        self._wake = None
+        self._task = None
+        self._listeners = []
+
+    @property
+    def running(self):
+        return self._task is not None and not self._task.done()
+
+    def age(self):
+        return None if self.fetched_at is None else time.monotonic() - self.fetched_at
+
+    def balance(self, currency, default=0.0):
+        """ยอดของสกุลนั้นจาก cache (ไม่สนอายุ) หรือ default ถ้ายังไม่เคยดึง"""
+        if not self.wallet or self.wallet.get('error') != 0:
+            return default
+        return float(self.wallet.get('result', {}).get(currency, default))
+
+    def subscribe(self, callback):
+        """callback(wallet) ถูกเรียกหลังดึง Wallet สำเร็จทุกครั้ง"""
+        self._listeners.append(callback)
+
+    def invalidate(self):
+        self._generation += 1
+        self.fetched_at = None
+        if self._wake is not None:
+            self._wake.set()
+
+    async def get(self, client, max_age=None):
+        """Wallet response ({"error", "result"}) ที่อายุไม่เกิน max_age วินาที (0 = ดึงใหม่เสมอ)"""
+        max_age = config.WALLET_MAX_AGE if max_age is None else max_age
+        age = self.age()
+        if age is not None and age <= max_age:
+            metrics.WALLET_READS.inc("hit")
+            return self.wallet
+
+        loop = asyncio.get_running_loop()
+        if self._lock_loop is not loop:
+            self._lock, self._lock_loop = asyncio.Lock(), loop
+        async with self._lock:
+            # มีคนดึงให้แล้วระหว่างรอ Lock
+            age = self.age()
+            if age is not None and age <= max_age:
+                metrics.WALLET_READS.inc("hit")
+                return self.wallet
+            metrics.WALLET_READS.inc("miss")
+            return await self._fetch(client)
+
+    async def _fetch(self, client):
+        generation = self._generation
+        wallet = await self.api.get_wallet(client)
+        if not isinstance(wallet, dict) or wallet.get('error') != 0:
+            return wallet
+        self.wallet = wallet
+        # มีคำสั่งเกิดขึ้นระหว่างดึง -> ยอดนี้อาจเป็นก่อนคำสั่ง ใช้ได้แต่ถือว่าหมดอายุแล้ว
+        self.fetched_at = time.monotonic() if generation == self._generation else None
+        for callback in self._listeners:
+            try:
+                await callback(wallet)
+            except Exception as e:
+                print(f"⚠️ Wallet Listener Error: {e}")
+        return wallet
+
+    async def run(self, client):
+        while True:
+            try:
+                await asyncio.wait_for(self._wake.wait(), timeout=self.refresh_interval)
+            except asyncio.TimeoutError:
+                pass
+            self._wake.clear()
+            try:
+                await self.get(client, max_age=0)
+            except Exception as e:
+                print(f"Wallet Refresh Error: {e}")
+
+    def start(self, client):
+        """เริ่ม Task ดึงยอดตามรอบ คืนค่า True ถ้าเพิ่งเริ่ม (False = รันอยู่แล้ว)"""
+        if self.running:
+            return False
+        self._wake = asyncio.Event()
+        self._wake.set()    # ดึงครั้งแรกทันที
+        self._task = asyncio.create_task(self.run(client))
+        return True
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        self._wake = None